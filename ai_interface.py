@@ -1,11 +1,14 @@
-import google.generativeai as genai
+import sys
+
 import global_params as gp
+from llm_cache import get_cache, get_cache_key
+from json_repair import load_scene_json
 
-from openai import OpenAI
+# The provider SDKs are slow to import, they are only loaded once their backend is first used
 
 ## GEMINI ##
 
-genai.configure(api_key="Enter Verification key")
+gemini_api_key = "Enter Verification key"
 
 # Create the model
 # See https://ai.google.dev/api/python/google/generativeai/GenerativeModel
@@ -17,34 +20,122 @@ gemini_config = {
     "response_mime_type": "text/plain",
 }
 
-gemini_model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=gemini_config,
-    # safety_settings = Adjust safety settings
-    # See https://ai.google.dev/gemini-api/docs/safety-settings
-)
+gemini_model_name = "gemini-1.5-flash"
+gemini_models: dict = {}
+
+
+def get_prompt(variant: str | None = None) -> str:
+    return gp.prompts[variant or gp.prompt_variant]
+
+
+def get_gemini_model(variant: str | None = None):
+    # The prompt goes in as system instruction, so every request only sends the problem after the same prefix
+    variant = variant or gp.prompt_variant
+    if variant not in gemini_models:
+        import google.generativeai as genai
+        genai.configure(api_key=gemini_api_key)
+        gemini_models[variant] = genai.GenerativeModel(
+            model_name=gemini_model_name,
+            generation_config=gemini_config,
+            system_instruction=get_prompt(variant),
+            # safety_settings = Adjust safety settings
+            # See https://ai.google.dev/gemini-api/docs/safety-settings
+        )
+    return gemini_models[variant]
+
 
 ## ChatGPT ##
-openai_model = OpenAI(api_key="Enter Verification key")
+openai_api_key = "Enter Verification key"
+openai_model = None
+
+openai_model_name = "gpt-3.5-turbo"
+openai_config = {
+    "temperature": 0.5,
+    "max_tokens": 1024,
+    "top_p": 1,
+}
+
+
+def get_openai_model():
+    global openai_model
+    if openai_model is None:
+        from openai import OpenAI
+        openai_model = OpenAI(api_key=openai_api_key)
+    return openai_model
+
+
+def get_openai_messages(problem: str, variant: str | None = None) -> list[dict]:
+    # System message first and unchanged between requests, OpenAI caches such prefixes automatically
+    return [
+        {
+            "role": "system",
+            "content": get_prompt(variant)
+        },
+        {
+            "role": "user",
+            "content": problem
+        }
+    ]
 
 
-def generate_json(problem: str, llm_model: str = "Gemini"):
+def request_json_with_usage(problem: str, llm_model: str = "Gemini", variant: str | None = None) -> [str, dict]:
     if llm_model == "Gemini":
-        return gemini_model.start_chat(history=[]).send_message(gp.prompt + problem).text
+        response = get_gemini_model(variant).generate_content(problem)
+        usage = {
+            "prompt_tokens": response.usage_metadata.prompt_token_count,
+            "response_tokens": response.usage_metadata.candidates_token_count,
+            "cached_tokens": getattr(response.usage_metadata, "cached_content_token_count", 0),
+        }
+        return [response.text, usage]
     else:
-        return openai_model.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": gp.prompt
-                },
-                {
-                    "role": "user",
-                    "content": problem
-                }
-            ],
-            temperature=0.5,
-            max_tokens=1024,
-            top_p=1
-        ).choices[0].message.content
+        response = get_openai_model().chat.completions.create(
+            model=openai_model_name,
+            messages=get_openai_messages(problem, variant),
+            **openai_config
+        )
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "response_tokens": response.usage.completion_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        }
+        return [response.choices[0].message.content, usage]
+
+
+def request_json(problem: str, llm_model: str = "Gemini") -> str:
+    return request_json_with_usage(problem, llm_model)[0]
+
+
+def get_request_key(problem: str, llm_model: str = "Gemini") -> str:
+    if llm_model == "Gemini":
+        return get_cache_key("gemini", gemini_model_name, gemini_config, get_prompt(), problem)
+    else:
+        return get_cache_key("openai", openai_model_name, openai_config, get_prompt(), problem)
+
+
+def cache_response(key: str, response: str) -> None:
+    # Only answers that load as a scene with something to draw (the repair pass makes an empty scene out of
+    # almost anything), a broken one would be served again for the cache's lifetime instead of asking anew
+    try:
+        (scene, _) = load_scene_json(response)
+    except Exception as e:
+        print(f"Warning: LLM answer not cached, it does not load as a scene: {e}", file=sys.stderr)
+        return
+    if not (scene["polygons"] or scene["additional_lines"] or scene["circles"]):
+        print("Warning: LLM answer not cached, the scene is empty.", file=sys.stderr)
+        return
+    get_cache().put(key, response)
+
+
+def generate_json(problem: str, llm_model: str = "Gemini", use_cache: bool = True):
+    # use_cache=False forces a fresh extraction, the new answer still replaces the cached one
+    key = get_request_key(problem, llm_model)
+
+    if use_cache:
+        response = get_cache().get(key)
+        if response is not None:
+            return response
+
+    response = request_json(problem, llm_model)
+    cache_response(key, response)
+    return response
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Callable
+
+import global_params as gp
+import ai_interface
+from llm_cache import get_cache
+from json_repair import load_scene_json
+
+
+class LlmBackend:
+    # One long-lived client per provider, so connections are reused between requests
+    async def request(self, problem: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, problem: str) -> AsyncIterator[str]:
+        # Async generator of response text chunks
+        raise NotImplementedError
+
+
+class GeminiBackend(LlmBackend):
+    async def request(self, problem: str) -> str:
+        # A single generate call instead of a new chat session per request
+        response = await ai_interface.get_gemini_model().generate_content_async(problem)
+        return response.text
+
+    async def stream(self, problem: str) -> AsyncIterator[str]:
+        response = await ai_interface.get_gemini_model().generate_content_async(problem, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+class OpenAIBackend(LlmBackend):
+    def __init__(self):
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=ai_interface.openai_api_key, max_retries=0)
+
+    async def request(self, problem: str) -> str:
+        response = await self.client.chat.completions.create(
+            model=ai_interface.openai_model_name,
+            messages=ai_interface.get_openai_messages(problem),
+            **ai_interface.openai_config
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, problem: str) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=ai_interface.openai_model_name,
+            messages=ai_interface.get_openai_messages(problem),
+            stream=True,
+            **ai_interface.openai_config
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def is_transient(e: Exception) -> bool:
+    # Worth another attempt: deadlines, dropped connections, rate limits (429) and server errors (5xx).
+    # Bad keys, bad requests and bugs are raised right away.
+    # The SDK errors have no common base: openai puts the status in status_code, google.api_core in code
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class LlmClient:
+    # Deadline per attempt, jittered exponential backoff between attempts of transient failures,
+    # and at most gp.llm_max_concurrency requests in flight
+    def __init__(self):
+        self.backends: dict[str, LlmBackend] = {}
+        self.semaphore = asyncio.Semaphore(gp.llm_max_concurrency)
+
+    def get_backend(self, llm_model: str) -> LlmBackend:
+        if llm_model not in self.backends:
+            self.backends[llm_model] = GeminiBackend() if llm_model == "Gemini" else OpenAIBackend()
+        return self.backends[llm_model]
+
+    async def request(self, problem: str, llm_model: str) -> str:
+        backend = self.get_backend(llm_model)
+
+        for attempt in range(gp.llm_max_attempts):
+            try:
+                async with self.semaphore:
+                    return await asyncio.wait_for(backend.request(problem), gp.llm_timeout)
+            except Exception as e:
+                if not is_transient(e) or attempt == gp.llm_max_attempts - 1:
+                    raise
+                # Full jitter: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+                delay = random.uniform(0, gp.llm_retry_base_delay * (2 ** attempt))
+                print(f"Warning: LLM request failed ({e!r}), retrying in {delay:.1f}s.", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+    async def generate_json(self, problem: str, llm_model: str = "Gemini", use_cache: bool = True) -> str:
+        key = ai_interface.get_request_key(problem, llm_model)
+
+        if use_cache:
+            response = get_cache().get(key)
+            if response is not None:
+                return response
+
+        response = await self.request(problem, llm_model)
+        ai_interface.cache_response(key, response)
+        return response
+
+    async def stream_json(self, problem: str, on_chunk: Callable[[str], None], llm_model: str = "Gemini",
+                          use_cache: bool = True) -> str:
+        # Like generate_json, but hands every chunk to on_chunk as it arrives (a cached answer is one chunk).
+        # Only retried while nothing was received yet, a half delivered answer can not be taken back.
+        key = ai_interface.get_request_key(problem, llm_model)
+
+        if use_cache:
+            response = get_cache().get(key)
+            if response is not None:
+                on_chunk(response)
+                return response
+
+        backend = self.get_backend(llm_model)
+        received: list[str] = []
+
+        async def consume() -> None:
+            async for chunk in backend.stream(problem):
+                received.append(chunk)
+                on_chunk(chunk)
+
+        for attempt in range(gp.llm_max_attempts):
+            try:
+                async with self.semaphore:
+                    await asyncio.wait_for(consume(), gp.llm_timeout)
+                break
+            except Exception as e:
+                if received or not is_transient(e) or attempt == gp.llm_max_attempts - 1:
+                    raise
+                delay = random.uniform(0, gp.llm_retry_base_delay * (2 ** attempt))
+                print(f"Warning: LLM stream failed ({e!r}), retrying in {delay:.1f}s.", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+        response = "".join(received)
+        ai_interface.cache_response(key, response)
+        return response
+
+    async def generate_many(self, problems: list[str], llm_model: str = "Gemini",
+                            use_cache: bool = True) -> list[str | BaseException]:
+        return await asyncio.gather(*(self.generate_json(p, llm_model, use_cache) for p in problems),
+                                    return_exceptions=True)
+
+
+class AsyncRunner:
+    # Event loop in a background thread, lets the Tk thread submit requests and poll the futures
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client: LlmClient = asyncio.run_coroutine_threadsafe(self._create_client(), self.loop).result()
+
+    @staticmethod
+    async def _create_client() -> LlmClient:
+        return LlmClient()
+
+    def submit(self, problem: str, llm_model: str = "Gemini", use_cache: bool = True) -> Future:
+        return asyncio.run_coroutine_threadsafe(self.client.generate_json(problem, llm_model, use_cache), self.loop)
+
+    def submit_stream(self, problem: str, on_chunk: Callable[[str], None], llm_model: str = "Gemini",
+                      use_cache: bool = True) -> Future:
+        # on_chunk is called from the event loop thread
+        return asyncio.run_coroutine_threadsafe(self.client.stream_json(problem, on_chunk, llm_model, use_cache),
+                                                self.loop)
+
+
+runner: AsyncRunner | None = None
+
+
+def get_runner() -> AsyncRunner:
+    global runner
+    if runner is None:
+        runner = AsyncRunner()
+    return runner
+
+
+async def run_batch(problems: list[str], llm_model: str, use_cache: bool) -> None:
+    client = LlmClient()
+    results = await client.generate_many(problems, llm_model, use_cache)
+
+    for (i, result) in enumerate(results, start=1):
+        if isinstance(result, BaseException):
+            print(json.dumps({"id": i, "error": repr(result)}))
+            continue
+        try:
+            (scene, fixes) = load_scene_json(result)
+        except Exception as e:
+            print(json.dumps({"id": i, "error": str(e), "response": result}))
+            continue
+        print(json.dumps({"id": i, "scene": scene, **({"repaired": fixes} if fixes else {})}))
+
+
+def main(argv: list[str] | None = None) -> None:
+    # Output lines are {"id": ..., "scene": {...}}, which headless_solver.py reads directly
+    parser = argparse.ArgumentParser(description="Extract scene jsons for many problems concurrently.")
+    parser.add_argument("input", help="text file with one problem per line, or - for stdin")
+    parser.add_argument("--model", choices=["Gemini", "ChatGPT"], default="Gemini")
+    parser.add_argument("--concurrency", type=int, default=gp.llm_max_concurrency)
+    parser.add_argument("--no-cache", action="store_true", help="always ask the provider")
+    args = parser.parse_args(argv)
+
+    file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with file:
+        problems = [line.strip() for line in file if line.strip()]
+
+    gp.llm_max_concurrency = args.concurrency
+    asyncio.run(run_batch(problems, args.model, not args.no_cache))
+
+
+if __name__ == "__main__":
+    main()
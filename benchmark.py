@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import global_params as gp
+from simulation import run_until_converged, create_engine, parse_scene, is_converged
+from rule_spec import get_rule_specs, get_residual, get_total_residual
+from headless_solver import read_scenes
+from integrators import integrators
+
+benchmark_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+default_scenes = os.path.join(benchmark_dir, "scenes")
+default_baseline = os.path.join(benchmark_dir, "baseline.json")
+
+# Differences below these are noise, whatever the relative threshold says
+min_iterations_slack = 5
+min_time_slack = 0.005
+
+
+def solve_once(json_str: str, seed: int, mode: str, max_iterations: int) -> dict:
+    random.seed(seed)
+    start = time.perf_counter()
+
+    (sim_points, _, rules) = parse_scene(json_str)
+    engine = create_engine(sim_points, rules, mode)
+    if mode == "solve_fast":
+        (iterations, energy) = engine.solve(max_iterations)
+        engine.write_positions(sim_points)
+    else:
+        (iterations, energy) = run_until_converged(sim_points, rules, engine, max_iterations)
+
+    wall_time = time.perf_counter() - start
+    positions = {name: sim_point.position for (name, sim_point) in sim_points.items()}
+    specs = get_rule_specs(rules)
+    # Rules are keyed by (type, points...), e.g. "segment A B" in the json
+    residuals = {" ".join(key): abs(get_residual(spec, positions)) for (key, spec) in specs.items()}
+    converged = is_converged(engine, energy, get_total_residual(specs, positions))
+
+    return {
+        "iterations": iterations,
+        "converged": converged,
+        "wall_time": wall_time,
+        "residuals": residuals,
+    }
+
+
+def measure_memory(json_str: str, seed: int, mode: str, max_iterations: int) -> int:
+    # Separate run, tracing slows the solve down too much to time it at the same time
+    tracemalloc.start()
+    try:
+        solve_once(json_str, seed, mode, max_iterations)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scene(json_str: str, seeds: list[int], mode: str, max_iterations: int) -> dict:
+    runs = [solve_once(json_str, seed, mode, max_iterations) for seed in seeds]
+    worst = max(runs, key=lambda r: max(r["residuals"].values(), default=0))
+
+    return {
+        "iterations": statistics.median(r["iterations"] for r in runs),
+        "wall_time": statistics.median(r["wall_time"] for r in runs),
+        "converged": sum(r["converged"] for r in runs),
+        "max_residual": max(worst["residuals"].values(), default=0),
+        "residuals": worst["residuals"],
+        "peak_memory": measure_memory(json_str, seeds[0], mode, max_iterations),
+    }
+
+
+def compare(name: str, result: dict, base: dict, threshold: float) -> list[str]:
+    problems = []
+    if result["converged"] < base["converged"]:
+        problems.append(f"converged in {result['converged']} runs instead of {base['converged']}")
+    if result["iterations"] > base["iterations"] * (1 + threshold) + min_iterations_slack:
+        problems.append(f"iterations {base['iterations']:.0f} -> {result['iterations']:.0f}")
+    if result["wall_time"] > base["wall_time"] * (1 + threshold) + min_time_slack:
+        problems.append(f"wall time {base['wall_time'] * 1000:.1f} -> {result['wall_time'] * 1000:.1f} ms")
+    if result["max_residual"] > max(base["max_residual"] * 10, gp.residual_tolerance):
+        problems.append(f"max residual {base['max_residual']:.2e} -> {result['max_residual']:.2e}")
+    return [f"{name}: {problem}" for problem in problems]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Solve the benchmark corpus and compare against the baseline.")
+    parser.add_argument("scenes", nargs="?", default=default_scenes, help="directory of scene jsons or a .jsonl file")
+    parser.add_argument("--baseline", default=default_baseline)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--mode", choices=["animate", "solve_fast"], default="animate")
+    parser.add_argument("--engine", action=argparse.BooleanOptionalAction, default=True,
+                        help="animate with the vector engine instead of the Rule objects")
+    parser.add_argument("--integrator", choices=list(integrators), default=gp.integrator)
+    # Off by default: with it every fully determined scene is solved before the first iteration,
+    # and the comparison would no longer see the solver
+    parser.add_argument("--closed-form", action=argparse.BooleanOptionalAction, default=False,
+                        help="place the fully determined points analytically before seeding")
+    parser.add_argument("--seeding", action=argparse.BooleanOptionalAction, default=gp.constructive_seeding,
+                        help="construct the start positions from the rules instead of random ones")
+    parser.add_argument("--max-iterations", type=int, default=20000)
+    parser.add_argument("-o", "--output", help="also write the full results as json")
+    args = parser.parse_args(argv)
+
+    gp.use_vector_engine = args.engine
+    gp.integrator = args.integrator
+    gp.closed_form = args.closed_form
+    gp.constructive_seeding = args.seeding
+    config = {"mode": args.mode, "engine": args.engine, "integrator": args.integrator,
+              "closed_form": args.closed_form, "seeding": args.seeding, "seeds": args.seeds,
+              "max_iterations": args.max_iterations}
+
+    results: dict[str, dict] = {}
+    print(f"{'scene':<32}{'iterations':>11}{'ms':>9}{'converged':>11}{'max residual':>14}{'peak KB':>9}")
+    for (scene_id, json_str) in read_scenes(args.scenes):
+        name = os.path.splitext(str(scene_id))[0]
+        try:
+            result = run_scene(json_str, args.seeds, args.mode, args.max_iterations)
+        except Exception as e:
+            print(f"Warning: {name} failed: {e}")
+            continue
+        results[name] = result
+        print(f"{name:<32}{result['iterations']:>11.0f}{result['wall_time'] * 1000:>9.1f}"
+              f"{result['converged']:>8}/{len(args.seeds)}{result['max_residual']:>14.2e}"
+              f"{result['peak_memory'] / 1024:>9.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"config": config, "results": results}, file, indent=2)
+
+    # The baseline file keeps one entry per configuration, a run only compares with the one recorded the same way
+    baselines = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baselines = json.load(file)["baselines"]
+    baseline = next((entry for entry in baselines if entry["config"] == config), None)
+
+    if args.save_baseline:
+        baselines = [entry for entry in baselines if entry is not baseline] + [{"config": config, "results": results}]
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({"baselines": baselines}, file, indent=2)
+            file.write("\n")
+        print(f"Baseline for {config} written to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"Warning: no baseline recorded with {config}, run with --save-baseline first.")
+        return
+
+    regressions = []
+    for (name, result) in results.items():
+        if name in baseline["results"]:
+            regressions += compare(name, result, baseline["results"][name], args.threshold)
+        else:
+            print(f"Warning: {name} is not in the baseline.")
+
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    print(f"{len(regressions)} regressions in {len(results)} scenes (threshold {args.threshold:.0%}).")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+from xml.sax.saxutils import escape
+
+import global_params as gp
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint
+from canvas_items import PointItem, SegmentItem, CircleItem
+from camera import Camera, get_bounds
+from headless_solver import solve_scene, read_scenes
+from simulation import parse_scene
+
+# Same look as the Tk canvas items
+point_color = "#000000"
+segment_color = "#333333"
+circle_color = "#3366cc"
+font_family = "Helvetica"
+font_size = 14
+
+
+def get_shapes(sim_points: dict[str, SimPoint], drawables: dict, width: int, height: int) -> list[tuple]:
+    # The drawing of a solved scene in canvas coordinates:
+    # ("circle", [x0, y0, x1, y1]), ("line", [x0, y0, x1, y1]) and ("point", oval, text position, name),
+    # circles first and points last, so the points stay on top as on the canvas
+    # Unlike the live view, circles are inside the fit too, nothing may be cut off on paper
+    bounds = get_bounds(list(sim_points.values()))
+    for drawable in drawables.values():
+        item = getattr(drawable, "item", None)
+        if isinstance(item, CircleItem):
+            coords = item.get_coords([sim_point.position for sim_point in item.sim_points])
+            if coords is not None:
+                bounds = [min(bounds[0], coords[0]), min(bounds[1], coords[1]),
+                          max(bounds[2], coords[2]), max(bounds[3], coords[3])]
+
+    camera = Camera()
+    camera.fit(bounds, width, height)
+    (tx, ty) = (camera.translation.x, camera.translation.y)
+    scale = camera.scale
+
+    def to_canvas(sim_point: SimPoint) -> Vector2:
+        return Vector2((sim_point.position.x + tx) * scale, (sim_point.position.y + ty) * scale)
+
+    circles = []
+    lines = []
+    points = []
+    for drawable in drawables.values():
+        item = getattr(drawable, "item", None)
+        if item is None:
+            continue
+        positions = [to_canvas(sim_point) for sim_point in item.sim_points]
+        if isinstance(item, PointItem):
+            (oval, text) = item.get_coords(positions[0])
+            points.append(("point", oval, text, item.name))
+        elif isinstance(item, SegmentItem):
+            lines.append(("line", [positions[0].x, positions[0].y, positions[1].x, positions[1].y]))
+        elif isinstance(item, CircleItem):
+            coords = item.get_coords(positions)
+            if coords is not None:
+                circles.append(("circle", coords))
+
+    return circles + lines + points
+
+
+class BlueprintRenderer:
+    # Draws a solved scene to a file without Tk. The file is written next to its final path and moved there
+    # when complete, so parallel exports never leave half written blueprints behind.
+    def __init__(self, width: int | None = None, height: int | None = None):
+        self.width = width or gp.export_width
+        self.height = height or gp.export_height
+
+    def render(self, sim_points: dict[str, SimPoint], drawables: dict, path: str) -> None:
+        shapes = get_shapes(sim_points, drawables, self.width, self.height)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        self.write(shapes, temp_path)
+        os.replace(temp_path, path)
+
+    def write(self, shapes: list[tuple], path: str) -> None:
+        raise NotImplementedError
+
+
+class SvgRenderer(BlueprintRenderer):
+    def write(self, shapes: list[tuple], path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                       f'viewBox="0 0 {self.width} {self.height}">\n')
+            file.write(f'<rect width="100%" height="100%" fill="{gp.export_background}"/>\n')
+            file.write(f'<g font-family="{font_family}, Arial, sans-serif" font-size="{font_size}pt" '
+                       f'font-weight="bold" text-anchor="middle" dominant-baseline="central">\n')
+
+            for shape in shapes:
+                if shape[0] == "circle":
+                    (x0, y0, x1, y1) = shape[1]
+                    file.write(f'<circle cx="{(x0 + x1) / 2:.2f}" cy="{(y0 + y1) / 2:.2f}" r="{(x1 - x0) / 2:.2f}" '
+                               f'fill="none" stroke="{circle_color}" stroke-width="{gp.line_width}"/>\n')
+                elif shape[0] == "line":
+                    (x0, y0, x1, y1) = shape[1]
+                    file.write(f'<line x1="{x0:.2f}" y1="{y0:.2f}" x2="{x1:.2f}" y2="{y1:.2f}" '
+                               f'stroke="{segment_color}" stroke-width="{gp.line_width}" '
+                               f'stroke-linecap="round"/>\n')
+                else:
+                    ((x0, y0, x1, y1), (text_x, text_y), name) = shape[1:]
+                    file.write(f'<circle cx="{(x0 + x1) / 2:.2f}" cy="{(y0 + y1) / 2:.2f}" r="{(x1 - x0) / 2:.2f}" '
+                               f'fill="{point_color}"/>\n')
+                    file.write(f'<text x="{text_x:.2f}" y="{text_y:.2f}" fill="{point_color}">'
+                               f'{escape(name)}</text>\n')
+
+            file.write("</g>\n</svg>\n")
+
+
+class PngRenderer(BlueprintRenderer):
+    # pygame is only needed here, and drawn at gp.export_supersample times the size and scaled down
+    # for smooth edges
+    fonts: dict = {}
+
+    def write(self, shapes: list[tuple], path: str) -> None:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        # Keeps the pygame banner out of the result lines on stdout
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        try:
+            import pygame
+        except ImportError:
+            raise Exception("Error: png export needs pygame, use svg instead.")
+
+        k = gp.export_supersample
+        surface = pygame.Surface((self.width * k, self.height * k))
+        surface.fill(gp.export_background)
+        # pygame's default font is small for its size, twice the point size comes close to the Tk label
+        font = self.get_font(pygame, font_size * 2 * k)
+
+        for shape in shapes:
+            if shape[0] == "circle":
+                (x0, y0, x1, y1) = shape[1]
+                pygame.draw.circle(surface, circle_color, ((x0 + x1) / 2 * k, (y0 + y1) / 2 * k),
+                                   (x1 - x0) / 2 * k, gp.line_width * k)
+            elif shape[0] == "line":
+                (x0, y0, x1, y1) = shape[1]
+                pygame.draw.line(surface, segment_color, (x0 * k, y0 * k), (x1 * k, y1 * k), gp.line_width * k)
+                # Round caps like the svg
+                for (x, y) in [(x0, y0), (x1, y1)]:
+                    pygame.draw.circle(surface, segment_color, (x * k, y * k), gp.line_width * k / 2)
+            else:
+                ((x0, y0, x1, y1), (text_x, text_y), name) = shape[1:]
+                pygame.draw.circle(surface, point_color, ((x0 + x1) / 2 * k, (y0 + y1) / 2 * k), (x1 - x0) / 2 * k)
+                text = font.render(name, True, point_color)
+                surface.blit(text, text.get_rect(center=(text_x * k, text_y * k)))
+
+        if k != 1:
+            surface = pygame.transform.smoothscale(surface, (self.width, self.height))
+        # pygame reads the format from a file name's extension, the temp file has none, so pass a file and name it
+        with open(path, "wb") as file:
+            pygame.image.save(surface, file, "png")
+
+    @classmethod
+    def get_font(cls, pygame, size: int):
+        if size not in cls.fonts:
+            # pygame's bundled bold sans font, so the output does not depend on the installed fonts
+            pygame.font.init()
+            cls.fonts[size] = pygame.font.Font(None, size)
+        return cls.fonts[size]
+
+
+renderers = {
+    "svg": SvgRenderer,
+    "png": PngRenderer,
+}
+
+
+def export_scene(json_str: str, paths: list[str], width: int | None = None, height: int | None = None,
+                 **solve_options) -> dict:
+    # Solves one scene and writes it to every path, the format follows the extension.
+    # Parsed once here: the solve moves these points, and they are rendered as they are
+    start = time.perf_counter()
+    if solve_options.get("seed") is not None:
+        random.seed(solve_options["seed"])
+    (sim_points, drawables, rules) = parse_scene(json_str)
+    result = solve_scene(json_str, parsed=[sim_points, drawables, rules], **solve_options)
+    solve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        renderers[os.path.splitext(path)[1][1:]](width, height).render(sim_points, drawables, path)
+
+    return {
+        "files": paths,
+        "converged": result["converged"],
+        "residual": result["residual"],
+        "solve_time": solve_time,
+        "render_time": time.perf_counter() - start,
+    }
+
+
+def export_job(job: tuple) -> dict:
+    (scene_id, json_str, output_dir, formats, width, height, solve_options) = job
+    name = re.sub(r"[^\w.-]", "_", os.path.splitext(str(scene_id))[0])
+    paths = [os.path.join(output_dir, f"{name}.{fmt}") for fmt in formats]
+
+    try:
+        return {"id": scene_id, **export_scene(json_str, paths, width, height, **solve_options)}
+    except Exception as e:
+        return {"id": scene_id, "error": str(e)}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Solve scene jsons and export them as svg/png blueprints.")
+    parser.add_argument("input", help="directory of .json scenes, a .jsonl file, or - for jsonl on stdin")
+    parser.add_argument("-o", "--output-dir", default="blueprints")
+    parser.add_argument("-f", "--format", nargs="+", choices=list(renderers), default=["svg"])
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--width", type=int, default=gp.export_width)
+    parser.add_argument("--height", type=int, default=gp.export_height)
+    parser.add_argument("--max-iterations", type=int, default=10000)
+    parser.add_argument("--engine", action="store_true", help="use the batched numpy engine")
+    parser.add_argument("--mode", choices=["animate", "solve_fast"], default="animate")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random start positions")
+    parser.add_argument("--layout-cache", action="store_true", help="reuse solved layouts from gp.layout_cache_dir")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    solve_options = {"max_iterations": args.max_iterations, "use_engine": args.engine, "seed": args.seed,
+                     "mode": args.mode, "use_layout_cache": args.layout_cache}
+    jobs = ((scene_id, json_str, args.output_dir, args.format, args.width, args.height, solve_options)
+            for (scene_id, json_str) in read_scenes(args.input))
+
+    # One result line per scene in index.jsonl, in the order they finish
+    (exported, failed) = (0, 0)
+    start = time.perf_counter()
+    with open(os.path.join(args.output_dir, "index.jsonl"), "w", encoding="utf-8") as index, \
+            multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(export_job, jobs, chunksize=4):
+            if "error" in result:
+                failed += 1
+                print(f"Warning: {result['id']} could not be exported: {result['error']}", file=sys.stderr)
+            else:
+                exported += 1
+            index.write(json.dumps(result) + "\n")
+            index.flush()
+    print(f"{exported} scenes exported to {args.output_dir} in {time.perf_counter() - start:.1f} s, {failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
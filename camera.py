@@ -0,0 +1,71 @@
+from vector2 import Vector2
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint
+
+
+def get_bounds(sim_points: list[SimPoint]) -> [float, float, float, float]:
+    # left, top, right, bottom in one pass per axis through the builtin min/max
+    xs = [sim_point.position.x for sim_point in sim_points]
+    ys = [sim_point.position.y for sim_point in sim_points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def get_array_bounds(positions) -> [float, float, float, float]:
+    # Same for an (n, 2) numpy array, e.g. VectorEngine.positions
+    (left, top) = positions.min(axis=0).tolist()
+    (right, bottom) = positions.max(axis=0).tolist()
+    return [left, top, right, bottom]
+
+
+class Camera:
+    # World to canvas transform that only refits when it has to: the canvas was resized, the figure left the
+    # view minus gp.camera_margin, or it shrank below gp.camera_min_fill of the view.
+    # In between the transform stays fixed, so points that do not move keep their canvas position.
+    def __init__(self):
+        self.scale = 1.0
+        self.translation = Vector2(0, 0)
+        self.canvas_size: tuple[int, int] | None = None
+        # Visible world rectangle as left, top, right, bottom
+        self.view: list[float] | None = None
+
+    def update(self, bounds: list[float], width: int, height: int) -> bool:
+        # Returns whether the transform changed
+        if (width, height) != self.canvas_size or self.view is None or self.needs_fit(bounds):
+            self.fit(bounds, width, height)
+            return True
+        return False
+
+    def needs_fit(self, bounds: list[float]) -> bool:
+        (left, top, right, bottom) = bounds
+        (view_left, view_top, view_right, view_bottom) = self.view
+        margin_x = (view_right - view_left) * gp.camera_margin
+        margin_y = (view_bottom - view_top) * gp.camera_margin
+
+        if (left < view_left + margin_x or right > view_right - margin_x
+                or top < view_top + margin_y or bottom > view_bottom - margin_y):
+            return True
+
+        fill = max((right - left) / (view_right - view_left), (bottom - top) / (view_bottom - view_top))
+        return fill < gp.camera_min_fill
+
+    def fit(self, bounds: list[float], width: int, height: int) -> None:
+        (left, top, right, bottom) = bounds
+        self.canvas_size = (width, height)
+
+        # Scales for each axis, required for all points to fit on screen
+        scale_x = width / (max(right - left, 1e-6) * gp.camera_padding)
+        scale_y = height / (max(bottom - top, 1e-6) * gp.camera_padding)
+        self.scale = min(scale_x, scale_y)
+
+        points_center = Vector2((left + right) / 2, (top + bottom) / 2)
+        screen_center = Vector2(width, height) / 2
+        self.translation = -points_center + (1 / self.scale) * screen_center
+
+        half_width = width / self.scale / 2
+        half_height = height / self.scale / 2
+        self.view = [points_center.x - half_width, points_center.y - half_height,
+                     points_center.x + half_width, points_center.y + half_height]
+
+    def reset(self) -> None:
+        # Fit again on the next update, e.g. for a new scene
+        self.view = None
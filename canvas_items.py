@@ -0,0 +1,132 @@
+from typing import TYPE_CHECKING
+
+import global_params as gp
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint
+from geom_utils import get_inscribed_circle, get_circumscribed_circle
+
+if TYPE_CHECKING:
+    import tkinter as tk
+
+
+class CanvasItem:
+    # Retained Tk canvas items of one drawable.
+    # The items are created on the first sync and afterwards only moved with canvas.coords,
+    # and only when one of the points moved at least gp.canvas_min_move_dst since it was last drawn.
+    tag: str = "item"
+
+    def __init__(self, sim_points: list[SimPoint]):
+        self.sim_points = sim_points
+        self.item_ids: list[int] = []
+        self.drawn_positions: list[Vector2] | None = None
+
+    def is_dirty(self) -> bool:
+        if self.drawn_positions is None:
+            return True
+
+        min_move_sq = gp.canvas_min_move_dst * gp.canvas_min_move_dst
+        for (sim_point, drawn) in zip(self.sim_points, self.drawn_positions):
+            if sim_point.canvas_position.distance_squared_to(drawn) >= min_move_sq:
+                return True
+        return False
+
+    def sync(self, canvas: "tk.Canvas") -> bool:
+        # Returns whether the canvas was touched
+        if not self.is_dirty():
+            return False
+
+        positions = [Vector2(sim_point.canvas_position) for sim_point in self.sim_points]
+        if not self.item_ids:
+            self.item_ids = self.create(canvas, positions)
+        else:
+            self.move(canvas, positions)
+        self.drawn_positions = positions
+        return True
+
+    def create(self, canvas: "tk.Canvas", positions: list[Vector2]) -> list[int]:
+        raise NotImplementedError
+
+    def move(self, canvas: "tk.Canvas", positions: list[Vector2]) -> None:
+        raise NotImplementedError
+
+
+class PointItem(CanvasItem):
+    tag = "point"
+
+    def __init__(self, sim_point: SimPoint, name: str):
+        super().__init__([sim_point])
+        self.name = name
+
+    @staticmethod
+    def get_coords(position: Vector2) -> [list[float], list[float]]:
+        r = gp.point_radius
+        text_offset = gp.text_offset_len / 1.4142
+        return [[position.x - r, position.y - r, position.x + r, position.y + r],
+                [position.x - text_offset, position.y - text_offset]]
+
+    def create(self, canvas: "tk.Canvas", positions: list[Vector2]) -> list[int]:
+        (oval, text) = self.get_coords(positions[0])
+        ids = [canvas.create_oval(*oval, fill="black", outline="", tags=self.tag),
+               canvas.create_text(*text, text=self.name, font=("Helvetica", 14, "bold"), tags=self.tag)]
+        # Points stay on top of segments and circles that are created later
+        canvas.tag_raise(self.tag)
+        return ids
+
+    def move(self, canvas: "tk.Canvas", positions: list[Vector2]) -> None:
+        (oval, text) = self.get_coords(positions[0])
+        canvas.coords(self.item_ids[0], *oval)
+        canvas.coords(self.item_ids[1], *text)
+
+
+class SegmentItem(CanvasItem):
+    tag = "segment"
+
+    def __init__(self, a: SimPoint, b: SimPoint):
+        super().__init__([a, b])
+
+    def create(self, canvas: "tk.Canvas", positions: list[Vector2]) -> list[int]:
+        (a, b) = positions
+        ids = [canvas.create_line(a.x, a.y, b.x, b.y, width=gp.line_width, fill="#333333", tags=self.tag)]
+        canvas.tag_raise("point")
+        return ids
+
+    def move(self, canvas: "tk.Canvas", positions: list[Vector2]) -> None:
+        (a, b) = positions
+        canvas.coords(self.item_ids[0], a.x, a.y, b.x, b.y)
+
+
+class CircleItem(CanvasItem):
+    tag = "circle"
+
+    def __init__(self, figure: list[SimPoint], inscribed: bool):
+        super().__init__(figure)
+        self.inscribed = inscribed
+        self.hidden = False
+
+    def get_coords(self, positions: list[Vector2]) -> list[float] | None:
+        try:
+            if self.inscribed:
+                (center, radius) = get_inscribed_circle(*positions[:3])
+            else:
+                (center, radius) = get_circumscribed_circle(*positions[:3])
+        except ZeroDivisionError:
+            return None
+        if center is None:
+            return None
+        return [center.x - radius, center.y - radius, center.x + radius, center.y + radius]
+
+    def create(self, canvas: "tk.Canvas", positions: list[Vector2]) -> list[int]:
+        ids = [canvas.create_oval(0, 0, 0, 0, width=gp.line_width, outline="#3366cc", tags=self.tag)]
+        canvas.tag_raise("point")
+        self.item_ids = ids
+        self.move(canvas, positions)
+        return ids
+
+    def move(self, canvas: "tk.Canvas", positions: list[Vector2]) -> None:
+        coords = self.get_coords(positions)
+        if (coords is None) != self.hidden:
+            # Degenerate triangle, no circle to show
+            self.hidden = coords is None
+            canvas.itemconfigure(self.item_ids[0], state="hidden" if self.hidden else "normal")
+        if coords is not None:
+            canvas.coords(self.item_ids[0], *coords)
@@ -0,0 +1,269 @@
+import math
+
+import global_params as gp
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import RuleSpec, DrawableSpec, get_rule_specs, get_drawable_specs, get_residual, get_total_residual, \
+    ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO, LINE, CIRCLE
+from geom_utils import get_inscribed_circle, get_circumscribed_circle, get_circle_intersections, \
+    find_line_intersection, project_on_line
+from seeding import SceneKnowledge, pick_side, seed_positions
+
+# A locus is ("line", point, direction) or ("circle", center, radius)
+
+
+def get_line_circle_intersections(point: Vector2, direction: Vector2, center: Vector2, radius: float) -> list[Vector2]:
+    a = direction.length_squared()
+    if a == 0:
+        return []
+    offset = point - center
+    b = 2 * direction.dot(offset)
+    c = offset.length_squared() - radius ** 2
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return []
+    root = math.sqrt(discriminant)
+    return [point + ((-b + root) / (2 * a)) * direction, point + ((-b - root) / (2 * a)) * direction]
+
+
+def intersect_loci(locus_1: tuple, locus_2: tuple) -> list[Vector2]:
+    if locus_1[0] == "circle" and locus_2[0] == "line":
+        (locus_1, locus_2) = (locus_2, locus_1)
+
+    if locus_1[0] == "line" and locus_2[0] == "line":
+        intersection = find_line_intersection(locus_1[1], locus_1[2], locus_2[1], locus_2[2])
+        return [intersection] if intersection is not None else []
+    elif locus_1[0] == "line":
+        return get_line_circle_intersections(locus_1[1], locus_1[2], locus_2[1], locus_2[2])
+    else:
+        return get_circle_intersections(locus_1[1], locus_1[2], locus_2[1], locus_2[2])
+
+
+def get_loci(spec: RuleSpec, x: str, placed: dict[str, Vector2], knowledge: SceneKnowledge) -> list[tuple]:
+    # Where x can be by this rule alone, given that its other points are placed.
+    # The loci may be too wide (whole lines for rays and segments), the candidates are checked against the rules later
+    p = spec.points
+    if spec.rule_type == SEGMENT:
+        other = p[1] if p[0] == x else p[0]
+        return [("circle", placed[other], spec.value)]
+
+    elif spec.rule_type == ANGLE:
+        angle = math.radians(spec.value)
+        if p[1] != x:
+            # Two rays from the placed vertex
+            (vertex, other) = (placed[p[1]], placed[p[2] if p[0] == x else p[0]])
+            if vertex == other:
+                return []
+            base = other - vertex
+            return [("line", vertex, base.rotate(spec.value)), ("line", vertex, base.rotate(-spec.value))]
+        # x sees the placed ends under the angle: two arcs of the inscribed angle theorem
+        (a, c) = (placed[p[0]], placed[p[2]])
+        chord = c - a
+        if chord.length_squared() == 0 or math.sin(angle) == 0:
+            return []
+        middle = (a + c) / 2
+        normal = Vector2(-chord.y, chord.x) / 2 / math.tan(angle)
+        radius = chord.magnitude() / (2 * math.sin(angle))
+        if spec.value == 90:
+            return [("circle", middle, radius)]
+        return [("circle", middle + normal, radius), ("circle", middle - normal, radius)]
+
+    elif spec.rule_type == POINT_ON_SEGMENT:
+        # On the line through the two placed points, whichever of the three x is
+        (a, b) = [placed[q] for q in p if q != x]
+        return [("line", a, b - a)] if a != b else []
+
+    elif spec.rule_type == RATIO:
+        segments = [p[:2], p[2:]]
+        ratio = spec.value
+        if x in segments[1] and x not in segments[0]:
+            (segments, ratio) = ([segments[1], segments[0]], 1 / ratio)
+        # |x a| = ratio * |c d|
+        a = placed[segments[0][1] if segments[0][0] == x else segments[0][0]]
+        if x not in segments[1]:
+            return [("circle", a, ratio * (placed[segments[1][0]] - placed[segments[1][1]]).magnitude())]
+        if x in segments[0] and x in segments[1] and segments[0] != segments[1]:
+            # |x a| = ratio * |x b|: perpendicular bisector or Apollonius circle
+            b = placed[segments[1][1] if segments[1][0] == x else segments[1][0]]
+            if a == b:
+                return []
+            if ratio == 1:
+                return [("line", (a + b) / 2, Vector2(-(b - a).y, (b - a).x))]
+            center = (a - ratio ** 2 * b) / (1 - ratio ** 2)
+            return [("circle", center, ratio * (a - b).magnitude() / abs(1 - ratio ** 2))]
+
+    return []
+
+
+def get_error(specs: list[RuleSpec], positions: dict[str, Vector2]) -> float:
+    return sum(get_residual(spec, positions) ** 2 for spec in specs)
+
+
+def place_by_loci(specs: list[RuleSpec], placed: dict[str, Vector2], x: str,
+                  knowledge: SceneKnowledge) -> Vector2 | None:
+    # Exact position of x where two loci of its rules to placed points meet, if one satisfies all of those rules
+    rules = [spec for spec in specs if x in spec.points and all(p == x or p in placed for p in spec.points)]
+    loci = [locus for spec in rules for locus in get_loci(spec, x, placed, knowledge)]
+
+    candidates = []
+    for i in range(len(loci)):
+        for j in range(i + 1, len(loci)):
+            for candidate in intersect_loci(loci[i], loci[j]):
+                if get_error(rules, {**placed, x: candidate}) < gp.residual_tolerance and \
+                        all((candidate - c).length_squared() > gp.residual_tolerance for c in candidates):
+                    candidates.append(candidate)
+
+    return pick_side(candidates, x, placed, knowledge, knowledge.neighbours.get(x, [])) if candidates else None
+
+
+def get_circle_points(circle: DrawableSpec, specs: list[RuleSpec]) -> [str | None, list[tuple]]:
+    # The center of an inscribed/circumscribed circle is the point joined to all its radii by the segment and ratio
+    # rules utils.create_*_circle_rules makes. The radii end in the figure points or, inscribed, in the touch points
+    # (point_on_segment on a side), returned as (touch point, side start, side end)
+    figure = circle.points
+    sides = {frozenset([figure[i], figure[(i + 1) % len(figure)]]) for i in range(len(figure))}
+    touches = [(spec.points[0], spec.points[1], spec.points[2]) for spec in specs
+               if spec.rule_type == POINT_ON_SEGMENT and frozenset(spec.points[1:]) in sides]
+
+    pairs = set()
+    for spec in specs:
+        if spec.rule_type == SEGMENT:
+            pairs.add(frozenset(spec.points))
+        elif spec.rule_type == RATIO:
+            pairs.update([frozenset(spec.points[:2]), frozenset(spec.points[2:])])
+
+    centers = [circle.center] if circle.center is not None else sorted({p for pair in pairs for p in pair} - set(figure))
+    for center in centers:
+        if circle.inscribed:
+            # Other points on the sides (midpoints, feet) are not joined to the center
+            own_touches = [t for t in touches if frozenset([center, t[0]]) in pairs]
+            if {frozenset(t[1:]) for t in own_touches} == sides:
+                return [center, own_touches]
+        elif all(frozenset([center, p]) in pairs for p in figure):
+            return [center, []]
+    return [None, []]
+
+
+def place_circles(specs: list[RuleSpec], drawables: dict, placed: dict[str, Vector2]) -> bool:
+    # Centers (and touch points) of the circles whose triangle is placed, straight from geom_utils
+    progress = False
+    for circle in get_drawable_specs(drawables):
+        if circle.kind != CIRCLE or len(circle.points) != 3 or any(name not in placed for name in circle.points):
+            continue
+        (center_name, touches) = get_circle_points(circle, specs)
+        if center_name is None or center_name in placed:
+            continue
+
+        (a, b, c) = [placed[name] for name in circle.points]
+        (center, _) = get_inscribed_circle(a, b, c) if circle.inscribed else get_circumscribed_circle(a, b, c)
+        if center is None:
+            continue
+        positions = {center_name: center}
+        for (touch, start, end) in touches:
+            if touch not in placed:
+                positions[touch] = project_on_line(center, placed[start], placed[end])
+
+        # A given radius may not fit the triangle, then the circle is left to the solver
+        new_placed = {**placed, **positions}
+        rules = [spec for spec in specs if any(p in positions for p in spec.points) and
+                 all(p in new_placed for p in spec.points)]
+        if get_error(rules, new_placed) < gp.residual_tolerance:
+            placed.update(positions)
+            progress = True
+    return progress
+
+
+def get_default_polygon(polygon: list[str], placed: dict[str, Vector2], length: float) -> dict[str, Vector2]:
+    # The polygon drawn as a regular one with the given side length, turned and scaled onto its first two placed
+    # vertices (or moved onto the first one). Starts at the origin if none of it is placed yet
+    default = {polygon[0]: Vector2(0, 0)}
+    for i in range(1, len(polygon)):
+        default[polygon[i]] = default[polygon[i - 1]] + Vector2(length, 0).rotate(360 * (i - 1) / len(polygon))
+
+    anchors = [p for p in polygon if p in placed][:2]
+    if len(anchors) == 2 and default[anchors[0]] != default[anchors[1]]:
+        (u, v) = anchors
+        (d, e) = (default[v] - default[u], placed[v] - placed[u])
+        (angle, scale) = (d.angle_to(e), e.magnitude() / d.magnitude())
+        return {p: placed[u] + scale * (position - default[u]).rotate(angle) for (p, position) in default.items()}
+    elif anchors:
+        return {p: placed[anchors[0]] + position - default[anchors[0]] for (p, position) in default.items()}
+    return default
+
+
+def place_free(specs: list[RuleSpec], placed: dict[str, Vector2], knowledge: SceneKnowledge,
+               polygons: list[list[str]]) -> bool:
+    # Nothing is determined: start the next figure that has no rule with the placed ones.
+    # Where a figure starts and how it is turned is free, so everything placed stays exact.
+    # A pair inside a drawn polygon goes where the regular polygon fitted to its placed vertices has it, so
+    # the drawing keeps its shape instead of ending up on one line; other pairs start right of the placed ones.
+    # Without any length the scale is free too, the first segment gets the default length
+    pairs = list(knowledge.lengths.items()) or [(frozenset(spec.points[:2]), knowledge.default_length)
+                                                for spec in specs if spec.rule_type in (ANGLE, RATIO)]
+    for (pair, length) in pairs:
+        (a, b) = sorted(pair)
+        if a in placed or b in placed or \
+                any(p in placed for p in knowledge.neighbours[a] + knowledge.neighbours[b]):
+            continue
+        start = Vector2(*gp.seed_origin)
+        if placed:
+            start = Vector2(max(p.x for p in placed.values()) + 2 * knowledge.default_length, gp.seed_origin[1])
+
+        direction = Vector2(1, 0)
+        around = [polygon for polygon in polygons if a in polygon and b in polygon]
+        if around:
+            polygon = max(around, key=lambda polygon: sum(p in placed for p in polygon))
+            default = get_default_polygon(polygon, placed, length)
+            if any(p in placed for p in polygon):
+                start = default[a]
+            direction = (default[b] - default[a]).normalize()
+        placed[a] = start
+        placed[b] = start + length * direction
+        return True
+
+    return False
+
+
+def solve_closed_form(sim_points: dict[str, SimPoint], rules: dict, drawables: dict) -> dict[str, Vector2]:
+    # Analytic stage before the seeding: places the points the rules fully determine, e.g. triangles given by SSS, SAS,
+    # ASA or a right angle and sides, chains of them (squares, regular polygons), feet, midpoints, intersections
+    # and the centers of inscribed/circumscribed circles. Every point is placed exactly where two of its rules to
+    # placed points meet and only if it satisfies all of them, so the result solves every rule inside it.
+    # Returns the exact positions; the points left out are underdetermined and up to the solver.
+    specs = list(get_rule_specs(rules).values())
+    knowledge = SceneKnowledge(specs)
+    polygons = list({tuple(spec.polygon): spec.polygon for spec in get_drawable_specs(drawables)
+                     if spec.kind == LINE and spec.polygon}.values())
+    points = [p for p in sim_points if p in knowledge.neighbours]
+    placed: dict[str, Vector2] = {}
+
+    while True:
+        if place_circles(specs, drawables, placed):
+            continue
+        position = None
+        for x in points:
+            if x not in placed:
+                position = place_by_loci(specs, placed, x, knowledge)
+                if position is not None:
+                    break
+        if position is not None:
+            placed[x] = position
+        elif not place_free(specs, placed, knowledge, polygons):
+            return placed
+
+
+def seed_around_exact(sim_points: dict[str, SimPoint], rules: dict, exact: dict[str, Vector2]) -> None:
+    # Seeds the points the closed form left out around the exact ones. Those can be pinned to a shape the rest
+    # does not fit (e.g. a triangle that more rules force to be equilateral), so then the plain seeding is tried
+    # too and the start with the smaller residual wins
+    seed_positions(sim_points, rules, exact)
+    specs = get_rule_specs(rules)
+    if all(name in exact for spec in specs.values() for name in spec.points):
+        return
+
+    around_exact = {name: Vector2(sim_point.position) for (name, sim_point) in sim_points.items()}
+    seed_positions(sim_points, rules)
+    plain = {name: sim_point.position for (name, sim_point) in sim_points.items()}
+    if get_total_residual(specs, around_exact) <= get_total_residual(specs, plain):
+        for (name, position) in around_exact.items():
+            sim_points[name].position.update(position)
@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import RuleSpec, get_rule_specs, ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO
+
+
+class CompiledScene:
+    # Compact form of a scene: point names interned to dense ids 0..n-1, every rule type as an index array
+    # with its target values (angles in radians). Only plain arrays, so it pickles to worker processes cheaply.
+    # The index arrays are already in numpy's native index type, the engines use them without a copy.
+    def __init__(self, names: list[str]):
+        self.names: list[str] = names
+        self.index: dict[str, int] = {name: i for (i, name) in enumerate(names)}
+        n = len(names)
+
+        self.positions = np.zeros((n, 2), dtype=np.float64)
+
+        self.angle_idx = np.zeros((0, 3), dtype=np.intp)
+        self.angle_values = np.zeros(0, dtype=np.float64)
+        self.segment_idx = np.zeros((0, 2), dtype=np.intp)
+        self.segment_values = np.zeros(0, dtype=np.float64)
+        self.on_segment_idx = np.zeros((0, 3), dtype=np.intp)
+        self.ratio_idx = np.zeros((0, 4), dtype=np.intp)
+        self.ratio_values = np.zeros(0, dtype=np.float64)
+
+    @classmethod
+    def compile(cls, sim_points: dict[str, SimPoint], rules: dict):
+        scene = cls(list(sim_points.keys()))
+        for (i, sim_point) in enumerate(sim_points.values()):
+            scene.positions[i, 0] = sim_point.position.x
+            scene.positions[i, 1] = sim_point.position.y
+        scene.add_specs(list(get_rule_specs(rules).values()))
+        return scene
+
+    @classmethod
+    def from_specs(cls, positions: dict[str, list[float]], specs: list[RuleSpec]):
+        scene = cls(list(positions.keys()))
+        scene.positions[:] = np.array(list(positions.values()), dtype=np.float64).reshape(-1, 2)
+        scene.add_specs(specs)
+        return scene
+
+    def add_specs(self, specs: list[RuleSpec]) -> None:
+        angles = [s for s in specs if s.rule_type == ANGLE]
+        self.angle_idx = self._index_array([s.points for s in angles], 3)
+        self.angle_values = np.array([math.radians(s.value) for s in angles], dtype=np.float64)
+
+        segments = [s for s in specs if s.rule_type == SEGMENT]
+        self.segment_idx = self._index_array([s.points for s in segments], 2)
+        self.segment_values = np.array([s.value for s in segments], dtype=np.float64)
+
+        on_segments = [s for s in specs if s.rule_type == POINT_ON_SEGMENT]
+        self.on_segment_idx = self._index_array([s.points for s in on_segments], 3)
+
+        ratios = [s for s in specs if s.rule_type == RATIO]
+        self.ratio_idx = self._index_array([s.points for s in ratios], 4)
+        self.ratio_values = np.array([s.value for s in ratios], dtype=np.float64)
+
+    def _index_array(self, point_lists: list[list[str]], width: int) -> np.ndarray:
+        idx = np.array([[self.index[p] for p in points] for points in point_lists], dtype=np.intp)
+        return idx.reshape(-1, width)
+
+    def copy(self, positions: np.ndarray | None = None):
+        # Shares the read-only rule arrays, only the positions are copied
+        scene = CompiledScene.__new__(CompiledScene)
+        scene.__dict__.update(self.__dict__)
+        scene.positions = np.array(self.positions if positions is None else positions, dtype=np.float64)
+        return scene
@@ -0,0 +1,194 @@
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import RuleSpec, get_rule_specs, get_drawable_specs, LINE, CIRCLE
+from compiled_scene import CompiledScene
+from multi_start import get_executor, solve_start
+
+
+class Piece:
+    # Rules that can be solved on their own, and the points they touch
+    def __init__(self, specs: list[RuleSpec]):
+        self.specs = specs
+        self.points: list[str] = []
+        for spec in specs:
+            self.points.extend(p for p in spec.points if p not in self.points)
+
+
+def get_blocks(specs: list[RuleSpec]) -> list[list[int]]:
+    # Biconnected blocks of the point/rule incidence graph (iterative Hopcroft-Tarjan), as lists of rule indices.
+    # Blocks that share a rule are merged, so the pieces only ever touch in single points.
+    adjacency: dict[tuple, list[tuple]] = {}
+    for (i, spec) in enumerate(specs):
+        for p in set(spec.points):
+            adjacency.setdefault(("r", i), []).append(("p", p))
+            adjacency.setdefault(("p", p), []).append(("r", i))
+
+    depth: dict[tuple, int] = {}
+    low: dict[tuple, int] = {}
+    blocks: list[set[int]] = []
+    edge_stack: list[tuple] = []
+
+    for root in adjacency:
+        if root in depth:
+            continue
+        depth[root] = low[root] = 0
+        stack = [(root, None, iter(adjacency[root]))]
+
+        while stack:
+            (node, parent, children) = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                stack.pop()
+                if parent is None:
+                    continue
+                low[parent] = min(low[parent], low[node])
+                if low[node] >= depth[parent]:
+                    # parent separates this block from the rest
+                    block = set()
+                    while True:
+                        edge = edge_stack.pop()
+                        block.update(n[1] for n in edge if n[0] == "r")
+                        if edge == (parent, node):
+                            break
+                    blocks.append(block)
+            elif child not in depth:
+                depth[child] = low[child] = depth[node] + 1
+                edge_stack.append((node, child))
+                stack.append((child, node, iter(adjacency[child])))
+            elif child != parent and depth[child] < depth[node]:
+                edge_stack.append((node, child))
+                low[node] = min(low[node], depth[child])
+
+    # Merge blocks split at a rule node
+    owner: dict[int, int] = {}
+    merged: list[set[int]] = []
+    for block in blocks:
+        targets = sorted({owner[r] for r in block if r in owner})
+        if targets:
+            into = targets[0]
+            for t in targets[1:]:
+                merged[into] |= merged[t]
+                for r in merged[t]:
+                    owner[r] = into
+                merged[t] = set()
+            merged[into] |= block
+        else:
+            into = len(merged)
+            merged.append(set(block))
+        for r in block:
+            owner[r] = into
+
+    return [sorted(block) for block in merged if block]
+
+
+def get_pieces(specs: list[RuleSpec]) -> list[Piece]:
+    return [Piece([specs[i] for i in block]) for block in get_blocks(specs)]
+
+
+def join_drawn_pieces(pieces: list[Piece], drawn: list[list[str]]) -> list[Piece]:
+    # A polygon side or circle without rules still holds its points together: pieces it runs between are solved
+    # as one piece from their seeded positions, so they keep the drawn shape instead of being moved apart
+    for points in drawn:
+        if any(all(p in piece.points for p in points) for piece in pieces):
+            continue
+        touching = [piece for piece in pieces if set(piece.points).intersection(points)]
+        if len(touching) > 1:
+            pieces = [piece for piece in pieces if piece not in touching]
+            pieces.append(Piece([spec for piece in touching for spec in piece.specs]))
+    return pieces
+
+
+def get_components(pieces: list[Piece]) -> list[list[Piece]]:
+    # Groups pieces that are connected through shared points
+    components: list[list[Piece]] = []
+    points: list[set[str]] = []
+
+    for piece in pieces:
+        touching = [i for i in range(len(components)) if points[i].intersection(piece.points)]
+        component = [piece]
+        component_points = set(piece.points)
+        for i in reversed(touching):
+            component = components.pop(i) + component
+            component_points |= points.pop(i)
+        components.append(component)
+        points.append(component_points)
+
+    return components
+
+
+def assemble(component: list[Piece], solved: dict[int, dict[str, list[float]]]) -> dict[str, list[float]]:
+    # Glue the pieces together by translating each one onto its already placed shared point
+    positions: dict[str, list[float]] = dict(solved[id(component[0])])
+    remaining = component[1:]
+
+    while remaining:
+        for piece in remaining:
+            shared = next((p for p in piece.points if p in positions), None)
+            if shared is None:
+                continue
+
+            piece_positions = solved[id(piece)]
+            dx = positions[shared][0] - piece_positions[shared][0]
+            dy = positions[shared][1] - piece_positions[shared][1]
+            for (name, (x, y)) in piece_positions.items():
+                positions.setdefault(name, [x + dx, y + dy])
+
+            remaining.remove(piece)
+            break
+
+    return positions
+
+
+def solve_decomposed(sim_points: dict[str, SimPoint], rules: dict, drawables: dict, mode: str | None = None,
+                     max_iterations: int | None = None, parallel: bool = True) -> dict[str, list[float]]:
+    # Solves every rigid piece of the scene on its own (in parallel if asked),
+    # then places connected pieces at their shared points and separate figures next to each other.
+    # The pieces are solved the way the caller solves the whole scene, gp.solver_mode if not given
+    mode = mode or gp.solver_mode
+    if max_iterations is None:
+        max_iterations = 200 if mode == "solve_fast" else 10000
+    drawn = [spec.points for spec in get_drawable_specs(drawables) if spec.kind in (LINE, CIRCLE)]
+    pieces = join_drawn_pieces(get_pieces(list(get_rule_specs(rules).values())), drawn)
+    jobs = [(CompiledScene.from_specs({p: [sim_points[p].position.x, sim_points[p].position.y]
+                                       for p in piece.points}, piece.specs), 0, mode, max_iterations)
+            for piece in pieces]
+
+    results = get_executor().map(solve_start, jobs) if parallel and len(jobs) > 1 else map(solve_start, jobs)
+    solved = {id(piece): result["points"] for (piece, result) in zip(pieces, results)}
+
+    # Figures drawn together with points outside them (e.g. a line to a point without rules) stay where they were
+    # solved, only the separate ones are lined up, right of those
+    positions: dict[str, list[float]] = {}
+    free_components = []
+    for component in get_components(pieces):
+        component_positions = assemble(component, solved)
+        if any(set(points) & component_positions.keys() and set(points) - component_positions.keys()
+               for points in drawn):
+            positions.update(component_positions)
+        else:
+            free_components.append(component_positions)
+
+    offset_x = None
+    if positions:
+        (left, right) = (min(x for (x, _) in positions.values()), max(x for (x, _) in positions.values()))
+        offset_x = right + 0.2 * max(right - left, 1)
+    for component_positions in free_components:
+        left = min(x for (x, _) in component_positions.values())
+        right = max(x for (x, _) in component_positions.values())
+        top = min(y for (_, y) in component_positions.values())
+        bottom = max(y for (_, y) in component_positions.values())
+
+        # Line the figures up from left to right
+        if offset_x is None:
+            offset_x = left
+        gap = 0.2 * max(right - left, bottom - top, 1)
+        for (name, (x, y)) in component_positions.items():
+            positions[name] = [x - left + offset_x, y]
+        offset_x += right - left + gap
+
+    # Points without rules keep their position
+    for (name, sim_point) in sim_points.items():
+        positions.setdefault(name, [sim_point.position.x, sim_point.position.y])
+
+    return positions
@@ -0,0 +1,66 @@
+import time
+from typing import Callable
+
+import global_params as gp
+
+
+class FrameScheduler:
+    # Runs as many solver steps per frame as fit into gp.solver_frame_budget of the frame interval,
+    # then renders once, so convergence speed depends on the CPU and not on the Tk timer.
+    # When Tk calls back late (the machine can not keep up) rendering is skipped for up to gp.max_frame_skip frames
+    # and the time goes to the solver instead.
+    def __init__(self, step: Callable[[], float], render: Callable[[], None]):
+        self.step = step
+        self.render = render
+
+        self.last_frame_start: float | None = None
+        self.skipped_in_row = 0
+
+        # Measurements, frame_time and render_time are moving averages in seconds
+        self.frames = 0
+        self.skipped_frames = 0
+        self.steps = 0
+        self.steps_per_frame = 0
+        self.frame_time = 0.0
+        self.render_time = 0.0
+
+    def get_interval(self) -> float:
+        return 1 / gp.target_fps
+
+    def run_frame(self) -> [float, float]:
+        # Returns the energy of the last step and the delay in seconds until the next frame should start
+        interval = self.get_interval()
+        frame_start = time.perf_counter()
+        late = self.last_frame_start is not None and frame_start - self.last_frame_start > 2 * interval
+        self.last_frame_start = frame_start
+
+        deadline = frame_start + interval * gp.solver_frame_budget
+        energy = self.step()
+        steps = 1
+        while (steps < gp.max_steps_per_frame and energy >= gp.convergence_threshold
+               and time.perf_counter() < deadline):
+            energy = self.step()
+            steps += 1
+
+        converged = energy < gp.convergence_threshold
+        if late and not converged and self.skipped_in_row < gp.max_frame_skip:
+            self.skipped_in_row += 1
+            self.skipped_frames += 1
+        else:
+            render_start = time.perf_counter()
+            self.render()
+            self.render_time = 0.9 * self.render_time + 0.1 * (time.perf_counter() - render_start)
+            self.skipped_in_row = 0
+
+        frame_end = time.perf_counter()
+        self.frames += 1
+        self.steps += steps
+        self.steps_per_frame = steps
+        self.frame_time = 0.9 * self.frame_time + 0.1 * (frame_end - frame_start)
+
+        return [energy, max(interval - (frame_end - frame_start), 0.001)]
+
+    def reset(self) -> None:
+        # After idling the gap to the last frame is no sign of a slow machine
+        self.last_frame_start = None
+        self.skipped_in_row = 0
@@ -1,4 +1,4 @@
-from pygame import Vector2
+from vector2 import Vector2
 
 
 def get_shortest_vector(point: Vector2, seg_a: Vector2, seg_b: Vector2) -> Vector2:
@@ -23,7 +23,7 @@ def find_line_intersection(line1_offset: Vector2, line1_dir: Vector2,
 
     # Solve 2x2 LSE
     if line1_dir.x == 0:
-        (line1_offset, line1_dir) = (line2_offset, line2_dir)
+        (line1_offset, line1_dir, line2_offset, line2_dir) = (line2_offset, line2_dir, line1_offset, line1_dir)
 
     # Ax=b
     b = line2_offset - line1_offset
@@ -75,3 +75,26 @@ def get_circumscribed_circle(a: Vector2, b: Vector2, c: Vector2) -> [Vector2 | N
         return [intersec_point, radius]
     else:
         return [None, None]
+
+
+def get_circle_intersections(center1: Vector2, radius1: float, center2: Vector2, radius2: float) -> list[Vector2]:
+    # Formula: https://paulbourke.net/geometry/circlesphere/ (Intersection of two circles)
+    d = (center2 - center1).magnitude()
+    if d == 0 or d > radius1 + radius2 or d < abs(radius1 - radius2):
+        return []
+
+    a = (radius1 ** 2 - radius2 ** 2 + d ** 2) / (2 * d)
+    h = max(radius1 ** 2 - a ** 2, 0) ** 0.5
+
+    direction = (center2 - center1) / d
+    base = center1 + a * direction
+    offset = h * Vector2(-direction.y, direction.x)
+
+    return [base + offset, base - offset]
+
+
+def project_on_line(point: Vector2, line_a: Vector2, line_b: Vector2) -> Vector2:
+    ab = line_b - line_a
+    if ab.length_squared() == 0:
+        return Vector2(line_a)
+    return line_a + (ab.dot(point - line_a) / ab.length_squared()) * ab
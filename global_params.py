@@ -1,20 +1,108 @@
-from pygame import Vector2
-import tkinter as tk
-import google.generativeai
+from typing import TYPE_CHECKING
 
-canvas: tk.Canvas = None
+# No pygame, tkinter or LLM SDK imports here, every module reads this file
+if TYPE_CHECKING:
+    import tkinter as tk
+
+canvas: "tk.Canvas | None" = None
 delta_time: float = 0.01
+# Frame pacing of the UI (frame_scheduler.py): solver steps fill gp.solver_frame_budget of every frame,
+# rendering is capped at target_fps and skipped for at most max_frame_skip frames in a row when Tk falls behind
+target_fps: float = 60
+solver_frame_budget: float = 0.6
+max_steps_per_frame: int = 5000
+max_frame_skip: int = 3
 delta_step: float = 0.1 # 0.01
 
 force_min_threshold: float = 0 # 0.01
 canvas_min_move_dst: float = 1
 line_friction: float = 0.3
 
+# The simulation stops once the summed squared force of all points drops below this
+convergence_threshold: float = 1e-6
+
+# Solve with the batched numpy engine (vector_engine.py) instead of rule.enforce()/SimPoint.update()
+use_vector_engine: bool = False
+
+# How "animate" moves the points along the rule forces (integrators.py): "euler" (fixed gp.delta_step),
+# "fire" (momentum with adaptive step) or "line_search" (backtracking step per iteration)
+integrator: str = "euler"
+# Upper limit for the adaptive step of "fire" and "line_search", and the farthest "fire" moves a point in one step
+integrator_max_step: float = 1.0
+integrator_max_move: float = 1.0
+
+# "animate" relaxes the forces tick by tick, "solve_fast" runs the least squares solver (lsq_solver.py)
+solver_mode: str = "animate"
+# Construct start positions from the rules (seeding.py) instead of dropping every point at random
+constructive_seeding: bool = True
+# Where the seeding starts the first figure, the middle of the area random points are dropped in (utils.py).
+# Only the solve sees it, the camera fits whatever comes out to the canvas
+seed_origin: tuple[float, float] = (250, 250)
+# Place the points the rules fully determine (triangles, regular polygons, circle centers) analytically before
+# the seeding (closed_form.py), the solver then only moves the rest
+closed_form: bool = True
+# A resubmitted problem starts from the solved positions of the points it shares with the current scene (warm_start.py)
+warm_start: bool = True
+lsq_tolerance: float = 1e-12
+# A layout counts as correct once the summed squared rule residuals are below this
+residual_tolerance: float = 1e-8
+# The same for a layout the forces settled ("animate" stops short of exact), balanced forces of rules that
+# contradict each other are far above it
+settled_residual_tolerance: float = 1e-3
+
+# Solve this many differently seeded starts in parallel and keep the best one (multi_start.py), 1 turns it off
+multi_start_count: int = 1
+multi_start_time_budget: float = 2.0
+
+# Solve independent figures and clusters joined in one point separately (decomposition.py)
+decompose_scene: bool = False
+
+# Profiling (profiler.py), toggled with F3 in the UI or --profile in headless_solver.py
+profile_max_frames: int = 10000
+profile_residual_interval: int = 10
+profile_trace_path: str = "profile_trace.json"
+
+# Drawables keep their canvas items and only move them (canvas_items.py) instead of drawing again every tick
+retained_canvas: bool = True
+
+# The figure takes 1 / camera_padding of the canvas after a fit. The camera refits once it comes closer than
+# camera_margin (fraction of the view) to the edge or shrinks below camera_min_fill of the view
+camera_padding: float = 1.3
+camera_margin: float = 0.03
+camera_min_fill: float = 0.5
+
+# Blueprint export without Tk (blueprint_export.py), png is drawn export_supersample times larger and scaled down
+export_width: int = 800
+export_height: int = 800
+export_background: str = "#ffffff"
+export_supersample: int = 2
+
 point_radius: int = 10
 line_width: int = 5
 text_offset_len: int = 30
 
-model: google.generativeai.GenerativeModel
+
+# On-disk cache of LLM answers (llm_cache.py)
+llm_cache_dir: str = ".llm_cache"
+llm_cache_max_bytes: int = 50 * 1024 * 1024
+llm_cache_max_age: float = 30 * 24 * 60 * 60
+
+# On-disk cache of solved layouts keyed by the canonical scene (layout_cache.py), relabelled copies share an entry.
+# layout_cache_max_search caps the encodings tried while canonicalizing symmetric scenes,
+# scenes with more than layout_cache_max_points points are not cached (canonicalizing runs on the UI thread)
+use_layout_cache: bool = True
+layout_cache_dir: str = ".layout_cache"
+layout_cache_max_bytes: int = 20 * 1024 * 1024
+layout_cache_max_search: int = 256
+layout_cache_max_points: int = 200
+
+# Async LLM client (async_llm.py): seconds per attempt, attempts per request, backoff base and requests in flight
+llm_timeout: float = 60
+llm_max_attempts: int = 3
+llm_retry_base_delay: float = 1.0
+llm_max_concurrency: int = 8
+# Build the scene while the LLM answer streams in (json_stream.py)
+stream_responses: bool = True
 prompt1 = """
 You must extract specific information from a geometric problem in a json format. You will use this formal template(you will not change anything, except replace the values where expected based on this description) for writing out the information about points, segments, angles,triangles, rectangles, circles etc.:
 
@@ -311,4 +399,38 @@ The expected json that you have to return using the template and rules above for
 Make the same json format using the template and the given example format for the following math problem:"""
 
 prompt1 = ""
-# Respond only with this text: "{"polygons": [["A", "B", "C"]], "additional_lines": [], circles": [], "rules": []}"
\ No newline at end of file
+# Respond only with this text: "{"polygons": [["A", "B", "C"]], "additional_lines": [], circles": [], "rules": []}"
+
+prompt_compact = """
+Extract the geometry of the math problem below as json. Output only the json, no ``` fences.
+
+Schema:
+{"polygons":[[<point>,...]],"additional_lines":[[<point>,<point>]],"circles":[{"name":<str?>,"center_point":<str?>,"inscribed":<bool>,"circumscribed":<bool>,"figure":[<point>,...],"through_points":[<point>,...],"radius":<float?>}],"rules":[{"rule_type":"angle"|"segment"|"ratio"|"point_on_segment"|"parallel_lines","points":[<point>,...],"value":<float>|<str>}]}
+<str?>/<float?> may be "?" if not given.
+
+Names: points A, B, C...; circles k1, k2...; circle centers O1, O2...
+polygons: every figure (triangle ABC => ["A","B","C"]).
+additional_lines: lines not on a polygon (medians, heights, bisectors, radii, asked segments).
+Rules, only for given values, never with "?" (for asked values only add the lines):
+- angle ABC = v => angle, ["A","B","C"], v
+- AB = v => segment, ["A","B"], v
+- Z on AB => point_on_segment, ["Z","A","B"]
+- AB:BC = 3:2 => ratio, ["A","B","B","C"], "3:2"
+- AB parallel to CD (trapezoid, parallelogram) => parallel_lines, ["A","B","C","D"]
+- height from C with foot H on AB => angle, ["A","H","C"], 90
+- median from A with foot M on BC => ratio, ["B","M","C","M"], "1:1"
+- circle touching a side => angle 90 at the touch point
+
+Example: "Triangle ABC, AB = 10, angle ABC = 45. M is the midpoint of BC. Circle k is inscribed. Find AC."
+{"polygons":[["A","B","C"]],"additional_lines":[["A","M"],["A","C"]],"circles":[{"name":"k","center_point":"O1","inscribed":true,"circumscribed":false,"figure":["A","B","C"],"through_points":[],"radius":"?"}],"rules":[{"rule_type":"segment","points":["A","B"],"value":10},{"rule_type":"angle","points":["A","B","C"],"value":45},{"rule_type":"ratio","points":["B","M","C","M"],"value":"1:1"},{"rule_type":"point_on_segment","points":["M","B","C"]}]}
+
+Problem:
+"""
+
+# Prompt variants, picked with prompt_variant. Both are sent as system instruction / system message,
+# so they stay a constant prefix that the providers can cache.
+prompts = {
+    "full": prompt,
+    "compact": prompt_compact,
+}
+prompt_variant: str = "full"
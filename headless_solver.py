@@ -0,0 +1,148 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import global_params as gp
+from lsq_solver import LsqSolver
+from simulation import run_until_converged, create_engine, parse_scene, is_converged
+from rule_spec import get_rule_specs, get_total_residual
+from multi_start import apply_positions
+from decomposition import solve_decomposed
+from profiler import profiler
+from layout_cache import get_layout_key, load_layout, store_layout
+
+
+def solve_scene(json_str: str, max_iterations: int = 10000, use_engine: bool = False,
+                seed: int | None = None, mode: str = "animate", decompose: bool = False,
+                use_layout_cache: bool = False, parsed: list | None = None) -> dict:
+    # Solves one scene without any UI, returns a json-serializable result.
+    # parsed is the [sim_points, drawables, rules] of json_str if the caller parsed it already (then the seed is
+    # the caller's business too); those are solved in place
+    start = time.perf_counter()
+
+    if parsed is None:
+        if seed is not None:
+            random.seed(seed)
+        with profiler.phase("parse_scene"):
+            parsed = parse_scene(json_str)
+    (sim_points, drawables, rules) = parsed
+    cached = False
+    if use_layout_cache:
+        # A cached layout is already converged, the solve below then ends after its first iteration
+        (layout_key, layout_order) = get_layout_key(sim_points, rules, drawables)
+        cached = load_layout(sim_points, layout_key, layout_order)
+    if decompose and not cached:
+        # Already inside a worker process, so the pieces are solved one after another
+        apply_positions(sim_points, solve_decomposed(sim_points, rules, drawables, mode, max_iterations,
+                                                     parallel=False))
+    engine = create_engine(sim_points, rules, mode, use_engine)
+    if isinstance(engine, LsqSolver):
+        # energy is the final least squares cost, the solver has no forces
+        (iterations, energy) = engine.solve(max_iterations)
+        engine.write_positions(sim_points)
+    else:
+        (iterations, energy) = run_until_converged(sim_points, rules, engine, max_iterations)
+
+    positions = {name: sim_point.position for (name, sim_point) in sim_points.items()}
+    residual = get_total_residual(get_rule_specs(rules), positions)
+    converged = is_converged(engine, energy, residual)
+
+    if use_layout_cache and not cached and converged:
+        store_layout(sim_points, layout_key, layout_order)
+
+    return {
+        "points": {name: [p.x, p.y] for (name, p) in positions.items()},
+        "residual": residual,
+        "energy": energy,
+        "iterations": iterations,
+        "converged": converged,
+        "cached": cached,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+def read_scenes(path: str):
+    # Yields (id, scene json string) from a directory of .json files, a .jsonl file or "-" for jsonl on stdin
+    if os.path.isdir(path):
+        for file_name in sorted(os.listdir(path)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(path, file_name), encoding="utf-8") as file:
+                    yield file_name, file.read()
+        return
+
+    file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for (line_number, line) in enumerate(file, start=1):
+            if line.strip() == "":
+                continue
+            try:
+                scene = json.loads(line)
+            except ValueError:
+                # Passed on as it is: the worker repairs it like an LLM answer, or reports it as that line's error
+                scene = None
+            # Lines are either a bare scene or {"id": ..., "scene": {...}}
+            if isinstance(scene, dict) and "scene" in scene:
+                yield scene.get("id", line_number), json.dumps(scene["scene"])
+            else:
+                yield line_number, line
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def solve_job(job: tuple) -> dict:
+    (scene_id, json_str, max_iterations, use_engine, seed, mode, decompose, use_layout_cache) = job
+
+    try:
+        result = solve_scene(json_str, max_iterations, use_engine, seed, mode, decompose, use_layout_cache)
+    except Exception as e:
+        return {"id": scene_id, "error": str(e)}
+
+    return {"id": scene_id, **result}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Solve blueprint scene jsons without opening a window.")
+    parser.add_argument("input", help="directory of .json scenes, a .jsonl file, or - for jsonl on stdin")
+    parser.add_argument("-o", "--output", default="-", help="ndjson output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--max-iterations", type=int, default=10000)
+    parser.add_argument("--engine", action="store_true", help="use the batched numpy engine")
+    parser.add_argument("--mode", choices=["animate", "solve_fast"], default="animate",
+                        help="force relaxation or least squares")
+    parser.add_argument("--decompose", action="store_true", help="solve independent pieces of a scene separately")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random start positions")
+    parser.add_argument("--layout-cache", action="store_true",
+                        help="reuse solved layouts of the same scene (also relabelled) from gp.layout_cache_dir")
+    parser.add_argument("--profile", metavar="TRACE", help="solve in this process with profiling, "
+                                                           "and write the trace (.json or .csv)")
+    args = parser.parse_args(argv)
+
+    jobs = ((scene_id, json_str, args.max_iterations, args.engine, args.seed, args.mode, args.decompose,
+             args.layout_cache) for (scene_id, json_str) in read_scenes(args.input))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        if args.profile:
+            # The profiler lives in this process, so no worker pool
+            profiler.enabled = True
+            for result in map(solve_job, jobs):
+                output.write(json.dumps(result) + "\n")
+            profiler.dump(args.profile)
+            print(profiler.get_summary(), file=sys.stderr)
+        else:
+            with multiprocessing.Pool(args.workers) as pool:
+                for result in pool.imap_unordered(solve_job, jobs, chunksize=4):
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
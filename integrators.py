@@ -0,0 +1,134 @@
+import numpy as np
+
+import global_params as gp
+
+
+class Integrator:
+    # Moves an engine (VectorEngine or RuleEngine) one step along its rule forces.
+    # The engine provides positions and forces as (n, 2) arrays, enforce() to add the forces at the current positions
+    # and force_energy(). step() returns the force energy at the positions the step started from.
+    def step(self, engine) -> float:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        pass
+
+    @staticmethod
+    def evaluate(engine) -> float:
+        engine.forces[:] = 0
+        engine.enforce()
+        return engine.force_energy()
+
+
+class EulerIntegrator(Integrator):
+    # Explicit Euler with the constant gp.delta_step, the original scheme
+    def step(self, engine) -> float:
+        engine.enforce()
+        energy = engine.force_energy()
+        engine.update()
+        return energy
+
+
+class FireIntegrator(Integrator):
+    # FIRE (Bitzek et al. 2006): velocity Verlet-like steps with the velocity steered towards the force.
+    # The step grows while the system keeps going downhill, and the velocity is dropped and the step halved
+    # as soon as it moves against the force.
+    min_steps_before_growth = 5
+    step_increase = 1.1
+    step_decrease = 0.5
+    alpha_start = 0.1
+    alpha_decrease = 0.99
+
+    def __init__(self):
+        self.velocity: np.ndarray | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.velocity = None
+        self.dt = gp.delta_step
+        self.alpha = self.alpha_start
+        self.steps_downhill = 0
+
+    def step(self, engine) -> float:
+        energy = self.evaluate(engine)
+        forces = engine.forces
+        if self.velocity is None or self.velocity.shape != forces.shape:
+            self.velocity = np.zeros_like(forces)
+        velocity = self.velocity
+
+        power = float(np.sum(forces * velocity))
+        velocity_norm = np.sqrt(float(np.sum(velocity * velocity)))
+        if power > 0:
+            force_norm = np.sqrt(energy)
+            if force_norm > 0:
+                # v = (1 - alpha) v + alpha |v| F / |F|, with |v| from before the mixing
+                velocity *= 1 - self.alpha
+                velocity += (self.alpha * velocity_norm / force_norm) * forces
+            self.steps_downhill += 1
+            if self.steps_downhill > self.min_steps_before_growth:
+                self.dt = min(self.dt * self.step_increase, gp.integrator_max_step)
+                self.alpha *= self.alpha_decrease
+        elif velocity_norm > 0:
+            # At rest (first step, or after a restart) is neutral, nothing went uphill yet.
+            # Went uphill: take back half of the last move (FIRE 2.0) and start again from rest
+            engine.positions -= 0.5 * self.dt * velocity
+            velocity[:] = 0
+            self.dt *= self.step_decrease
+            self.alpha = self.alpha_start
+            self.steps_downhill = 0
+
+        velocity += self.dt * forces
+        # The velocity keeps growing with the step on a steep or badly scaled scene until the points fly off,
+        # so the whole move is scaled down until no point moves farther than gp.integrator_max_move
+        longest_move = self.dt * float(np.max(np.hypot(velocity[:, 0], velocity[:, 1]), initial=0))
+        if longest_move > gp.integrator_max_move:
+            velocity *= gp.integrator_max_move / longest_move
+        engine.positions += self.dt * velocity
+        return energy
+
+
+class LineSearchIntegrator(Integrator):
+    # Steps along the force with a backtracking line search on the force energy:
+    # the step is halved until the energy drops, and grows again after every accepted step
+    max_halvings = 12
+    step_increase = 1.5
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.step_size = gp.delta_step
+
+    def step(self, engine) -> float:
+        energy = self.evaluate(engine)
+        start = engine.positions.copy()
+        direction = engine.forces.copy()
+
+        step_size = self.step_size
+        for _ in range(self.max_halvings):
+            np.add(start, step_size * direction, out=engine.positions)
+            if self.evaluate(engine) < energy:
+                self.step_size = min(step_size * self.step_increase, gp.integrator_max_step)
+                return energy
+            step_size *= 0.5
+
+        # No decrease found: the force energy is not the energy the forces come from, so it can have dips
+        # that are no solution. Instead of shrinking the step towards zero there, go back to the start,
+        # take the plain Euler step out of the dip and search with the base step again
+        np.add(start, gp.delta_step * direction, out=engine.positions)
+        self.step_size = gp.delta_step
+        return energy
+
+
+integrators = {
+    "euler": EulerIntegrator,
+    "fire": FireIntegrator,
+    "line_search": LineSearchIntegrator,
+}
+
+
+def create_integrator(name: str | None = None) -> Integrator:
+    name = name or gp.integrator
+    if name not in integrators:
+        raise Exception(f"Error: unknown integrator '{name}'.")
+    return integrators[name]()
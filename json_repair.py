@@ -0,0 +1,483 @@
+import json
+import re
+
+# Local repair and validation of the scene json the LLM returns, so near misses (```json fences, missing or
+# trailing commas, comments, Python literals, "45°", "3/2", radius as a string, ...) are fixed here instead of
+# asking again. Every fix is reported as a short message, problems that can't be fixed raise one Exception
+# listing each of them with its path in the json (e.g. rules[2].points).
+
+scene_keys = ["polygons", "additional_lines", "circles", "rules"]
+
+# Number of points each rule type takes
+rule_point_counts = {
+    "angle": 3,
+    "segment": 2,
+    "ratio": 4,
+    "point_on_segment": 3,
+    "parallel_lines": 4,
+}
+rule_type_aliases = {
+    "length": "segment",
+    "segment_length": "segment",
+    "point_on_line": "point_on_segment",
+    "parallel": "parallel_lines",
+}
+
+literals = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+number_pattern = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$")
+bare_word_pattern = re.compile(r"[^\s,:\[\]{}\"']+")
+number_prefix_pattern = re.compile(r"\s*([-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?)")
+quote_chars = {'"': '"', "'": "'", "“": "”", "”": "”"}
+
+
+def find_object_end(text: str, start: int) -> int:
+    # Index after the bracket that closes the object opened at start, -1 when the text ends first (truncated).
+    # Brackets inside strings don't count
+    depth = 0
+    in_string = False
+    i = start
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == "\\":
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return -1
+
+
+def shorten(text: str, length: int = 40) -> str:
+    text = " ".join(text.split())
+    return show(text if len(text) <= length else text[:length] + "...")
+
+
+def find_object_starts(text: str) -> list[int]:
+    # Where each top level object starts, the last one may be truncated
+    starts = []
+    start = text.find("{")
+    while start != -1:
+        starts.append(start)
+        end = find_object_end(text, start)
+        if end == -1:
+            break
+        start = text.find("{", end)
+    return starts
+
+
+def repair_json_text(text: str) -> [str, list[str]]:
+    # Rewrites the text token by token into valid json where the mistake is unambiguous.
+    # The answer is the first top level object that parses after the repair, preferably one with scene keys:
+    # prose around it goes, even with braces of its own ("Here is {the answer}: {...}")
+    starts = find_object_starts(text)
+    if not starts:
+        raise Exception("Error: no json object in the response.")
+
+    def rank(candidate: list) -> int:
+        try:
+            json_obj = json.loads(candidate[0])
+        except ValueError:
+            return 2
+        return 0 if isinstance(json_obj, dict) and any(key in json_obj for key in scene_keys) else 1
+
+    return min((repair_object(text, start) for start in starts), key=rank)
+
+
+def repair_object(text: str, start: int) -> [str, list[str]]:
+    # The object starting at start, everything around it goes.
+    # A truncated object is cut after its last complete element and closed below
+    fixes: list[str] = []
+    if text[:start].strip():
+        fixes.append(f"removed {shorten(text[:start])} before the json object")
+    end = find_object_end(text, start)
+    if end != -1:
+        if text[end:].strip():
+            fixes.append(f"removed {shorten(text[end:])} after the json object")
+    else:
+        end = max(text.rfind("}"), text.rfind("]")) + 1
+        if end <= start:
+            end = len(text)
+        elif text[end:].strip():
+            fixes.append(f"removed the unfinished {shorten(text[end:])} at the end of the truncated response")
+    text = text[start:end]
+
+    out: list[str] = []
+    closers: list[str] = []
+    # Length of out before each open bracket (and the comma in front of it)
+    opened_at: list[int] = []
+    # Whether the last token was a complete value, so the next value or key needs a comma before it
+    after_value = False
+    i = 0
+
+    def add_value(value: str) -> None:
+        nonlocal after_value
+        if after_value:
+            out.append(",")
+            fixes.append("added a missing comma")
+        out.append(value)
+        after_value = True
+
+    while i < len(text):
+        char = text[i]
+
+        if char.isspace():
+            i += 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = len(text) if i == -1 else i
+            fixes.append("removed a comment")
+        elif text.startswith("/*", i):
+            i = text.find("*/", i)
+            i = len(text) if i == -1 else i + 2
+            fixes.append("removed a comment")
+        elif char in quote_chars:
+            # String, also with single or typographic quotes
+            close = quote_chars[char]
+            j = i + 1
+            chars: list[str] = []
+            while j < len(text) and text[j] != close and not (close == "”" and text[j] == '"'):
+                if text[j] == "\\" and j + 1 < len(text):
+                    chars.append(text[j:j + 2])
+                    j += 2
+                    continue
+                chars.append(text[j])
+                j += 1
+            if char != '"':
+                fixes.append("replaced non json quotes")
+            if j >= len(text):
+                fixes.append("closed an unterminated string")
+            value = "".join(chars)
+            if char != '"':
+                value = value.replace("\\'", "'").replace('"', '\\"')
+            add_value(f'"{value}"')
+            i = j + 1
+        elif char in "[{":
+            opened_at.append(len(out))
+            add_value(char)
+            after_value = False
+            closers.append("]" if char == "[" else "}")
+            i += 1
+        elif char in "]}":
+            if out and out[-1] == ",":
+                out.pop()
+                fixes.append("removed a trailing comma")
+            if not closers:
+                fixes.append(f"removed an unmatched '{char}'")
+                i += 1
+                continue
+            if closers[-1] != char:
+                fixes.append(f"replaced '{char}' with '{closers[-1]}'")
+            out.append(closers.pop())
+            opened_at.pop()
+            after_value = True
+            i += 1
+        elif char == ",":
+            if after_value:
+                out.append(",")
+            else:
+                fixes.append("removed an extra comma")
+            after_value = False
+            i += 1
+        elif char == ":":
+            out.append(":")
+            after_value = False
+            i += 1
+        else:
+            word = bare_word_pattern.match(text, i)
+            if word is None:
+                fixes.append(f"removed a stray '{char}'")
+                i += 1
+                continue
+            word = word.group()
+            if number_pattern.match(word) or word in ("true", "false", "null"):
+                add_value(word)
+            elif word in literals:
+                add_value(literals[word])
+                fixes.append(f"replaced {word} with {literals[word]}")
+            else:
+                add_value(json.dumps(word, ensure_ascii=False))
+                fixes.append(f"quoted {word}")
+            i += len(word)
+
+    # Truncated response: an object in a list that was cut off is dropped, closing it would leave out
+    # its last keys (a rule without its value reads as an unknown "?" value)
+    cut = next((level for level in range(1, len(closers)) if closers[level] == "}" and closers[level - 1] == "]"),
+               None)
+    if cut is not None:
+        fixes.append(f"dropped the truncated last element {shorten(''.join(out[opened_at[cut]:]).lstrip(','))}")
+        del out[opened_at[cut]:]
+        del closers[cut:]
+        del opened_at[cut:]
+        if out and out[-1] == ",":
+            out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        fixes.append("removed a trailing comma")
+    if closers:
+        out += reversed(closers)
+        fixes.append(f"closed {len(closers)} unclosed brackets")
+
+    # Each kind of fix once, in the order they were first made
+    return ["".join(out), list(dict.fromkeys(fixes))]
+
+
+def show(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def to_number(value, path: str, errors: list[str], fixes: list[str]) -> float | None:
+    if isinstance(value, bool):
+        errors.append(f"{path}: expected a number, got {show(value)}")
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        # "45", "45°", "10 cm", "2.5cm"
+        match = number_prefix_pattern.match(value)
+        if match:
+            fixes.append(f"{path}: read {show(value)} as {float(match.group(1)):g}")
+            return float(match.group(1))
+    errors.append(f"{path}: expected a number, got {show(value)}")
+    return None
+
+
+def to_bool(value, path: str, errors: list[str], fixes: list[str]) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        fixes.append(f"{path}: missing, set to false")
+        return False
+    if isinstance(value, str) and value.strip().lower() in ("true", "yes", "false", "no"):
+        fixes.append(f"{path}: read {show(value)} as a bool")
+        return value.strip().lower() in ("true", "yes")
+    if isinstance(value, (int, float)) and value in (0, 1):
+        fixes.append(f"{path}: read {value} as a bool")
+        return bool(value)
+    errors.append(f"{path}: expected true or false, got {show(value)}")
+    return False
+
+
+def to_name(value, path: str, errors: list[str], fixes: list[str]) -> str:
+    # Circle and center names, "?" when not given
+    if value is None or (isinstance(value, str) and value.strip() == ""):
+        fixes.append(f"{path}: missing, set to \"?\"")
+        return "?"
+    if not isinstance(value, str):
+        errors.append(f"{path}: expected a name, got {show(value)}")
+        return "?"
+    return value.strip()
+
+
+def to_points(value, path: str, errors: list[str], fixes: list[str], count: int | None = None) -> list[str]:
+    if value is None:
+        value = []
+        fixes.append(f"{path}: missing, set to []")
+    if isinstance(value, str):
+        # "ABC" or "A, B, C" instead of a list
+        parts = re.findall(r"[A-Z][a-z0-9_']*", value) if "," not in value else value.split(",")
+        fixes.append(f"{path}: split {show(value)} into points")
+        value = parts
+    if not isinstance(value, list):
+        errors.append(f"{path}: expected a list of points, got {show(value)}")
+        return []
+
+    points: list[str] = []
+    for (i, point) in enumerate(value):
+        if not isinstance(point, str) or not point.strip():
+            errors.append(f"{path}[{i}]: expected a point name, got {show(point)}")
+            continue
+        if point != point.strip():
+            fixes.append(f"{path}[{i}]: stripped whitespace")
+        points.append(point.strip())
+
+    if count is not None and len(points) != count:
+        errors.append(f"{path}: expected {count} points, got {len(points)}")
+    return points
+
+
+def format_number(number: float) -> str:
+    # Shortest form that reads back as the same float, "3" instead of "3.0"
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def to_ratio(value, path: str, errors: list[str], fixes: list[str]) -> str:
+    # "a:b" as utils expects it, from "3:2", "3/2", [3, 2] or a plain number
+    if isinstance(value, list) and len(value) == 2:
+        parts = value
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        parts = [value, 1]
+    elif isinstance(value, str):
+        parts = re.split(r"\s*[:/]\s*", value.strip())
+        if len(parts) == 1:
+            parts.append(1)
+    else:
+        errors.append(f"{path}: expected a ratio like \"3:2\", got {show(value)}")
+        return "?"
+
+    numbers = [to_number(part, path, errors, []) for part in parts]
+    if None in numbers or len(numbers) != 2:
+        if len(numbers) != 2:
+            errors.append(f"{path}: expected a ratio like \"3:2\", got {show(value)}")
+        return "?"
+    if numbers[0] <= 0 or numbers[1] <= 0:
+        errors.append(f"{path}: ratio parts must be positive, got {show(value)}")
+        return "?"
+
+    ratio = f"{format_number(numbers[0])}:{format_number(numbers[1])}"
+    if ratio != value:
+        fixes.append(f"{path}: read {show(value)} as \"{ratio}\"")
+    return ratio
+
+
+def is_unknown(value) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() in ("", "?"))
+
+
+def normalize_polygon(polygon, path: str, errors: list[str], fixes: list[str]) -> list[str]:
+    points = to_points(polygon, path, errors, fixes)
+    if len(points) > 3 and points[0] == points[-1]:
+        fixes.append(f"{path}: removed the repeated first point")
+        points.pop()
+    if len(points) < 3:
+        errors.append(f"{path}: polygon with less than 3 points")
+    return points
+
+
+def normalize_line(line, path: str, errors: list[str], fixes: list[str]) -> list[str]:
+    return to_points(line, path, errors, fixes, count=2)
+
+
+def normalize_circle(circle, path: str, errors: list[str], fixes: list[str]) -> dict:
+    if not isinstance(circle, dict):
+        errors.append(f"{path}: expected an object, got {show(circle)}")
+        return {}
+
+    radius = circle.get("radius")
+    if is_unknown(radius):
+        if radius != "?":
+            fixes.append(f"{path}.radius: missing, set to \"?\"")
+        radius = "?"
+    else:
+        radius = to_number(radius, f"{path}.radius", errors, fixes)
+
+    return {
+        "name": to_name(circle.get("name"), f"{path}.name", errors, fixes),
+        "center_point": to_name(circle.get("center_point"), f"{path}.center_point", errors, fixes),
+        "inscribed": to_bool(circle.get("inscribed"), f"{path}.inscribed", errors, fixes),
+        "circumscribed": to_bool(circle.get("circumscribed"), f"{path}.circumscribed", errors, fixes),
+        "figure": to_points(circle.get("figure"), f"{path}.figure", errors, fixes),
+        "through_points": to_points(circle.get("through_points"), f"{path}.through_points", errors, fixes),
+        "radius": radius,
+    }
+
+
+def normalize_rule(rule, path: str, errors: list[str], fixes: list[str]) -> dict:
+    if not isinstance(rule, dict):
+        errors.append(f"{path}: expected an object, got {show(rule)}")
+        return {}
+
+    rule_type = rule.get("rule_type")
+    if not isinstance(rule_type, str):
+        errors.append(f"{path}.rule_type: expected one of {', '.join(rule_point_counts)}, got {show(rule_type)}")
+        return {}
+    normalized_type = re.sub(r"[\s-]+", "_", rule_type.strip().lower())
+    normalized_type = rule_type_aliases.get(normalized_type, normalized_type)
+    if normalized_type not in rule_point_counts:
+        errors.append(f"{path}.rule_type: expected one of {', '.join(rule_point_counts)}, got {show(rule_type)}")
+        return {}
+    if normalized_type != rule_type:
+        fixes.append(f"{path}.rule_type: read {show(rule_type)} as \"{normalized_type}\"")
+
+    points = to_points(rule.get("points"), f"{path}.points", errors, fixes, count=rule_point_counts[normalized_type])
+
+    normalized = {"rule_type": normalized_type, "points": points}
+    value = rule.get("value")
+    if normalized_type in ("angle", "segment", "ratio"):
+        if is_unknown(value):
+            value = "?"
+        elif normalized_type == "ratio":
+            value = to_ratio(value, f"{path}.value", errors, fixes)
+        else:
+            value = to_number(value, f"{path}.value", errors, fixes)
+            if value is not None and value <= 0:
+                errors.append(f"{path}.value: must be positive, got {value:g}")
+        normalized["value"] = value
+    return normalized
+
+
+# The function normalizing one element of each top level array
+section_normalizers = {
+    "polygons": normalize_polygon,
+    "additional_lines": normalize_line,
+    "circles": normalize_circle,
+    "rules": normalize_rule,
+}
+
+
+def raise_errors(errors: list[str]) -> None:
+    if errors:
+        raise Exception("Error: invalid scene json:\n" + "\n".join(f"  {error}" for error in errors))
+
+
+def normalize_element(key: str, element, index: int = 0) -> [object, list[str]]:
+    # One element of a top level array, e.g. as it arrives from the stream parser
+    errors: list[str] = []
+    fixes: list[str] = []
+    element = section_normalizers[key](element, f"{key}[{index}]", errors, fixes)
+    raise_errors(errors)
+    return [element, fixes]
+
+
+def normalize_scene(json_obj) -> [dict, list[str]]:
+    if not isinstance(json_obj, dict):
+        raise Exception(f"Error: invalid scene json: expected an object, got {type(json_obj).__name__}.")
+
+    errors: list[str] = []
+    fixes: list[str] = []
+    scene: dict = {}
+
+    for key in scene_keys:
+        section = json_obj.get(key)
+        if section is None:
+            fixes.append(f"{key}: missing, set to []")
+            section = []
+        elif isinstance(section, dict):
+            fixes.append(f"{key}: wrapped a single element in a list")
+            section = [section]
+        elif not isinstance(section, list):
+            errors.append(f"{key}: expected a list, got {show(section)}")
+            section = []
+
+        scene[key] = [section_normalizers[key](element, f"{key}[{i}]", errors, fixes)
+                      for (i, element) in enumerate(section)]
+
+    for key in json_obj:
+        if key not in scene_keys:
+            fixes.append(f"{key}: unknown key ignored")
+
+    raise_errors(errors)
+    return [scene, fixes]
+
+
+def load_scene_json(text: str) -> [dict, list[str]]:
+    # Strict json first, the repair pass only runs when that fails
+    try:
+        json_obj = json.loads(text)
+        fixes = []
+    except ValueError:
+        (repaired, fixes) = repair_json_text(text)
+        try:
+            json_obj = json.loads(repaired)
+        except ValueError as e:
+            raise Exception(f"Error: json could not be repaired: {e.msg} at column {e.colno}.")
+
+    (scene, scene_fixes) = normalize_scene(json_obj)
+    return [scene, fixes + scene_fixes]
@@ -0,0 +1,133 @@
+import json
+import queue
+import sys
+
+from json_repair import repair_json_text
+
+
+class SceneStreamParser:
+    # Incremental parser for a streamed scene json.
+    # Every element of a top level array ("polygons", "circles", "rules", ...) is put on the events queue
+    # as (key, index, element) as soon as its closing bracket arrives, so the scene can grow while the LLM is still writing.
+    # Text before the first "{" (e.g. a ```json fence) is skipped.
+    def __init__(self):
+        self.events: queue.Queue = queue.Queue()
+        # Only the text from offset on is kept, positions count from the start of the stream
+        self.text = ""
+        self.offset = 0
+        self.position = 0
+
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+        self.expecting_key = False
+        self.key_start: int | None = None
+        self.current_key: str | None = None
+        self.section_is_array = False
+        self.element_start: int | None = None
+        self.element_depth = 0
+        self.element_counts: dict[str, int] = {}
+
+    def feed(self, chunk: str) -> None:
+        # Drops what no pending key or element needs anymore, so a chunk copies an element at most
+        # and not the whole answer so far
+        keep = min(p for p in (self.key_start, self.element_start, self.position) if p is not None)
+        self.text = self.text[keep - self.offset:] + chunk
+        self.offset = keep
+
+        while self.position < self.offset + len(self.text):
+            self._consume(self.text[self.position - self.offset])
+            self.position += 1
+
+    def _get_text(self, start: int, end: int) -> str:
+        return self.text[start - self.offset:end - self.offset]
+
+    def _consume(self, char: str) -> None:
+        if not self.started:
+            if char == "{":
+                self.started = True
+                self.depth = 1
+                self.expecting_key = True
+            return
+
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif char == "\\":
+                self.escape = True
+            elif char == '"':
+                self.in_string = False
+                if self.key_start is not None:
+                    self.current_key = json.loads(self._get_text(self.key_start, self.position + 1))
+                    self.key_start = None
+            return
+
+        if char == '"':
+            self.in_string = True
+            if self.depth == 1 and self.expecting_key:
+                self.key_start = self.position
+                self.expecting_key = False
+            elif self._at_element_start():
+                self._start_element(2)
+            return
+
+        if char in "[{":
+            if self.depth == 1:
+                self.section_is_array = char == "["
+            elif self._at_element_start():
+                self._start_element(2)
+            self.depth += 1
+        elif char in "]}":
+            if self.depth == 2 and self.element_start is not None:
+                self._end_element(self.position)
+            self.depth -= 1
+            if self.depth == self.element_depth and self.element_start is not None:
+                self._end_element(self.position + 1)
+            if self.depth == 1:
+                # Value of a top level key is complete, be lenient about a missing comma after it
+                self.expecting_key = True
+        elif char == ",":
+            if self.depth == 2 and self.element_start is not None:
+                self._end_element(self.position)
+            elif self.depth == 1:
+                self.expecting_key = True
+        elif char == ":" and self.depth == 1:
+            self.expecting_key = False
+        elif not char.isspace() and self._at_element_start():
+            # Number, true, false or null element
+            self._start_element(2)
+
+    def _at_element_start(self) -> bool:
+        return self.depth == 2 and self.section_is_array and self.element_start is None
+
+    def _start_element(self, depth: int) -> None:
+        self.element_start = self.position
+        self.element_depth = depth
+
+    def _end_element(self, end: int) -> None:
+        element_text = self._get_text(self.element_start, end)
+        self.element_start = None
+
+        try:
+            element = json.loads(element_text)
+        except ValueError:
+            element = self._repair_element(element_text)
+            if element is None:
+                print(f"Warning: could not parse streamed element of '{self.current_key}': {element_text}",
+                      file=sys.stderr)
+                return
+
+        index = self.element_counts.get(self.current_key, 0)
+        self.element_counts[self.current_key] = index + 1
+        self.events.put((self.current_key, index, element))
+
+    @staticmethod
+    def _repair_element(element_text: str):
+        if not element_text.lstrip().startswith("{"):
+            return None
+        try:
+            return json.loads(repair_json_text(element_text)[0])
+        except Exception:
+            return None
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+
+import global_params as gp
+from llm_cache import LlmCache
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import get_rule_specs, get_drawable_specs, ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO, CIRCLE
+
+# Bump when the canonical form or the stored layout changes
+layout_cache_version = 2
+
+
+class LayoutCache(LlmCache):
+    # Solved point coordinates on disk, one file per canonical scene.
+    # A layout does not go stale, so there is no age limit, and a hit refreshes the file time:
+    # once max_bytes is exceeded the least recently used layouts go first.
+    def __init__(self, directory: str, max_bytes: int):
+        super().__init__(directory, max_bytes, float("inf"))
+
+    def get(self, key: str):
+        response = super().get(key)
+        if response is not None:
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+        return response
+
+
+def value_key(value: float) -> str:
+    return f"{value:.9g}"
+
+
+def get_scene_elements(sim_points: dict[str, SimPoint], rules: dict, drawables: dict) -> list[tuple]:
+    # Every rule and drawn item as (kind, value, groups of point ids, whether the order of the groups matters).
+    # Points inside one group are interchangeable, e.g. the two ends of a segment.
+    index = {name: i for (i, name) in enumerate(sim_points)}
+    elements = []
+
+    for spec in get_rule_specs(rules).values():
+        p = [index[name] for name in spec.points]
+        if spec.rule_type == ANGLE:
+            elements.append((ANGLE, value_key(spec.value), [[p[1]], [p[0], p[2]]], True))
+        elif spec.rule_type == SEGMENT:
+            elements.append((SEGMENT, value_key(spec.value), [[p[0], p[1]]], True))
+        elif spec.rule_type == POINT_ON_SEGMENT:
+            elements.append((POINT_ON_SEGMENT, "", [[p[0]], [p[1], p[2]]], True))
+        elif spec.rule_type == RATIO:
+            # AB:CD = 1 is the same as CD:AB = 1
+            elements.append((RATIO, value_key(spec.value), [[p[0], p[1]], [p[2], p[3]]], spec.value != 1))
+
+    for spec in get_drawable_specs(drawables):
+        points = [index[name] for name in spec.points]
+        if spec.kind == CIRCLE:
+            elements.append((CIRCLE, "in" if spec.inscribed else "circ", [points[:3]], True))
+        else:
+            elements.append((spec.kind, "", [points], True))
+
+    return elements
+
+
+def refine_colors(colors: list[int], elements: list[tuple], incidences: list[list[tuple]]) -> list[int]:
+    # Color refinement: points of one color whose surroundings differ (the colors around them in every element
+    # they belong to) are split into new colors, until nothing splits anymore. Colors are ids that stay put, so
+    # after a split only the points sharing an element with a recolored point are looked at again. The others in
+    # their color still have its common signature from before and stay together without being looked at.
+    # Colors are split and numbered in the order of their ids and signatures, nothing looks at the names,
+    # so relabelled scenes end in the same colors.
+    colors = list(colors)
+    next_color = max(colors, default=0) + 1
+    cells: dict[int, set[int]] = {}
+    for (p, color) in enumerate(colors):
+        cells.setdefault(color, set()).add(p)
+    cell_signatures: dict[int, tuple | None] = {color: None for color in cells}
+    changed = list(range(len(colors)))
+
+    def encode(e: int) -> [list[tuple], tuple]:
+        (_, _, groups, ordered) = elements[e]
+        group_colors = [tuple(sorted(colors[q] for q in group)) for group in groups]
+        return [group_colors, tuple(group_colors if ordered else sorted(group_colors))]
+
+    while changed:
+        touched_elements = {e for p in changed for (e, _, _, _, _) in incidences[p]}
+        affected = set(changed) | {q for e in touched_elements for group in elements[e][2] for q in group}
+
+        encoded: dict[int, list] = {}
+        by_color: dict[int, dict[tuple, list[int]]] = {}
+        for p in affected:
+            around = []
+            for (e, kind, value, group, ordered) in incidences[p]:
+                if e not in encoded:
+                    encoded[e] = encode(e)
+                (group_colors, element) = encoded[e]
+                around.append((kind, value, group if ordered else -1, group_colors[group], element))
+            by_color.setdefault(colors[p], {}).setdefault(tuple(sorted(around)), []).append(p)
+
+        changed = []
+        for color in sorted(by_color):
+            split = by_color[color]
+            old_signature = cell_signatures[color]
+            if len(split) == 1 and (len(cells[color]) == len(next(iter(split.values()))) or
+                                    old_signature in split):
+                cell_signatures[color] = next(iter(split))
+                continue
+            # The part that did not change keeps the color (the unaffected points, or else the first part),
+            # the others get new ones
+            keep = old_signature if old_signature in split or \
+                len(cells[color]) > sum(len(part) for part in split.values()) else min(split)
+            for signature in sorted(split):
+                if signature == keep:
+                    continue
+                part = split[signature]
+                cells[color].difference_update(part)
+                cells[next_color] = set(part)
+                cell_signatures[next_color] = signature
+                for p in part:
+                    colors[p] = next_color
+                changed.extend(part)
+                next_color += 1
+            cell_signatures[color] = keep
+
+    return colors
+
+
+def encode_scene(colors: list[int], elements: list[tuple]) -> str:
+    encoded = []
+    for (kind, value, groups, ordered) in elements:
+        group_ids = [sorted(colors[p] for p in group) for group in groups]
+        encoded.append([kind, value, group_ids if ordered else sorted(group_ids)])
+    return json.dumps([len(colors), sorted(encoded)])
+
+
+def canonicalize(sim_points: dict[str, SimPoint], rules: dict, drawables: dict) -> [str, list[str]]:
+    # Canonical form of the scene that does not depend on the point names, and the point names in canonical order.
+    # Points the refinement can't tell apart (symmetric figures) are individualized one by one and the smallest
+    # encoding wins. The search stops after gp.layout_cache_max_search encodings, the form then still identifies
+    # this exact scene but may miss relabelled copies.
+    names = list(sim_points.keys())
+    elements = get_scene_elements(sim_points, rules, drawables)
+
+    incidences: list[list[tuple]] = [[] for _ in names]
+    for (e, (kind, value, groups, ordered)) in enumerate(elements):
+        for (group, points) in enumerate(groups):
+            for p in points:
+                incidences[p].append((e, kind, value, group, ordered))
+
+    best: list = [None, None]
+    leaves = [0]
+    # Point maps found between leaves with the same encoding, they map the scene onto itself
+    automorphisms: list[list[int]] = []
+
+    def orbits(path: list[int]) -> list[int]:
+        # Which points the automorphisms that keep the individualized points in place map onto each other
+        root = list(range(len(names)))
+
+        def find(p: int) -> int:
+            while root[p] != p:
+                root[p] = root[root[p]]
+                p = root[p]
+            return p
+
+        for mapping in automorphisms:
+            if all(mapping[p] == p for p in path):
+                for (p, q) in enumerate(mapping):
+                    root[find(p)] = find(q)
+        return [find(p) for p in range(len(names))]
+
+    def search(colors: list[int], path: list[int]) -> None:
+        colors = refine_colors(colors, elements, incidences)
+        cells: dict[int, list[int]] = {}
+        for (p, color) in enumerate(colors):
+            cells.setdefault(color, []).append(p)
+
+        tied = [color for (color, cell) in cells.items() if len(cell) > 1]
+        if not tied:
+            leaves[0] += 1
+            encoded = encode_scene(colors, elements)
+            order = sorted(range(len(names)), key=lambda p: colors[p])
+            if best[0] is None or encoded < best[0]:
+                best[0] = encoded
+                best[1] = order
+            elif encoded == best[0]:
+                mapping = [0] * len(names)
+                for (p, q) in zip(best[1], order):
+                    mapping[p] = q
+                automorphisms.append(mapping)
+            return
+
+        # Points in the orbit of one already searched lead to the same encodings
+        searched: set[int] = set()
+        for p in cells[min(tied)]:
+            if leaves[0] >= gp.layout_cache_max_search:
+                return
+            if searched:
+                orbit = orbits(path)
+                if orbit[p] in {orbit[q] for q in searched}:
+                    continue
+            searched.add(p)
+            individualized = [2 * color for color in colors]
+            individualized[p] -= 1
+            search(individualized, path + [p])
+
+    search([0] * len(names), [])
+    return [best[0], [names[p] for p in best[1]]]
+
+
+def get_layout_key(sim_points: dict[str, SimPoint], rules: dict, drawables: dict) -> [str | None, list[str] | None]:
+    # No key for scenes above gp.layout_cache_max_points, canonicalizing them would stall the caller
+    if len(sim_points) > gp.layout_cache_max_points:
+        return [None, None]
+    (canonical, order) = canonicalize(sim_points, rules, drawables)
+    key = hashlib.sha256(json.dumps([layout_cache_version, canonical]).encode("utf-8")).hexdigest()
+    return [key, order]
+
+
+def load_layout(sim_points: dict[str, SimPoint], key: str | None, order: list[str] | None) -> bool:
+    # Moves the points to the cached layout, False if there is none
+    if key is None:
+        return False
+    layout = get_layout_cache().get(key)
+    if layout is None or len(layout) != len(order):
+        return False
+    for (name, (x, y)) in zip(order, layout):
+        sim_points[name].position.update(x, y)
+    return True
+
+
+def store_layout(sim_points: dict[str, SimPoint], key: str | None, order: list[str] | None) -> None:
+    if key is None:
+        return
+    layout = [[sim_points[name].position.x, sim_points[name].position.y] for name in order]
+    get_layout_cache().put(key, layout)
+
+
+layout_cache: LayoutCache | None = None
+
+
+def get_layout_cache() -> LayoutCache:
+    global layout_cache
+    if layout_cache is None:
+        layout_cache = LayoutCache(gp.layout_cache_dir, gp.layout_cache_max_bytes)
+    return layout_cache
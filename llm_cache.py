@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import global_params as gp
+
+
+def normalize_problem(problem: str) -> str:
+    # Whitespace differences do not change the extraction
+    return re.sub(r"\s+", " ", problem).strip()
+
+
+def get_cache_key(backend: str, model_name: str, config: dict, prompt: str, problem: str) -> str:
+    content = json.dumps([backend, model_name, config, prompt, normalize_problem(problem)], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    # On-disk cache of LLM responses, one file per key.
+    # Entries older than max_age are dropped, and the oldest ones go first once max_bytes is exceeded.
+    # Eviction lists the whole directory, so it runs on the first put and then every evict_interval puts,
+    # in between the cache can grow past max_bytes by that many entries.
+    evict_interval = 32
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is not None and time.time() - entry["created"] > self.max_age:
+            self._remove(path)
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return entry["response"]
+
+    def put(self, key: str, response: str) -> None:
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"created": time.time(), "response": response}, file)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            evict = self.puts % self.evict_interval == 0
+            self.puts += 1
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = 0
+        # Newest first (file time is the creation time), everything past the size limit or too old goes
+        for (modified, size, path) in sorted(entries, reverse=True):
+            total += size
+            if total > self.max_bytes or now - modified > self.max_age:
+                self._remove(path)
+
+    def clear(self) -> None:
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json"):
+                self._remove(os.path.join(self.directory, file_name))
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+cache: LlmCache | None = None
+
+
+def get_cache() -> LlmCache:
+    global cache
+    if cache is None:
+        cache = LlmCache(gp.llm_cache_dir, gp.llm_cache_max_bytes, gp.llm_cache_max_age)
+    return cache
@@ -0,0 +1,159 @@
+import numpy as np
+
+import global_params as gp
+from vector_engine import VectorEngine
+
+
+class LsqSolver(VectorEngine):
+    # Levenberg-Marquardt on the rule residuals, using the same index arrays as the VectorEngine.
+    # One step() is one damped Gauss-Newton iteration, solve() runs to gp.lsq_tolerance.
+    damping: float | None = None
+
+    def get_residuals(self, positions: np.ndarray) -> np.ndarray:
+        return self._build(positions, False)[0]
+
+    def get_cost(self) -> float:
+        residuals = self.get_residuals(self.positions)
+        return float(residuals @ residuals)
+
+    def step(self) -> float:
+        # Returns the squared length of the step taken, 0 once nothing improves anymore
+        (residuals, jacobian) = self._build(self.positions, True)
+        cost = float(residuals @ residuals)
+        if cost < gp.lsq_tolerance:
+            return 0.0
+
+        hessian = jacobian.T @ jacobian
+        gradient = jacobian.T @ residuals
+        if self.damping is None:
+            self.damping = 1e-3 * max(float(np.max(np.diag(hessian))), 1.0)
+
+        identity = np.eye(len(gradient))
+        while self.damping < 1e12:
+            delta = np.linalg.solve(hessian + self.damping * identity, -gradient)
+            new_positions = self.positions + delta.reshape(-1, 2)
+            new_residuals = self.get_residuals(new_positions)
+
+            if float(new_residuals @ new_residuals) < cost:
+                self.positions = new_positions
+                self.damping = max(self.damping / 3, 1e-12)
+                return float(delta @ delta)
+
+            self.damping *= 4
+
+        return 0.0
+
+    def solve(self, max_iterations: int = 100) -> [int, float]:
+        iterations = 0
+        while iterations < max_iterations:
+            iterations += 1
+            if self.step() == 0:
+                break
+
+        return [iterations, self.get_cost()]
+
+    def _build(self, positions: np.ndarray, with_jacobian: bool) -> [np.ndarray, np.ndarray | None]:
+        # Residual rows per rule type: angle (1), segment (1), point on segment (2), ratio (1)
+        counts = [len(self.angle_idx), len(self.segment_idx), 2 * len(self.on_segment_idx), len(self.ratio_idx)]
+        offsets = np.cumsum([0] + counts)
+
+        residuals = np.zeros(offsets[-1], dtype=np.float64)
+        jacobian = np.zeros((offsets[-1], 2 * len(self.names)), dtype=np.float64) if with_jacobian else None
+
+        if counts[0]:
+            self._angle_terms(positions, residuals, jacobian, offsets[0])
+        if counts[1]:
+            self._length_terms(positions, self.segment_idx[:, 0], self.segment_idx[:, 1], 1,
+                               residuals, jacobian, offsets[1])
+            residuals[offsets[1]:offsets[2]] -= self.segment_values
+        if counts[2]:
+            self._on_segment_terms(positions, residuals, jacobian, offsets[2])
+        if counts[3]:
+            start = offsets[3]
+            self._length_terms(positions, self.ratio_idx[:, 0], self.ratio_idx[:, 1], 1,
+                               residuals, jacobian, start)
+            self._length_terms(positions, self.ratio_idx[:, 2], self.ratio_idx[:, 3], -self.ratio_values,
+                               residuals, jacobian, start)
+
+        return [residuals, jacobian]
+
+    @staticmethod
+    def _add_jacobian(jacobian: np.ndarray, rows: np.ndarray, idx: np.ndarray, grad: np.ndarray) -> None:
+        np.add.at(jacobian, (rows, 2 * idx), grad[:, 0])
+        np.add.at(jacobian, (rows, 2 * idx + 1), grad[:, 1])
+
+    def _angle_terms(self, positions: np.ndarray, residuals: np.ndarray, jacobian: np.ndarray | None,
+                     start: int) -> None:
+        u = positions[self.angle_idx[:, 0]] - positions[self.angle_idx[:, 1]]
+        v = positions[self.angle_idx[:, 2]] - positions[self.angle_idx[:, 1]]
+        cross = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+        dot = u[:, 0] * v[:, 0] + u[:, 1] * v[:, 1]
+
+        rows = np.arange(start, start + len(self.angle_idx))
+        residuals[rows] = np.arctan2(np.abs(cross), dot) - self.angle_values
+        if jacobian is None:
+            return
+
+        # d atan2(|c|, d) = (d * sign(c) * dc - |c| * dd) / (c^2 + d^2)
+        sign = np.where(cross < 0, -1.0, 1.0)[:, None]
+        norm = np.maximum(cross * cross + dot * dot, 1e-18)[:, None]
+        d_cross_u = np.column_stack((v[:, 1], -v[:, 0]))
+        d_cross_v = np.column_stack((-u[:, 1], u[:, 0]))
+        grad_u = (dot[:, None] * sign * d_cross_u - np.abs(cross)[:, None] * v) / norm
+        grad_v = (dot[:, None] * sign * d_cross_v - np.abs(cross)[:, None] * u) / norm
+
+        self._add_jacobian(jacobian, rows, self.angle_idx[:, 0], grad_u)
+        self._add_jacobian(jacobian, rows, self.angle_idx[:, 2], grad_v)
+        self._add_jacobian(jacobian, rows, self.angle_idx[:, 1], -(grad_u + grad_v))
+
+    def _length_terms(self, positions: np.ndarray, idx_a: np.ndarray, idx_b: np.ndarray, factor,
+                      residuals: np.ndarray, jacobian: np.ndarray | None, start: int) -> None:
+        # Adds factor * |AB| to the residual rows starting at start
+        ab = positions[idx_b] - positions[idx_a]
+        length = np.maximum(np.hypot(ab[:, 0], ab[:, 1]), 1e-9)
+
+        rows = np.arange(start, start + len(idx_a))
+        factor = np.broadcast_to(np.asarray(factor, dtype=np.float64), length.shape)
+        residuals[rows] += factor * length
+        if jacobian is None:
+            return
+
+        grad = factor[:, None] * ab / length[:, None]
+        self._add_jacobian(jacobian, rows, idx_b, grad)
+        self._add_jacobian(jacobian, rows, idx_a, -grad)
+
+    def _on_segment_terms(self, positions: np.ndarray, residuals: np.ndarray, jacobian: np.ndarray | None,
+                          start: int) -> None:
+        # Two rows per rule: P - Q, where Q = A + t * AB is the closest point of AB
+        p = positions[self.on_segment_idx[:, 0]]
+        a = positions[self.on_segment_idx[:, 1]]
+        b = positions[self.on_segment_idx[:, 2]]
+
+        w = b - a
+        e = p - a
+        w_len_sq = np.maximum(w[:, 0] * w[:, 0] + w[:, 1] * w[:, 1], 1e-18)
+        raw_t = (e * w).sum(axis=1) / w_len_sq
+        t = np.clip(raw_t, 0, 1)
+        diff = e - t[:, None] * w
+
+        rows_x = np.arange(start, start + 2 * len(self.on_segment_idx), 2)
+        rows_y = rows_x + 1
+        residuals[rows_x] = diff[:, 0]
+        residuals[rows_y] = diff[:, 1]
+        if jacobian is None:
+            return
+
+        # t only moves while Q is inside the segment, otherwise Q is glued to an endpoint
+        inside = ((raw_t > 0) & (raw_t < 1))[:, None]
+        dt_dp = np.where(inside, w / w_len_sq[:, None], 0)
+        dt_da = np.where(inside, (2 * t[:, None] * w - w - e) / w_len_sq[:, None], 0)
+        dt_db = np.where(inside, (e - 2 * t[:, None] * w) / w_len_sq[:, None], 0)
+
+        for (idx, diagonal, dt) in [(self.on_segment_idx[:, 0], np.ones_like(t), dt_dp),
+                                    (self.on_segment_idx[:, 1], -(1 - t), dt_da),
+                                    (self.on_segment_idx[:, 2], -t, dt_db)]:
+            # d(P - Q) = diagonal * I - outer(AB, dt)
+            np.add.at(jacobian, (rows_x, 2 * idx), diagonal - w[:, 0] * dt[:, 0])
+            np.add.at(jacobian, (rows_x, 2 * idx + 1), -w[:, 0] * dt[:, 1])
+            np.add.at(jacobian, (rows_y, 2 * idx), -w[:, 1] * dt[:, 0])
+            np.add.at(jacobian, (rows_y, 2 * idx + 1), diagonal - w[:, 1] * dt[:, 1])
@@ -0,0 +1,130 @@
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint
+from compiled_scene import CompiledScene
+from vector_engine import VectorEngine
+from lsq_solver import LsqSolver
+
+executor: ProcessPoolExecutor | None = None
+# Number of the current multi-start solve, shared with the workers. A finished solve moves it on,
+# and starts of older solves that are still running see that and stop
+solve_generation = None
+
+# Check for a stop every this many animate steps, a single step is too cheap to check each time
+stop_check_interval = 64
+
+
+def init_worker(generation) -> None:
+    global solve_generation
+    solve_generation = generation
+
+
+def get_executor(workers: int | None = None) -> ProcessPoolExecutor:
+    # One pool for the whole program, spawning processes per solve costs more than small solves.
+    # The workers are spawned, not forked: the UI process already runs the asyncio thread of async_llm,
+    # and a fork copies its locks in whatever state they are
+    global executor, solve_generation
+    if executor is None:
+        context = multiprocessing.get_context("spawn")
+        solve_generation = context.Value("i", 0)
+        executor = ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                       initargs=(solve_generation,))
+    return executor
+
+
+def is_stopped(generation: int | None, deadline: float | None) -> bool:
+    # deadline is time.time(), the clock the parent and the workers share
+    if deadline is not None and time.time() > deadline:
+        return True
+    return generation is not None and solve_generation is not None and solve_generation.value != generation
+
+
+def scatter_positions(positions: np.ndarray, seed: int) -> np.ndarray:
+    # Random start inside the bounding box of the given positions
+    rng = np.random.default_rng(seed)
+    low = positions.min(axis=0)
+    size = max(float(np.max(positions.max(axis=0) - low)), 1)
+    return low + rng.uniform(0, size, positions.shape)
+
+
+def solve_start(job: tuple) -> dict:
+    # job is (scene, seed, mode, max_iterations), optionally followed by the generation and deadline
+    # of the solve it belongs to; the start gives up with what it has once is_stopped says so
+    (scene, seed, mode, max_iterations) = job[:4]
+    (generation, deadline) = job[4:] if len(job) > 4 else (None, None)
+    if seed != 0:
+        scene = scene.copy(scatter_positions(scene.positions, seed))
+
+    iterations = 0
+    if mode == "solve_fast":
+        engine = LsqSolver.from_scene(scene)
+        while iterations < max_iterations and not is_stopped(generation, deadline):
+            iterations += 1
+            if engine.step() == 0:
+                break
+        residual = engine.get_cost()
+    else:
+        engine = VectorEngine.from_scene(scene)
+        energy = float("inf")
+        while iterations < max_iterations and energy >= gp.convergence_threshold:
+            if iterations % stop_check_interval == 0 and is_stopped(generation, deadline):
+                break
+            energy = engine.step()
+            iterations += 1
+        residual = LsqSolver.from_scene(scene.copy(engine.positions)).get_cost()
+
+    return {"points": engine.get_positions(), "residual": residual, "iterations": iterations, "seed": seed}
+
+
+def solve_multi_start(sim_points: dict[str, SimPoint], rules: dict, starts: int = 8,
+                      time_budget: float = 2.0, mode: str = "solve_fast", max_iterations: int = 200) -> dict | None:
+    # Solves copies of the scene from different starts in parallel and keeps the lowest residual.
+    # Start 0 is the current layout, the others are scattered with their own seed.
+    # Returns early once a start reaches gp.residual_tolerance or the time budget is used up.
+    if not sim_points:
+        return None
+    scene = CompiledScene.compile(sim_points, rules)
+
+    deadline = time.time() + time_budget
+    pool = get_executor()
+    generation = solve_generation.value
+    pending = {pool.submit(solve_start, (scene, seed, mode, max_iterations, generation, deadline))
+               for seed in range(starts)}
+    best: dict | None = None
+
+    while pending:
+        (done, pending) = wait(pending, timeout=max(deadline - time.time(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Warning: a multi-start solve failed and is skipped: {e}", file=sys.stderr)
+                continue
+            if best is None or result["residual"] < best["residual"]:
+                best = result
+
+        if best is not None and best["residual"] < gp.residual_tolerance:
+            break
+
+    # cancel() only drops the starts that did not begin yet, the running ones stop on the new generation
+    for future in pending:
+        future.cancel()
+    with solve_generation.get_lock():
+        solve_generation.value += 1
+
+    return best
+
+
+def apply_positions(sim_points: dict[str, SimPoint], positions: dict[str, list[float]]) -> None:
+    for (name, (x, y)) in positions.items():
+        if name in sim_points:
+            sim_points[name].position.update(x, y)
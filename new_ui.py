@@ -1,19 +1,28 @@
+import itertools
 import tkinter as tk
 from tkinter import font
 from tkinter import ttk
+from typing import TYPE_CHECKING, Iterator
 
-from pygame import Vector2
 import global_params as gp
 
 from rules import Rule
-from simulated_point import SimulatedPoint as SimPoint
+from simulated_point import SimulatedPoint as SimPoint, transform_points
 from drawable import Drawable
 
-from utils import parse_json, get_bound_rect
+from utils import scene_sections
+from simulation import step_simulation, create_engine, parse_scene, seed_scene, is_converged
+from rule_spec import get_rule_specs, get_total_residual
+from json_stream import SceneStreamParser
+from json_repair import normalize_element
+from warm_start import is_helper, get_warm_positions, align_positions
+from frame_scheduler import FrameScheduler
+from camera import Camera, get_bounds, get_array_bounds
+from profiler import profiler
 
-import ai_interface
-
-import threading
+# numpy solvers, process pools and the LLM client are imported when first used, so the window opens fast
+if TYPE_CHECKING:
+    from vector_engine import VectorEngine
 
 
 example_json="""
@@ -55,15 +64,27 @@ class BlueprintGenApp(tk.Tk):
     sim_points: dict[str, SimPoint] | None = None
     drawables: dict[str, Drawable] | None = None
     rules: dict[str, Rule] | None = None
+    engine: "VectorEngine | None" = None
     last_json: str | None = None
     current_model: str = "gemini"
 
     drawing_job = None
     fetching_job = None
+    stream_parser: SceneStreamParser | None = None
+    # Helper names of the scene being streamed, numbered from _1 again for every stream
+    helper_names: "Iterator[int] | None" = None
+    # Where the settled layout goes in the layout cache, None once stored or when it came from there
+    layout_key: str | None = None
+    layout_order: list[str] | None = None
+    # [sim_points, rules] of the scene shown before the current submit, for the warm start
+    previous_scene: list | None = None
 
     def __init__(self):
         super().__init__()
 
+        self.scheduler = FrameScheduler(self.step_solver, self.render)
+        self.camera = Camera()
+
         self.title("Blueprint Generator")
         self.geometry('1000x1000')
         self.minsize(width=800, height=800)
@@ -128,78 +149,254 @@ class BlueprintGenApp(tk.Tk):
 
         self.button2.config(command=self.on_click_recalculate)
 
+        # Skips the LLM and layout caches, for when a fresh extraction or solve is wanted
+        self.fresh_extraction = tk.BooleanVar(value=False)
+        self.fresh_check = ttk.Checkbutton(self.button_frame, text="Fresh extraction", variable=self.fresh_extraction)
+        self.fresh_check.pack(side=tk.LEFT, padx=5)
+
         self.button.config(command=self.on_click_submit)
 
         self.canvas = tk.Canvas(self, bg='#eeeee4', highlightthickness=1, highlightbackground='#eab676')
         self.canvas.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+        self.canvas.bind('<Configure>', lambda event: self.wake())
 
-    def fetch_response(self, problem: str):
-        json = ai_interface.generate_json(problem, self.current_model)
-        self.last_json = json
-        print(json)
-        (self.sim_points, self.drawables, self.rules) = parse_json(json)
-        self.fetching_job = None
-        self.button['state'] = tk.NORMAL
+        self.bind('<F3>', self.on_toggle_profiler)
+        self.bind('<F4>', self.on_dump_profile)
 
-    def update_and_redraw(self) -> None:
-        if self.sim_points is None or len(self.sim_points.values()) == 0:
-            self.drawing_job = self.canvas.after(int(gp.delta_time * 1000), self.update_and_redraw)
+    def poll_response(self):
+        if self.stream_parser:
+            self.apply_stream_events()
+
+        if not self.fetching_job.done():
+            self.canvas.after(50 if self.stream_parser else 100, self.poll_response)
             return
 
-        # Apply all rules
-        for rule in self.rules.values():
-            rule.enforce()
+        try:
+            json = self.fetching_job.result()
+            self.last_json = json
+            print(json)
+            if not self.stream_parser or not self.sim_points:
+                # Nothing usable was streamed, parse the whole answer (and show its errors)
+                self.load_scene(json, not self.fresh_extraction.get(), self.previous_scene)
+            else:
+                if not self.apply_cached_layout(not self.fresh_extraction.get()):
+                    # The elements were placed one by one as they came in, seed the finished scene as a whole
+                    seed_scene(self.sim_points, self.drawables, self.rules, self.previous_scene)
+                self.rebuild_engine()
+                # Run until settled, so a new layout gets stored
+                self.wake()
+        except Exception as e:
+            print(f"Error: could not generate blueprint: {e}")
+        finally:
+            self.fetching_job = None
+            self.stream_parser = None
+            self.previous_scene = None
+            self.button['state'] = tk.NORMAL
 
-        # Update Positions
-        for sim_point in self.sim_points.values():
-            sim_point.update()
+    def apply_stream_events(self) -> None:
+        # Grow the live scene with every element that finished streaming
+        changed = False
+        while not self.stream_parser.events.empty():
+            (key, index, element) = self.stream_parser.events.get()
+            if key not in scene_sections:
+                continue
+            try:
+                (element, fixes) = normalize_element(key, element, index)
+                for fix in fixes:
+                    print(f"Warning: repaired json: {fix}")
+                known_points = set(self.sim_points)
+                scene_sections[key](self.sim_points, self.drawables, self.rules, element, self.helper_names)
+            except Exception as e:
+                print(f"{e} Streamed element of '{key}' skipped.")
+            else:
+                if self.previous_scene and gp.warm_start:
+                    # Points the previous scene had start where they were solved
+                    for name in set(self.sim_points) - known_points:
+                        if name in self.previous_scene[0] and not is_helper(name):
+                            self.sim_points[name].position.update(self.previous_scene[0][name].position)
+            changed = True
+
+        if changed:
+            self.rebuild_engine()
+            self.wake()
+
+    def rebuild_engine(self) -> None:
+        self.engine = create_engine(self.sim_points, self.rules)
+        if self.engine is not None and gp.solver_mode == "solve_fast":
+            # Show the solved layout right away
+            self.engine.solve()
+            self.engine.write_positions(self.sim_points)
+
+    def load_scene(self, json_str: str, use_layout_cache: bool = True, previous: list | None = None) -> None:
+        # previous is the [sim_points, rules] of the scene this one was edited from, for a warm start
+        (sim_points, drawables, rules) = parse_scene(json_str, previous)
+        (self.sim_points, self.drawables, self.rules) = (sim_points, drawables, rules)
+
+        if self.apply_cached_layout(use_layout_cache):
+            if previous and gp.warm_start:
+                # Keep the cached layout where the previous drawing was
+                align_positions({name: p.position for (name, p) in sim_points.items()},
+                                get_warm_positions(previous[0], previous[1], sim_points, rules))
+        else:
+            if gp.decompose_scene or gp.multi_start_count > 1:
+                from multi_start import solve_multi_start, apply_positions
+                from decomposition import solve_decomposed
+            if gp.decompose_scene:
+                apply_positions(sim_points, solve_decomposed(sim_points, rules, drawables, gp.solver_mode))
+            if gp.multi_start_count > 1:
+                best = solve_multi_start(sim_points, rules, gp.multi_start_count, gp.multi_start_time_budget)
+                if best:
+                    apply_positions(sim_points, best["points"])
+        self.camera.reset()
+        self.rebuild_engine()
+        self.wake()
+
+    def apply_cached_layout(self, use_layout_cache: bool = True) -> bool:
+        # Moves the current scene to its cached layout. On a miss the layout is stored once the solver settles
+        self.layout_key = None
+        if not gp.use_layout_cache:
+            return False
+        from layout_cache import get_layout_key, load_layout
+
+        (key, order) = get_layout_key(self.sim_points, self.rules, self.drawables)
+        if use_layout_cache and load_layout(self.sim_points, key, order):
+            return True
+        (self.layout_key, self.layout_order) = (key, order)
+        return False
+
+    def store_layout(self, energy: float) -> None:
+        # Only a layout that satisfies the rules, a tangled local minimum would be served again for the cache's lifetime
+        if self.layout_key is None:
+            return
+        from layout_cache import store_layout
 
-        # Calculate bounding box and center
-        [top_left, bottom_right] = get_bound_rect(list(self.sim_points.values()))
-        screen_center = Vector2(self.canvas.winfo_width(), self.canvas.winfo_height()) / 2
+        if self.engine:
+            self.engine.write_positions(self.sim_points)
+        positions = {name: sim_point.position for (name, sim_point) in self.sim_points.items()}
+        if is_converged(self.engine, energy, get_total_residual(get_rule_specs(self.rules), positions)):
+            store_layout(self.sim_points, self.layout_key, self.layout_order)
+        self.layout_key = None
+
+    def update_and_redraw(self) -> None:
+        if not self.sim_points:
+            # Nothing to draw (yet, or the stream failed), stay idle like wake() until a scene arrives
+            self.drawing_job = None
+            return
 
-        # Scales for each axis, required for all points to fit on screen
-        scale_x = (self.canvas.winfo_width()) / ((bottom_right.x - top_left.x) * 1.3)
-        scale_y = (self.canvas.winfo_height()) / ((bottom_right.y - top_left.y) * 1.3)
-        scale = min(scale_x, scale_y)
+        (energy, delay) = self.scheduler.run_frame()
 
-        points_center = Vector2(top_left.x + (bottom_right.x - top_left.x) / 2,
-                                top_left.y + (bottom_right.y - top_left.y) / 2)
-        translation = -points_center + (1 / scale) * screen_center
+        if energy < gp.convergence_threshold:
+            # Layout settled, stay idle until something changes
+            self.store_layout(energy)
+            self.drawing_job = None
+            return
 
-        for sim_point in self.sim_points.values():
-            sim_point.update_canvas_position(translation, 0, scale)
+        self.drawing_job = self.canvas.after(int(delay * 1000), self.update_and_redraw)
+
+    def step_solver(self) -> float:
+        if self.engine:
+            # Positions are written back once per rendered frame, not per step
+            with profiler.phase("engine_step"):
+                return self.engine.step()
+        return step_simulation(self.sim_points, self.rules)
+
+    def render(self) -> None:
+        if self.engine:
+            with profiler.phase("write_positions"):
+                self.engine.write_positions(self.sim_points)
+
+        with profiler.phase("get_bounds"):
+            if self.engine:
+                bounds = get_array_bounds(self.engine.positions)
+            else:
+                bounds = get_bounds(list(self.sim_points.values()))
+            self.camera.update(bounds, self.canvas.winfo_width(), self.canvas.winfo_height())
+
+        with profiler.phase("transform_points"):
+            transform_points(self.sim_points.values(), self.camera.translation, 0, self.camera.scale)
+
+        with profiler.phase("draw"):
+            for drawable in self.drawables.values():
+                item = getattr(drawable, "item", None) if gp.retained_canvas else None
+                if item is None:
+                    drawable.draw()
+                else:
+                    item.sync(self.canvas)
+
+        if profiler.enabled:
+            profiler.end_frame(self.sim_points, self.rules)
+            if profiler.frame % 10 == 0:
+                self.update_profile_overlay()
+
+    def update_profile_overlay(self) -> None:
+        if not self.canvas.find_withtag("profile_overlay"):
+            self.canvas.create_text(8, 8, anchor=tk.NW, font=("Courier", 9), fill="#444444", tags="profile_overlay")
+        self.canvas.itemconfigure("profile_overlay", text=profiler.get_summary())
+        self.canvas.tag_raise("profile_overlay")
+
+    def on_toggle_profiler(self, event=None) -> None:
+        # F3: start profiling and show the overlay, or stop and hide it (the numbers are kept for F4)
+        profiler.enabled = not profiler.enabled
+        if profiler.enabled:
+            profiler.reset()
+            self.update_profile_overlay()
+            self.wake()
+        else:
+            self.canvas.delete("profile_overlay")
 
-        for drawable in self.drawables.values():
-            drawable.draw()
+    def on_dump_profile(self, event=None) -> None:
+        profiler.dump(gp.profile_trace_path)
+        print(f"Profile trace written to {gp.profile_trace_path}")
 
-        self.drawing_job = self.canvas.after(int(gp.delta_time * 1000), self.update_and_redraw)
+    def wake(self) -> None:
+        if self.drawing_job is None and self.sim_points:
+            self.scheduler.reset()
+            self.drawing_job = self.canvas.after(int(gp.delta_time * 1000), self.update_and_redraw)
 
     def on_click_submit(self):
+        from async_llm import get_runner
+
         if self.drawing_job is None:
             self.drawing_job = self.canvas.after(1000, self.update_and_redraw)
 
-        self.button['state'] = tk.DISABLED
-        self.canvas.delete("all")
-        (self.sim_points, self.drawables, self.rules) = (None, None, None)
-
         if self.fetching_job:
             return
 
+        self.button['state'] = tk.DISABLED
+        self.canvas.delete("all")
+        # The edited problem starts from this solved scene
+        self.previous_scene = None
+        if gp.warm_start and self.sim_points:
+            if self.engine:
+                self.engine.write_positions(self.sim_points)
+            self.previous_scene = [self.sim_points, self.rules]
+        (self.sim_points, self.drawables, self.rules, self.engine) = (None, None, None, None)
+        self.layout_key = None
+
         problem = self.text_box.get("1.0", "end-1c")
 
-        if problem != "":
-            self.fetching_job = threading.Thread(target=self.fetch_response, args=[problem])
-            self.fetching_job.start()
+        if problem != "" and gp.stream_responses:
+            # Start with an empty scene and build it while the answer streams in
+            (self.sim_points, self.drawables, self.rules) = ({}, {}, {})
+            self.stream_parser = SceneStreamParser()
+            self.helper_names = itertools.count(1)
+            self.fetching_job = get_runner().submit_stream(problem, self.stream_parser.feed, self.current_model,
+                                                           not self.fresh_extraction.get())
+            self.poll_response()
+        elif problem != "":
+            self.fetching_job = get_runner().submit(problem, self.current_model, not self.fresh_extraction.get())
+            self.poll_response()
         else:
-            (self.sim_points, self.drawables, self.rules) = parse_json(example_json)
+            self.load_scene(example_json)
             self.last_json = example_json
             self.button['state'] = tk.NORMAL
 
     def on_click_recalculate(self):
+        # Solves the scene again from the start without the cached layout, the way out of a bad one.
+        # A converged result replaces the cached layout
         if self.last_json:
             self.canvas.delete("all")
-            (self.sim_points, self.drawables, self.rules) = parse_json(self.last_json)
+            self.load_scene(self.last_json, False)
 
     def on_select(self, event):
         selected_value = self.combo.get()
@@ -0,0 +1,89 @@
+import argparse
+import random
+import time
+
+import global_params as gp
+import vector2
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint, update_points, transform_points
+
+
+# The per point code as it was before the batched API, kept here as the baseline
+def legacy_tick(sim_points: list[SimPoint], translate: Vector2, scale: float) -> float:
+    energy = 0
+    for sim_point in sim_points:
+        energy += sim_point.force.length_squared()
+        if (sim_point.force.length() * gp.delta_step) >= gp.force_min_threshold:
+            sim_point.position += gp.delta_step * sim_point.force
+            sim_point.force = Vector2(0, 0)
+
+    for sim_point in sim_points:
+        last_canvas_position = sim_point.canvas_position
+        canvas_position = (sim_point.position + translate).rotate(0)
+        canvas_position *= scale
+        if (last_canvas_position - canvas_position).magnitude() < gp.canvas_min_move_dst:
+            canvas_position = last_canvas_position
+        sim_point.canvas_position = canvas_position
+    return energy
+
+
+def batched_tick(sim_points: list[SimPoint], translate: Vector2, scale: float) -> float:
+    energy = update_points(sim_points)
+    transform_points(sim_points, translate, 0, scale)
+    return energy
+
+
+class VectorCounter:
+    # Counts Vector2 constructions while active
+    def __init__(self):
+        self.count = 0
+        self.init = Vector2.__init__
+
+    def __enter__(self):
+        def counting_init(vector, *args):
+            self.count += 1
+            self.init(vector, *args)
+        vector2.Vector2.__init__ = counting_init
+        return self
+
+    def __exit__(self, *exc):
+        vector2.Vector2.__init__ = self.init
+
+
+def run(tick, point_count: int, ticks: int) -> [float, float]:
+    rng = random.Random(1)
+    sim_points = [SimPoint(Vector2(rng.uniform(0, 500), rng.uniform(0, 500)), f"P{i}") for i in range(point_count)]
+    forces = [(rng.uniform(-5, 5), rng.uniform(-5, 5)) for _ in range(point_count)]
+    translate = Vector2(10, 20)
+
+    def apply_forces() -> None:
+        # Stands in for the rules, writes the forces without allocating
+        for (sim_point, (fx, fy)) in zip(sim_points, forces):
+            sim_point.force.x += fx
+            sim_point.force.y += fy
+
+    with VectorCounter() as counter:
+        apply_forces()
+        tick(sim_points, translate, 1.5)
+    allocations = counter.count
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        apply_forces()
+        tick(sim_points, translate, 1.5)
+    return [allocations, (time.perf_counter() - start) / ticks]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Vector2 allocations and time per tick of the SimPoint hot path.")
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    for (name, tick) in [("before", legacy_tick), ("after", batched_tick)]:
+        (allocations, seconds) = run(tick, args.points, args.ticks)
+        print(f"{name:<7}{allocations:>8} Vector2/tick{seconds * 1e6:>10.1f} us/tick ({args.points} points)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import global_params as gp
+from rule_spec import get_rule_specs, get_residual
+
+
+class Phase:
+    # Context manager that adds its duration to one phase of the profiler
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    # Opt-in timing of the solve/draw loop: time and calls per phase and per rule type, frame records,
+    # and per-rule residuals sampled every gp.profile_residual_interval frames.
+    # While disabled, phase() hands out one shared no-op context and nothing is recorded.
+    disabled_phase = nullcontext()
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.phases: dict[str, list] = {}  # name -> [calls, total seconds, max seconds]
+        self.frame_phases: dict[str, float] = {}
+        self.frames: deque = deque(maxlen=gp.profile_max_frames)
+        self.residuals: deque = deque(maxlen=gp.profile_max_frames)
+        self.frame = 0
+        self.frame_start = time.perf_counter()
+
+    def phase(self, name: str):
+        return Phase(self, name) if self.enabled else self.disabled_phase
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = [0, 0.0, 0.0]
+        entry[0] += calls
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        self.frame_phases[name] = self.frame_phases.get(name, 0.0) + seconds
+
+    def enforce_rules(self, rules: dict) -> None:
+        # rule.enforce() for every rule, timed per rule type
+        times: dict[str, float] = {}
+        counts: dict[str, int] = {}
+        for rule in rules.values():
+            start = time.perf_counter()
+            rule.enforce()
+            rule_type = f"rule:{type(rule).__name__}"
+            times[rule_type] = times.get(rule_type, 0.0) + time.perf_counter() - start
+            counts[rule_type] = counts.get(rule_type, 0) + 1
+
+        for (rule_type, seconds) in times.items():
+            self.add_time(rule_type, seconds, counts[rule_type])
+
+    def end_frame(self, sim_points: dict | None = None, rules: dict | None = None) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frames.append({"frame": self.frame, "time": now - self.frame_start, **self.frame_phases})
+
+        if rules and self.frame % gp.profile_residual_interval == 0:
+            positions = {name: sim_point.position for (name, sim_point) in sim_points.items()}
+            # Rules are keyed by (type, points...), the trace gets "segment A B" like the json
+            self.residuals.append({"frame": self.frame, **{" ".join(key): abs(get_residual(spec, positions))
+                                                           for (key, spec) in get_rule_specs(rules).items()}})
+
+        self.frame += 1
+        self.frame_phases = {}
+        self.frame_start = now
+
+    def get_summary(self) -> str:
+        lines = [f"frames {self.frame}"]
+        if self.frames:
+            mean_frame = sum(f["time"] for f in self.frames) / len(self.frames)
+            lines[0] += f"   {mean_frame * 1000:.2f} ms/frame"
+        for (name, (calls, total, longest)) in sorted(self.phases.items(), key=lambda p: -p[1][1]):
+            per_frame = total / max(self.frame, 1)
+            lines.append(f"{name:<28}{per_frame * 1000:>8.3f} ms/frame{calls:>9} calls{longest * 1000:>8.2f} ms max")
+        if self.residuals:
+            last = self.residuals[-1]
+            worst = max((key for key in last if key != "frame"), key=lambda key: last[key], default=None)
+            if worst is not None:
+                lines.append(f"worst residual {worst}: {last[worst]:.3e}")
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        # .csv gets one row per frame with the phase times, anything else the whole trace as json
+        if path.endswith(".csv"):
+            columns = ["frame", "time"] + sorted({key for f in self.frames for key in f} - {"frame", "time"})
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=columns, restval=0)
+                writer.writeheader()
+                writer.writerows(self.frames)
+            return
+
+        trace = {
+            "phases": {name: {"calls": calls, "total": total, "max": longest}
+                       for (name, (calls, total, longest)) in self.phases.items()},
+            "frames": list(self.frames),
+            "residuals": list(self.residuals),
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(trace, file)
+
+
+profiler = Profiler()
@@ -0,0 +1,48 @@
+import argparse
+import sys
+import time
+
+import global_params as gp
+import ai_interface
+
+
+def measure(problem: str, llm_model: str, variant: str) -> dict:
+    start = time.perf_counter()
+    (response, usage) = ai_interface.request_json_with_usage(problem, llm_model, variant)
+    usage["latency"] = time.perf_counter() - start
+    usage["response_chars"] = len(response)
+    return usage
+
+
+def main(argv: list[str] | None = None) -> None:
+    # Sends every problem once per prompt variant (never cached locally) and prints token counts and latency
+    parser = argparse.ArgumentParser(description="Compare prompt variants by tokens and latency.")
+    parser.add_argument("input", help="text file with one problem per line, or - for stdin")
+    parser.add_argument("--model", choices=["Gemini", "ChatGPT"], default="Gemini")
+    parser.add_argument("--variants", nargs="+", choices=list(gp.prompts), default=list(gp.prompts))
+    args = parser.parse_args(argv)
+
+    file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with file:
+        problems = [line.strip() for line in file if line.strip()]
+
+    print(f"{'variant':<10}{'prompt chars':>14}{'prompt tok':>12}{'cached tok':>12}{'response tok':>14}{'latency s':>11}")
+    for variant in args.variants:
+        results = []
+        for problem in problems:
+            try:
+                results.append(measure(problem, args.model, variant))
+            except Exception as e:
+                print(f"Warning: request failed for variant '{variant}': {e!r}")
+        if not results:
+            continue
+
+        def mean(key: str) -> float:
+            return sum(r[key] for r in results) / len(results)
+
+        print(f"{variant:<10}{len(ai_interface.get_prompt(variant)):>14}{mean('prompt_tokens'):>12.0f}"
+              f"{mean('cached_tokens'):>12.0f}{mean('response_tokens'):>14.0f}{mean('latency'):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint
+from integrators import create_integrator
+
+
+class RuleEngine:
+    # The Rule objects and SimPoints behind the same interface as the VectorEngine (positions/forces arrays,
+    # enforce, update, step), so every integrator can also drive rule.enforce()
+    def __init__(self, sim_points: dict[str, SimPoint], rules: dict):
+        self.names: list[str] = list(sim_points.keys())
+        self.sim_points: list[SimPoint] = list(sim_points.values())
+        self.rules = list(rules.values())
+
+        self.positions = np.array([[p.position.x, p.position.y] for p in self.sim_points],
+                                  dtype=np.float64).reshape(-1, 2)
+        self.forces = np.zeros_like(self.positions)
+        self.integrator = create_integrator()
+
+    def enforce(self) -> None:
+        for (sim_point, (x, y), (fx, fy)) in zip(self.sim_points, self.positions.tolist(), self.forces.tolist()):
+            sim_point.position.x = x
+            sim_point.position.y = y
+            sim_point.force.x = fx
+            sim_point.force.y = fy
+
+        for rule in self.rules:
+            rule.enforce()
+
+        self.forces[:] = [[p.force.x, p.force.y] for p in self.sim_points]
+
+    def force_energy(self) -> float:
+        return float(np.sum(self.forces * self.forces))
+
+    def update(self) -> None:
+        moving = np.hypot(self.forces[:, 0], self.forces[:, 1]) * gp.delta_step >= gp.force_min_threshold
+        self.positions[moving] += gp.delta_step * self.forces[moving]
+        self.forces[moving] = 0
+
+    def step(self) -> float:
+        return self.integrator.step(self)
+
+    def write_positions(self, sim_points: dict[str, SimPoint]) -> None:
+        for (sim_point, (x, y)) in zip(self.sim_points, self.positions.tolist()):
+            sim_point.position.x = x
+            sim_point.position.y = y
+
+    def get_positions(self) -> dict[str, list[float]]:
+        return dict(zip(self.names, self.positions.tolist()))
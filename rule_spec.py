@@ -0,0 +1,93 @@
+import math
+import sys
+
+ANGLE = "angle"
+SEGMENT = "segment"
+POINT_ON_SEGMENT = "point_on_segment"
+RATIO = "ratio"
+
+POINT = "point"
+LINE = "line"
+CIRCLE = "circle"
+
+
+class RuleSpec:
+    # Plain description of a rule, by point names, so solvers can work without the Rule objects.
+    # angle: [A, B, C] with B as the vertex, value in degrees
+    # segment: [A, B], value is the length
+    # point_on_segment: [P, A, B], no value
+    # ratio: [A, B, C, D] meaning AB:CD = value
+    def __init__(self, rule_type: str, points: list[str], value: float | None = None):
+        self.rule_type = rule_type
+        self.points = points
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"RuleSpec({self.rule_type}, {self.points}, {self.value})"
+
+
+class DrawableSpec:
+    # Plain description of a drawn element, by point names, so the solvers need no canvas items.
+    # point: [P]
+    # line: [A, B], polygon is the drawn polygon it is a side of
+    # circle: the figure [A, B, C, ...] it is inscribed in or circumscribed around, center is its center point
+    def __init__(self, kind: str, points: list[str], inscribed: bool = False, center: str | None = None,
+                 polygon: list[str] | None = None):
+        self.kind = kind
+        self.points = points
+        self.inscribed = inscribed
+        self.center = center
+        self.polygon = polygon
+
+    def __repr__(self) -> str:
+        return f"DrawableSpec({self.kind}, {self.points})"
+
+
+def get_drawable_specs(drawables: dict) -> list[DrawableSpec]:
+    return [d.spec for d in drawables.values() if getattr(d, "spec", None) is not None]
+
+
+def get_rule_specs(rules: dict) -> dict[str, RuleSpec]:
+    specs: dict[str, RuleSpec] = {}
+
+    for key, rule in rules.items():
+        spec = getattr(rule, "spec", None)
+        if spec is None:
+            print(f"Warning: rule '{key}' has no spec and is ignored.", file=sys.stderr)
+            continue
+        specs[key] = spec
+
+    return specs
+
+
+def get_residual(spec: RuleSpec, positions: dict) -> float:
+    # How far the rule is from being satisfied; angles in radians, everything else in length units.
+    # positions maps point names to anything with .x and .y (e.g. Vector2)
+    p = [positions[name] for name in spec.points]
+
+    if spec.rule_type == ANGLE:
+        (ax, ay) = (p[0].x - p[1].x, p[0].y - p[1].y)
+        (cx, cy) = (p[2].x - p[1].x, p[2].y - p[1].y)
+        current = math.atan2(abs(ax * cy - ay * cx), ax * cx + ay * cy)
+        return current - math.radians(spec.value)
+    elif spec.rule_type == SEGMENT:
+        return math.dist((p[0].x, p[0].y), (p[1].x, p[1].y)) - spec.value
+    elif spec.rule_type == POINT_ON_SEGMENT:
+        (bax, bay) = (p[1].x - p[2].x, p[1].y - p[2].y)
+        (bpx, bpy) = (p[0].x - p[2].x, p[0].y - p[2].y)
+        ba_len_sq = bax * bax + bay * bay
+        t = 0 if ba_len_sq == 0 else min(max((bax * bpx + bay * bpy) / ba_len_sq, 0), 1)
+        return math.dist((p[0].x, p[0].y), (p[2].x + t * bax, p[2].y + t * bay))
+    elif spec.rule_type == RATIO:
+        ab = math.dist((p[0].x, p[0].y), (p[1].x, p[1].y))
+        cd = math.dist((p[2].x, p[2].y), (p[3].x, p[3].y))
+        return ab - spec.value * cd
+    else:
+        raise Exception(f"Error: unknown rule type '{spec.rule_type}'.")
+
+
+def get_total_residual(specs: dict[str, RuleSpec], positions: dict) -> float:
+    total = 0
+    for spec in specs.values():
+        total += get_residual(spec, positions) ** 2
+    return total
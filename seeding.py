@@ -0,0 +1,263 @@
+import random
+
+import global_params as gp
+from vector2 import Vector2
+
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import RuleSpec, get_rule_specs, ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO
+from geom_utils import get_circle_intersections, find_line_intersection, project_on_line
+
+
+# How far (in default lengths) two rays may meet from their vertices to place a point
+max_ray_length = 4
+
+
+class SceneKnowledge:
+    # Rules of a scene looked up by point names, used to construct start positions
+    def __init__(self, specs: list[RuleSpec]):
+        self.lengths: dict[frozenset, float] = {}
+        self.angles: dict[tuple[str, frozenset], float] = {}
+        self.on_segments: list[list[str]] = []
+        self.ratios: list[RuleSpec] = []
+        self.neighbours: dict[str, list[str]] = {}
+
+        for spec in specs:
+            if spec.rule_type == SEGMENT:
+                self.lengths[frozenset(spec.points)] = spec.value
+            elif spec.rule_type == ANGLE:
+                self.angles[(spec.points[1], frozenset([spec.points[0], spec.points[2]]))] = spec.value
+            elif spec.rule_type == POINT_ON_SEGMENT:
+                self.on_segments.append(spec.points)
+            elif spec.rule_type == RATIO:
+                self.ratios.append(spec)
+
+            for p in spec.points:
+                neighbours = self.neighbours.setdefault(p, [])
+                neighbours.extend(q for q in spec.points if q != p and q not in neighbours)
+
+        self.default_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 100
+
+    def get_length(self, a: str, b: str, placed: dict[str, Vector2]) -> float | None:
+        if frozenset([a, b]) in self.lengths:
+            return self.lengths[frozenset([a, b])]
+
+        # AB:CD = r with the other segment already known
+        for spec in self.ratios:
+            (seg_1, seg_2) = (frozenset(spec.points[:2]), frozenset(spec.points[2:]))
+            if seg_1 == seg_2:
+                continue
+            if seg_1 == frozenset([a, b]):
+                other = self._get_plain_length(spec.points[2], spec.points[3], placed)
+                if other is not None:
+                    return spec.value * other
+            elif seg_2 == frozenset([a, b]):
+                other = self._get_plain_length(spec.points[0], spec.points[1], placed)
+                if other is not None:
+                    return other / spec.value
+
+        return None
+
+    def _get_plain_length(self, a: str, b: str, placed: dict[str, Vector2]) -> float | None:
+        if frozenset([a, b]) in self.lengths:
+            return self.lengths[frozenset([a, b])]
+        if a in placed and b in placed:
+            return (placed[a] - placed[b]).magnitude()
+        return None
+
+    def get_angle(self, vertex: str, a: str, b: str) -> float | None:
+        return self.angles.get((vertex, frozenset([a, b])))
+
+
+def pick_side(candidates: list[Vector2], x: str, placed: dict[str, Vector2], knowledge: SceneKnowledge,
+              exclude: list[str]) -> Vector2:
+    # Mirror images both satisfy the rules. Interior angles of a polygon W-O-V-X given at O and V keep X on the side
+    # of OV where W is, so polygon chains keep their winding instead of zigzagging outwards.
+    # Otherwise prefer the candidate away from the rest of the figure, so new triangles do not fold onto old ones
+    for ((vertex, ends), _) in knowledge.angles.items():
+        if x not in ends or vertex not in placed:
+            continue
+        o = next(iter(ends - {x}))
+        if o not in placed:
+            continue
+        for ((o_vertex, o_ends), _) in knowledge.angles.items():
+            if o_vertex != o or vertex not in o_ends:
+                continue
+            w = next(iter(o_ends - {vertex}))
+            if w not in placed:
+                continue
+            side = (placed[vertex] - placed[o]).cross(placed[w] - placed[o])
+            same_side = [c for c in candidates if (placed[vertex] - placed[o]).cross(c - placed[o]) * side > 0]
+            if same_side:
+                candidates = same_side
+
+    others = [p for (name, p) in placed.items() if name not in exclude]
+    if not others or len(candidates) == 1:
+        return candidates[0]
+
+    centroid = sum(others, Vector2(0, 0)) / len(others)
+    return max(candidates, key=lambda c: (c - centroid).magnitude())
+
+
+def place_on_segment(knowledge: SceneKnowledge, placed: dict[str, Vector2], x: str) -> Vector2 | None:
+    for (p, a, b) in knowledge.on_segments:
+        if p != x or a not in placed or b not in placed:
+            continue
+
+        t = 0.5
+        ab_len = (placed[b] - placed[a]).magnitude()
+
+        # Ratio point: AX:XB = r
+        for spec in knowledge.ratios:
+            (seg_1, seg_2) = (frozenset(spec.points[:2]), frozenset(spec.points[2:]))
+            if seg_1 == frozenset([a, x]) and seg_2 == frozenset([x, b]):
+                t = spec.value / (1 + spec.value)
+            elif seg_1 == frozenset([x, b]) and seg_2 == frozenset([a, x]):
+                t = 1 / (1 + spec.value)
+
+        # Known distance to one of the ends
+        if knowledge.get_length(a, x, placed) is not None and ab_len > 0:
+            t = knowledge.get_length(a, x, placed) / ab_len
+        elif knowledge.get_length(b, x, placed) is not None and ab_len > 0:
+            t = 1 - knowledge.get_length(b, x, placed) / ab_len
+
+        # Foot of a height: right angle at X towards a placed point off the segment
+        for c in knowledge.neighbours.get(x, []):
+            if c in (a, b) or c not in placed:
+                continue
+            if 90 in (knowledge.get_angle(x, a, c), knowledge.get_angle(x, b, c)):
+                return project_on_line(placed[c], placed[a], placed[b])
+
+        return placed[a] + min(max(t, 0), 1) * (placed[b] - placed[a])
+
+    return None
+
+
+def place_by_lengths(knowledge: SceneKnowledge, placed: dict[str, Vector2], x: str) -> Vector2 | None:
+    # Triangle from two known sides to placed points
+    known = [(p, knowledge.get_length(p, x, placed)) for p in knowledge.neighbours.get(x, []) if p in placed]
+    known = [(p, length) for (p, length) in known if length is not None]
+
+    for i in range(len(known)):
+        for j in range(i + 1, len(known)):
+            ((p, r_p), (q, r_q)) = (known[i], known[j])
+            candidates = get_circle_intersections(placed[p], r_p, placed[q], r_q)
+            if candidates:
+                return pick_side(candidates, x, placed, knowledge, [p, q])
+
+    return None
+
+
+def place_by_angles(knowledge: SceneKnowledge, placed: dict[str, Vector2], x: str) -> Vector2 | None:
+    rays: list[tuple[str, Vector2, list[Vector2]]] = []
+
+    for ((vertex, ends), angle) in knowledge.angles.items():
+        if x not in ends or vertex not in placed:
+            continue
+        other = next(iter(ends - {x}))
+        if other not in placed or placed[other] == placed[vertex]:
+            continue
+
+        base = (placed[other] - placed[vertex]).normalize()
+        rays.append((vertex, placed[vertex], [base.rotate(angle), base.rotate(-angle)]))
+
+    # Two angles on placed points (ASA): intersect the rays
+    for i in range(len(rays)):
+        for j in range(i + 1, len(rays)):
+            candidates = []
+            for dir_i in rays[i][2]:
+                for dir_j in rays[j][2]:
+                    intersection = find_line_intersection(rays[i][1], dir_i, rays[j][1], dir_j)
+                    # Nearly parallel rays meet far away, such a point would throw the whole seed off
+                    if intersection is not None and \
+                            (intersection - rays[i][1]).dot(dir_i) > 0 and (intersection - rays[j][1]).dot(dir_j) > 0 and \
+                            (intersection - rays[i][1]).magnitude() < max_ray_length * knowledge.default_length and \
+                            (intersection - rays[j][1]).magnitude() < max_ray_length * knowledge.default_length:
+                        candidates.append(intersection)
+            if candidates:
+                return pick_side(candidates, x, placed, knowledge, [rays[i][0], rays[j][0]])
+
+    # One angle: go along the ray, as far as a known side says
+    for (vertex, origin, directions) in rays:
+        length = knowledge.get_length(vertex, x, placed)
+        if length is not None:
+            return pick_side([origin + length * d for d in directions], x, placed, knowledge, [vertex])
+
+        # Without a length the point is usually inside the figure (e.g. a circle center), aim for its middle
+        others = [p for (name, p) in placed.items() if name != vertex]
+        if not others:
+            return origin + knowledge.default_length * directions[0]
+        centroid = sum(others, Vector2(0, 0)) / len(others)
+        length = (centroid - origin).magnitude() or knowledge.default_length
+        return min([origin + length * d for d in directions], key=lambda c: (c - centroid).magnitude())
+
+    return None
+
+
+def place_by_single_length(knowledge: SceneKnowledge, placed: dict[str, Vector2], x: str) -> Vector2 | None:
+    for p in knowledge.neighbours.get(x, []):
+        length = knowledge.get_length(p, x, placed) if p in placed else None
+        if length is None:
+            continue
+
+        direction = Vector2(1, 0)
+        if len(placed) > 1:
+            centroid = sum(placed.values(), Vector2(0, 0)) / len(placed)
+            if (placed[p] - centroid).length_squared() > 0:
+                direction = (placed[p] - centroid).normalize().rotate(60)
+        return placed[p] + length * direction
+
+    return None
+
+
+def seed_positions(sim_points: dict[str, SimPoint], rules: dict, fixed: dict[str, Vector2] | None = None) -> None:
+    # Replaces the random start positions with constructed ones wherever the rules allow it.
+    # Points without any rule keep a random position, moved next to the constructed figure.
+    # fixed points (e.g. from a warm start) keep their given position and the rest is constructed around them.
+    knowledge = SceneKnowledge(list(get_rule_specs(rules).values()))
+    constrained = [p for p in sim_points if p in knowledge.neighbours]
+    placed: dict[str, Vector2] = {name: position for (name, position) in (fixed or {}).items() if name in sim_points}
+
+    construct = [place_on_segment, place_by_lengths, place_by_angles, place_by_single_length]
+
+    while any(p not in placed for p in constrained):
+        # Always use the most determined construction available
+        position = None
+        for place in construct:
+            for x in constrained:
+                if x not in placed:
+                    position = place(knowledge, placed, x)
+                    if position is not None:
+                        break
+            if position is not None:
+                break
+
+        if position is not None:
+            placed[x] = position
+            continue
+
+        # Nothing constructible: drop the best connected point near its placed neighbours,
+        # or start a new figure next to the existing ones
+        x = max((p for p in constrained if p not in placed),
+                key=lambda p: (sum(q in placed for q in knowledge.neighbours[p]), len(knowledge.neighbours[p])))
+        near = [placed[q] for q in knowledge.neighbours[x] if q in placed]
+        if near:
+            centroid = sum(near, Vector2(0, 0)) / len(near)
+            placed[x] = centroid + Vector2(knowledge.default_length, 0).rotate(random.uniform(0, 360))
+        elif placed:
+            right = max(p.x for p in placed.values())
+            placed[x] = Vector2(right + 2 * knowledge.default_length, gp.seed_origin[1])
+        else:
+            placed[x] = Vector2(*gp.seed_origin)
+
+    # Truly free points: random inside the area of the figure
+    if placed:
+        left = min(p.x for p in placed.values()) - knowledge.default_length
+        top = min(p.y for p in placed.values()) - knowledge.default_length
+        right = max(p.x for p in placed.values()) + knowledge.default_length
+        bottom = max(p.y for p in placed.values()) + knowledge.default_length
+        for p in sim_points:
+            if p not in placed:
+                placed[p] = Vector2(random.uniform(left, right), random.uniform(top, bottom))
+
+    for (name, position) in placed.items():
+        sim_points[name].position.update(position)
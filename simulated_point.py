@@ -1,11 +1,17 @@
-from pygame import Vector2
+import math
+from typing import Iterable
+
+from vector2 import Vector2
 import global_params as gp
 
 
 class SimulatedPoint:
+    # position, canvas_position and force are owned by the point and only ever changed in place
+    __slots__ = ("position", "canvas_position", "force", "name")
+
     def __init__(self, position: Vector2, name: str):
         self.position = position
-        self.canvas_position = position
+        self.canvas_position = Vector2(position)
         self.force = Vector2(0, 0)
         self.name = name
 
@@ -14,17 +20,64 @@ class SimulatedPoint:
 
     def update(self) -> None:
         # Move
-        if (self.force.length() * gp.delta_step) < gp.force_min_threshold:
+        force = self.force
+        if math.hypot(force.x, force.y) * gp.delta_step < gp.force_min_threshold:
             return
-        self.position += gp.delta_step * self.force
-        self.force = Vector2(0, 0)
+        self.position.x += gp.delta_step * force.x
+        self.position.y += gp.delta_step * force.y
+        force.x = 0.0
+        force.y = 0.0
+
+    def update_canvas_position(self, translate: Vector2 | None = None, rotation: float = 0, scale: float = 1):
+        (tx, ty) = (0.0, 0.0) if translate is None else (translate[0], translate[1])
+        radians = math.radians(rotation)
+        self.set_canvas_position(tx, ty, math.cos(radians) * scale, math.sin(radians) * scale)
+
+    def set_canvas_position(self, tx: float, ty: float, cos_scale: float, sin_scale: float) -> None:
+        # ((position + translate) rotated) * scale, with the rotation and scale folded into cos_scale/sin_scale
+        x = self.position.x + tx
+        y = self.position.y + ty
+        new_x = x * cos_scale - y * sin_scale
+        new_y = x * sin_scale + y * cos_scale
+
+        canvas_position = self.canvas_position
+        dx = new_x - canvas_position.x
+        dy = new_y - canvas_position.y
+        if dx * dx + dy * dy < gp.canvas_min_move_dst * gp.canvas_min_move_dst:
+            return
+        canvas_position.x = new_x
+        canvas_position.y = new_y
+
+
+def update_points(sim_points: Iterable[SimulatedPoint]) -> float:
+    # SimulatedPoint.update for every point, returns the summed squared force before the update
+    delta_step = gp.delta_step
+    threshold = gp.force_min_threshold
+    energy = 0.0
+
+    for sim_point in sim_points:
+        force = sim_point.force
+        (fx, fy) = (force.x, force.y)
+        force_sq = fx * fx + fy * fy
+        energy += force_sq
+        if math.sqrt(force_sq) * delta_step < threshold:
+            continue
+        position = sim_point.position
+        position.x += delta_step * fx
+        position.y += delta_step * fy
+        force.x = 0.0
+        force.y = 0.0
+
+    return energy
 
-    def update_canvas_position(self, translate: Vector2 = Vector2(0, 0), rotation: float = 0, scale: float = 1):
-        last_canvas_position = self.canvas_position
 
-        self.canvas_position = self.position + translate
-        self.canvas_position = self.canvas_position.rotate(rotation)
-        self.canvas_position *= scale
+def transform_points(sim_points: Iterable[SimulatedPoint], translate: Vector2, rotation: float = 0,
+                     scale: float = 1) -> None:
+    # SimulatedPoint.update_canvas_position for every point, the rotation is only computed once
+    radians = math.radians(rotation)
+    cos_scale = math.cos(radians) * scale
+    sin_scale = math.sin(radians) * scale
+    (tx, ty) = (translate[0], translate[1])
 
-        if (last_canvas_position - self.canvas_position).magnitude() < gp.canvas_min_move_dst:
-            self.canvas_position = last_canvas_position
+    for sim_point in sim_points:
+        sim_point.set_canvas_position(tx, ty, cos_scale, sin_scale)
@@ -0,0 +1,110 @@
+from typing import TYPE_CHECKING
+
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint, update_points
+from utils import parse_json
+from warm_start import get_warm_positions, seed_warm_start
+from closed_form import solve_closed_form, seed_around_exact
+from profiler import profiler
+
+# The engines need numpy, they are imported once one is created
+if TYPE_CHECKING:
+    from vector_engine import VectorEngine
+
+
+def parse_scene(json_str: str, previous: list | None = None) -> [dict[str, SimPoint], dict, dict]:
+    # parse_json followed by the seeding stage.
+    # previous is the [sim_points, rules] of a solved scene this one was edited from: every point it shares
+    # keeps its solved position and only the new ones are seeded
+    (sim_points, drawables, rules) = parse_json(json_str)
+    seed_scene(sim_points, drawables, rules, previous)
+    return [sim_points, drawables, rules]
+
+
+def seed_scene(sim_points: dict[str, SimPoint], drawables: dict, rules: dict, previous: list | None = None) -> None:
+    # The seeding stage of parse_scene, also run on a scene that was built element by element while streaming
+    # The points the rules fully determine, placed analytically; the seeding builds the rest around them
+    exact = solve_closed_form(sim_points, rules, drawables) if gp.closed_form else {}
+    if previous and gp.warm_start:
+        if gp.constructive_seeding:
+            seed_warm_start(sim_points, rules, previous[0], previous[1], exact)
+        else:
+            for (name, position) in get_warm_positions(previous[0], previous[1], sim_points, rules).items():
+                sim_points[name].position.update(position)
+    elif gp.constructive_seeding:
+        seed_around_exact(sim_points, rules, exact)
+    else:
+        for (name, position) in exact.items():
+            sim_points[name].position.update(position)
+
+
+def create_engine(sim_points: dict[str, SimPoint], rules: dict, mode: str | None = None,
+                  use_vector_engine: bool | None = None) -> "VectorEngine | None":
+    # None means the rules are enforced through their own Rule objects.
+    # mode and use_vector_engine default to gp.solver_mode and gp.use_vector_engine
+    mode = mode or gp.solver_mode
+    if use_vector_engine is None:
+        use_vector_engine = gp.use_vector_engine
+
+    if mode == "solve_fast":
+        from lsq_solver import LsqSolver
+        return LsqSolver(sim_points, rules)
+    elif mode == "animate":
+        if use_vector_engine:
+            from vector_engine import VectorEngine
+            return VectorEngine(sim_points, rules)
+        if gp.integrator != "euler":
+            # Other integrators need the forces as arrays
+            from rule_engine import RuleEngine
+            return RuleEngine(sim_points, rules)
+        return None
+    else:
+        raise Exception(f"Error: unknown solver mode '{mode}'.")
+
+
+def step_simulation(sim_points: dict[str, SimPoint], rules: dict, engine: "VectorEngine | None" = None) -> float:
+    # One rule pass and one integration step, returns the force energy of the step.
+    # An engine keeps the positions to itself, the caller writes them back once it needs them
+    if engine:
+        with profiler.phase("engine_step"):
+            return engine.step()
+
+    # Apply all rules
+    if profiler.enabled:
+        profiler.enforce_rules(rules)
+    else:
+        for rule in rules.values():
+            rule.enforce()
+
+    # Update Positions
+    with profiler.phase("update_points"):
+        return update_points(sim_points.values())
+
+
+def is_converged(engine, energy: float, residual: float) -> bool:
+    # Whether a finished solve is a correct layout. The least squares solver gets the rules exact or not at all
+    # (e.g. contradicting lengths). The force relaxation stops once the forces are small, which they also are
+    # where contradicting rules balance, so its residual has to be small too.
+    # energy is the force energy of the last step, or for the least squares solver whatever it returned
+    if engine is not None and type(engine).__name__ == "LsqSolver":
+        return residual < gp.residual_tolerance
+    return energy < gp.convergence_threshold and residual < gp.settled_residual_tolerance
+
+
+def run_until_converged(sim_points: dict[str, SimPoint], rules: dict, engine: "VectorEngine | None" = None,
+                        max_iterations: int = 10000) -> [int, float]:
+    iterations = 0
+    energy = float("inf")
+
+    while iterations < max_iterations and energy >= gp.convergence_threshold:
+        energy = step_simulation(sim_points, rules, engine)
+        iterations += 1
+        if engine and profiler.enabled and profiler.frame % gp.profile_residual_interval == 0:
+            # The profiler samples the residuals from the SimPoints this frame
+            engine.write_positions(sim_points)
+        profiler.end_frame(sim_points, rules)
+
+    if engine:
+        with profiler.phase("write_positions"):
+            engine.write_positions(sim_points)
+    return [iterations, energy]
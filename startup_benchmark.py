@@ -0,0 +1,77 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Every measurement runs in a fresh interpreter, module caches of this process would hide the import cost
+core_modules = ["vector2", "geom_utils", "simulated_point", "rule_spec", "seeding",
+                "vector_engine", "lsq_solver", "multi_start", "decomposition"]
+heavy_modules = ["pygame", "tkinter", "google.generativeai", "openai"]
+
+core_code = f"""
+import json, sys, time
+start = time.perf_counter()
+for name in {core_modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import": elapsed, "loaded": [m for m in {heavy_modules!r} if m in sys.modules]}}))
+"""
+
+window_code = """
+import json, time
+start = time.perf_counter()
+import new_ui
+imported = time.perf_counter()
+app = new_ui.BlueprintGenApp()
+app.update()
+shown = time.perf_counter()
+app.destroy()
+print(json.dumps({"import": imported - start, "window": shown - start}))
+"""
+
+
+def run_child(code: str) -> [dict, float]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise Exception(f"Error: benchmark child failed:\n{result.stderr.strip()}")
+    return [json.loads(result.stdout.strip().splitlines()[-1]), wall]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure cold start of the geometry core and the UI window.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds until the window has to be shown")
+    parser.add_argument("--no-window", action="store_true", help="only measure the geometry core")
+    args = parser.parse_args(argv)
+
+    failed = False
+
+    core = [run_child(core_code) for _ in range(args.runs)]
+    loaded = sorted({m for (result, _) in core for m in result["loaded"]})
+    print(f"core import:    {statistics.median(r['import'] for (r, _) in core):.3f}s "
+          f"(process {statistics.median(w for (_, w) in core):.3f}s)")
+    if loaded:
+        print(f"Warning: the geometry core loaded {', '.join(loaded)}")
+        failed = True
+
+    if not args.no_window:
+        try:
+            window = [run_child(window_code) for _ in range(args.runs)]
+        except Exception as e:
+            print(f"Warning: window not measured. {e}")
+        else:
+            window_wall = statistics.median(w for (_, w) in window)
+            print(f"new_ui import:  {statistics.median(r['import'] for (r, _) in window):.3f}s")
+            print(f"window shown:   {statistics.median(r['window'] for (r, _) in window):.3f}s "
+                  f"(process {window_wall:.3f}s, budget {args.budget:.3f}s)")
+            failed = failed or window_wall > args.budget
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# The modules live flat in the repository root
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import RuleSpec, DrawableSpec
+
+scenes_dir = os.path.join(repo_dir, "benchmarks", "scenes")
+
+
+@pytest.fixture
+def make_scene():
+    # A scene the way the solvers see it: SimPoints, and rules and drawables that only carry their spec
+    # (get_rule_specs and get_drawable_specs read nothing else), so no Rule or Drawable objects are needed
+    def make(positions: dict[str, list[float]], specs: list[RuleSpec], drawn: list[DrawableSpec] = ()):
+        sim_points = {name: SimPoint(Vector2(x, y), name) for (name, (x, y)) in positions.items()}
+        rules = {(spec.rule_type, *spec.points): SimpleNamespace(spec=spec) for spec in specs}
+        drawables = {(spec.kind, *spec.points): SimpleNamespace(spec=spec) for spec in drawn}
+        return [sim_points, rules, drawables]
+
+    return make
+
+
+@pytest.fixture
+def scene_jsons() -> dict[str, str]:
+    scenes = {}
+    for file_name in sorted(os.listdir(scenes_dir)):
+        with open(os.path.join(scenes_dir, file_name), encoding="utf-8") as file:
+            scenes[os.path.splitext(file_name)[0]] = file.read()
+    return scenes
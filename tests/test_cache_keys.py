@@ -0,0 +1,128 @@
+import os
+
+import pytest
+
+import global_params as gp
+import ai_interface
+import layout_cache
+import llm_cache
+from llm_cache import LlmCache, get_cache_key
+from layout_cache import get_layout_key, load_layout, store_layout
+from rule_spec import RuleSpec, DrawableSpec, ANGLE, SEGMENT, RATIO, POINT_ON_SEGMENT, LINE, CIRCLE
+
+scene_json = '{"polygons": [["A", "B", "C"]], "rules": [{"rule_type": "segment", "points": ["A", "B"], "value": 3}]}'
+
+
+def test_llm_cache_key_is_stable():
+    config = {"temperature": 1.0, "top_p": 0.95}
+    key = get_cache_key("gemini", "gemini-1.5-flash", config, "prompt", "Triangle ABC,  AB = 3.\n")
+    assert key == get_cache_key("gemini", "gemini-1.5-flash", dict(reversed(config.items())), "prompt",
+                                " Triangle ABC, AB = 3.")
+    assert key != get_cache_key("gemini", "gemini-1.5-pro", config, "prompt", "Triangle ABC, AB = 3.")
+    assert key != get_cache_key("gemini", "gemini-1.5-flash", config, "other prompt", "Triangle ABC, AB = 3.")
+    assert key != get_cache_key("gemini", "gemini-1.5-flash", config, "prompt", "Triangle ABC, AB = 4.")
+
+
+def test_llm_cache_round_trip_and_expiry(tmp_path, monkeypatch):
+    cache = LlmCache(str(tmp_path), 1024 * 1024, 60)
+    assert cache.get("key") is None
+    cache.put("key", scene_json)
+    assert cache.get("key") == scene_json
+    assert cache.get_stats() == {"hits": 1, "misses": 1}
+
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+    assert cache.get("key") is None
+    assert not os.listdir(tmp_path)
+
+
+def test_llm_cache_evicts_oldest_first_every_interval(tmp_path, monkeypatch):
+    cache = LlmCache(str(tmp_path), 1024 * 1024, 60)
+    evictions = []
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(cache.puts))
+    for i in range(2 * LlmCache.evict_interval + 1):
+        cache.put(f"key{i}", "response")
+    assert evictions == [1, LlmCache.evict_interval + 1, 2 * LlmCache.evict_interval + 1]
+    monkeypatch.undo()
+
+    # Three entries fit, the newest stay
+    cache.max_bytes = sum(os.path.getsize(os.path.join(tmp_path, f"key{i}.json")) for i in (62, 63, 64))
+    for (i, file_name) in enumerate(sorted(os.listdir(tmp_path), key=lambda name: int(name[3:-5]))):
+        os.utime(os.path.join(tmp_path, file_name), (1000 + i, 1000 + i))
+    cache.max_age = float("inf")
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == ["key62.json", "key63.json", "key64.json"]
+
+
+@pytest.mark.parametrize("response", ["not json {", '{"polygons": [], "rules": []}', '{"rules": [{"rule_type": "area"}]}'])
+def test_broken_or_empty_answers_are_not_cached(tmp_path, monkeypatch, capsys, response):
+    cache = LlmCache(str(tmp_path), 1024 * 1024, 60)
+    monkeypatch.setattr(ai_interface, "get_cache", lambda: cache)
+    ai_interface.cache_response("key", response)
+    assert cache.get("key") is None
+    assert "Warning: LLM answer not cached" in capsys.readouterr().err
+
+    ai_interface.cache_response("key", scene_json)
+    assert cache.get("key") == scene_json
+
+
+def get_triangle_specs(names: str, ab: float = 3) -> [dict, list[RuleSpec], list[DrawableSpec]]:
+    (a, b, c, d, h) = names
+    positions = {a: [0, 0], b: [40, 0], c: [10, 30], d: [20, 0], h: [10, 0]}
+    specs = [RuleSpec(SEGMENT, [a, b], ab), RuleSpec(SEGMENT, [b, c], 4), RuleSpec(ANGLE, [b, c, a], 90),
+             RuleSpec(POINT_ON_SEGMENT, [d, a, b]), RuleSpec(RATIO, [a, d, d, b], 1),
+             RuleSpec(POINT_ON_SEGMENT, [h, a, b]), RuleSpec(ANGLE, [c, h, a], 90)]
+    drawn = [DrawableSpec(LINE, [a, b]), DrawableSpec(LINE, [c, d]), DrawableSpec(CIRCLE, [a, b, c], inscribed=True)]
+    return [positions, specs, drawn]
+
+
+def test_layout_key_is_stable_under_relabelling(make_scene):
+    (key, order) = get_layout_key(*make_scene(*get_triangle_specs("ABCDH")))
+    assert key is not None and sorted(order) == list("ABCDH")
+
+    (positions, specs, drawn) = get_triangle_specs("QXPMK")
+    relabelled = make_scene(dict(reversed(positions.items())), list(reversed(specs)), drawn)
+    (relabelled_key, relabelled_order) = get_layout_key(*relabelled)
+    assert relabelled_key == key
+    # The orders match point for point
+    assert ["ABCDH"["QXPMK".index(name)] for name in relabelled_order] == order
+
+    # Segment ends and the sides of a symmetric ratio are interchangeable
+    specs[0] = RuleSpec(SEGMENT, ["X", "Q"], 3)
+    specs[4] = RuleSpec(RATIO, ["M", "X", "Q", "M"], 1)
+    assert get_layout_key(*make_scene(positions, specs, drawn))[0] == key
+
+
+def test_layout_key_changes_with_the_scene(make_scene):
+    key = get_layout_key(*make_scene(*get_triangle_specs("ABCDH")))[0]
+    assert get_layout_key(*make_scene(*get_triangle_specs("ABCDH", ab=3.5)))[0] != key
+
+    (positions, specs, drawn) = get_triangle_specs("ABCDH")
+    drawn[2] = DrawableSpec(CIRCLE, ["A", "B", "C"], inscribed=False)
+    assert get_layout_key(*make_scene(positions, specs, drawn))[0] != key
+
+
+def test_large_scenes_get_no_layout_key(make_scene, monkeypatch):
+    monkeypatch.setattr(gp, "layout_cache_max_points", 4)
+    scene = make_scene(*get_triangle_specs("ABCDH"))
+    assert get_layout_key(*scene) == [None, None]
+    assert not load_layout(scene[0], None, None)
+    store_layout(scene[0], None, None)
+
+
+def test_layout_round_trip(make_scene, tmp_path, monkeypatch):
+    monkeypatch.setattr(gp, "layout_cache_dir", str(tmp_path))
+    monkeypatch.setattr(layout_cache, "layout_cache", None)
+
+    solved = make_scene(*get_triangle_specs("ABCDH"))
+    (key, order) = get_layout_key(*solved)
+    assert not load_layout(solved[0], key, order)
+    store_layout(solved[0], key, order)
+
+    (positions, specs, drawn) = get_triangle_specs("QXPMK")
+    relabelled = make_scene({name: [0, 0] for name in positions}, specs, drawn)
+    (relabelled_key, relabelled_order) = get_layout_key(*relabelled)
+    assert load_layout(relabelled[0], relabelled_key, relabelled_order)
+    for (name, solved_name) in zip(relabelled_order, order):
+        assert relabelled[0][name].position.x == solved[0][solved_name].position.x
+        assert relabelled[0][name].position.y == solved[0][solved_name].position.y
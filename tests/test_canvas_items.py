@@ -0,0 +1,117 @@
+import global_params as gp
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint, transform_points
+from canvas_items import PointItem, SegmentItem, CircleItem
+from camera import Camera, get_bounds
+
+
+class CountingCanvas:
+    # Stands in for the Tk canvas and counts what the items ask of it
+    def __init__(self):
+        self.created = 0
+        self.coords_calls = 0
+        self.other_calls = 0
+
+    def _create(self, *args, **kwargs) -> int:
+        self.created += 1
+        return self.created
+
+    create_oval = create_text = create_line = _create
+
+    def coords(self, item_id: int, *coords) -> None:
+        self.coords_calls += 1
+
+    def tag_raise(self, *args) -> None:
+        self.other_calls += 1
+
+    def itemconfigure(self, *args, **kwargs) -> None:
+        self.other_calls += 1
+
+    def get_calls(self) -> int:
+        return self.created + self.coords_calls
+
+
+def make_points(positions: dict[str, list[float]]) -> dict[str, SimPoint]:
+    return {name: SimPoint(Vector2(x, y), name) for (name, (x, y)) in positions.items()}
+
+
+def test_items_are_created_once_and_only_moved_when_dirty():
+    points = make_points({"A": [0, 0], "B": [100, 0], "C": [0, 100]})
+    items = [PointItem(points[name], name) for name in points] + [SegmentItem(points["A"], points["B"]),
+                                                                   CircleItem(list(points.values()), False)]
+    canvas = CountingCanvas()
+
+    assert all(item.sync(canvas) for item in items)
+    # Point: oval and text, segment: line, circle: oval
+    assert canvas.created == 3 * 2 + 1 + 1
+
+    calls = canvas.get_calls()
+    assert not any(item.sync(canvas) for item in items)
+    assert canvas.get_calls() == calls
+
+    # Below gp.canvas_min_move_dst nothing moves on the canvas
+    points["A"].canvas_position.update(gp.canvas_min_move_dst / 2, 0)
+    assert not any(item.sync(canvas) for item in items)
+
+    points["A"].canvas_position.update(5 * gp.canvas_min_move_dst, 0)
+    touched = [item for item in items if item.sync(canvas)]
+    # The point itself, the segment and the circle through it
+    assert len(touched) == 3
+    assert canvas.created == 8
+
+
+def test_degenerate_circle_is_hidden_not_recreated():
+    points = make_points({"A": [0, 0], "B": [100, 0], "C": [0, 100]})
+    circle = CircleItem(list(points.values()), False)
+    canvas = CountingCanvas()
+    circle.sync(canvas)
+
+    # No circle goes through three points on a line
+    points["C"].canvas_position.update(50, 0)
+    circle.sync(canvas)
+    assert circle.hidden
+
+    points["C"].canvas_position.update(0, 100)
+    circle.sync(canvas)
+    assert not circle.hidden
+    assert canvas.created == 1
+
+
+def test_camera_refits_only_when_needed():
+    camera = Camera()
+    bounds = [0, 0, 100, 100]
+    assert camera.update(bounds, 800, 600)
+    assert not camera.update(bounds, 800, 600)
+    assert not camera.update([1, 1, 99, 99], 800, 600)
+
+    # Resized canvas, figure leaving the view, figure shrinking below gp.camera_min_fill
+    assert camera.update(bounds, 1000, 600)
+    assert camera.update([0, 0, 10000, 100], 1000, 600)
+    assert camera.update([0, 0, 1, 1], 1000, 600)
+
+
+def test_settled_layout_touches_the_canvas_no_more():
+    # The points relax towards fixed targets the way a converging solve moves them
+    targets = {"A": [0, 0], "B": [300, 0], "C": [150, 250]}
+    points = make_points({"A": [-80, 40], "B": [420, -60], "C": [100, 400]})
+    items = [PointItem(points[name], name) for name in points] + [SegmentItem(points["A"], points["B"]),
+                                                                   SegmentItem(points["B"], points["C"]),
+                                                                   CircleItem(list(points.values()), False)]
+    camera = Camera()
+    canvas = CountingCanvas()
+
+    calls_per_frame = []
+    for _ in range(200):
+        for (name, (x, y)) in targets.items():
+            position = points[name].position
+            position.update(position.x + 0.1 * (x - position.x), position.y + 0.1 * (y - position.y))
+        camera.update(get_bounds(list(points.values())), 800, 600)
+        transform_points(points.values(), camera.translation, 0, camera.scale)
+
+        calls = canvas.get_calls()
+        for item in items:
+            item.sync(canvas)
+        calls_per_frame.append(canvas.get_calls() - calls)
+
+    assert canvas.created == 3 * 2 + 2 + 1
+    assert calls_per_frame[-50:] == [0] * 50
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import repo_dir, scenes_dir
+
+
+def run_headless(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, os.path.join(repo_dir, "headless_solver.py"), *args],
+                          capture_output=True, text=True, cwd=repo_dir, timeout=300)
+
+
+def parse_ndjson(stdout: str) -> dict:
+    # Every line on stdout is one result, warnings must not end up in between
+    results = {}
+    for line in stdout.splitlines():
+        result = json.loads(line)
+        results[result["id"]] = result
+    return results
+
+
+def test_directory_of_scenes():
+    pytest.importorskip("rules")
+    process = run_headless(scenes_dir, "-j", "2", "--engine", "--mode", "solve_fast", "--seed", "1")
+    assert process.returncode == 0, process.stderr
+
+    results = parse_ndjson(process.stdout)
+    assert sorted(results) == sorted(name for name in os.listdir(scenes_dir) if name.endswith(".json"))
+    for (scene_id, result) in results.items():
+        assert result["converged"], scene_id
+        assert set(result["points"]) and all(len(p) == 2 for p in result["points"].values())
+    # prompt_example has a circle the parser warns about
+    assert "Warning: circle defined in json not supported." in process.stderr
+
+
+def test_jsonl_with_a_broken_line(tmp_path, scene_jsons):
+    pytest.importorskip("rules")
+    lines = [json.dumps({"id": "square", "scene": json.loads(scene_jsons["square"])}),
+             "this is not a scene",
+             "",
+             json.dumps(json.loads(scene_jsons["triangle_sas"]))]
+    path = tmp_path / "scenes.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    process = run_headless(str(path), "-j", "2", "--engine", "--mode", "solve_fast", "--seed", "1")
+    assert process.returncode == 0, process.stderr
+
+    results = parse_ndjson(process.stdout)
+    # Lines without an id are numbered by their line in the file
+    assert sorted(results, key=str) == [2, 4, "square"]
+    assert results["square"]["converged"] and results[4]["converged"]
+    assert results[2]["error"].startswith("Error:")
+    assert "points" not in results[2]
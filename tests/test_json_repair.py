@@ -0,0 +1,66 @@
+import pytest
+
+from json_repair import load_scene_json, to_ratio
+
+
+def test_strict_json_needs_no_fixes(scene_jsons):
+    for (name, text) in scene_jsons.items():
+        (scene, fixes) = load_scene_json(text)
+        assert not [fix for fix in fixes if "missing" not in fix], name
+        assert set(scene) == {"polygons", "additional_lines", "circles", "rules"}
+
+
+def test_fences_commas_comments_and_units_are_repaired():
+    text = ('```json\n{"polygons": [["A", "B", "C"],], // the triangle\n'
+            ' "rules": [{"rule_type": "angle", "points": ["A", "B", "C"], "value": "45°"}]}\n```')
+    (scene, fixes) = load_scene_json(text)
+    assert scene["polygons"] == [["A", "B", "C"]]
+    assert scene["rules"] == [{"rule_type": "angle", "points": ["A", "B", "C"], "value": 45.0}]
+    for fix in ['removed "```json" before the json object', "removed a trailing comma", "removed a comment"]:
+        assert fix in fixes
+
+
+def test_python_literals_quotes_and_aliases():
+    text = "{'polygons': [['A', 'B', 'C']], 'rules': [{'rule_type': 'Segment Length', 'points': 'AB', 'value': '5'}]}"
+    (scene, fixes) = load_scene_json(text)
+    assert scene["rules"] == [{"rule_type": "segment", "points": ["A", "B"], "value": 5.0}]
+    assert "replaced non json quotes" in fixes
+
+
+def test_braces_in_the_preamble_are_skipped():
+    text = 'Here is {the answer}: {"polygons": [["A", "B", "C"]], "rules": []}'
+    (scene, fixes) = load_scene_json(text)
+    assert scene["polygons"] == [["A", "B", "C"]]
+    assert 'removed "Here is {the answer}:" before the json object' in fixes
+
+
+def test_truncated_element_is_dropped():
+    text = ('{"polygons": [["A", "B", "C"]], "circles": [{"center_point": "O", "inscribed": True, '
+            '"circumscribed": False, "figure": ["A", "B", "C"]}], "rules": [{"rule_type": "segment", '
+            '"points": ["A", "B"], "value": 3}, {"rule_type": "segment", "points": ["B", "C"], "val')
+    (scene, fixes) = load_scene_json(text)
+    # The half written rule is dropped, not kept with an unknown value
+    assert scene["rules"] == [{"rule_type": "segment", "points": ["A", "B"], "value": 3.0}]
+    assert scene["circles"][0]["inscribed"]
+    assert any(fix.startswith("dropped the truncated last element") for fix in fixes)
+    assert "removed a trailing comma" not in fixes
+
+
+def test_ratios_keep_their_precision():
+    text = '{"polygons": [["A", "B", "C"]], "rules": [{"rule_type": "ratio", "points": ["A", "B", "B", "C"], "value": "1.23456789:3"}]}'
+    (scene, _) = load_scene_json(text)
+    assert scene["rules"][0]["value"] == "1.23456789:3"
+
+    for (value, expected) in [("3/2", "3:2"), (2, "2:1"), (0.123456789, "0.123456789:1"), ([1.5, 2], "1.5:2")]:
+        assert to_ratio(value, "value", [], []) == expected
+
+
+@pytest.mark.parametrize("text, message", [
+    ("not json", "no json object"),
+    ('{"polygons": [["A"]], "rules": [{"rule_type": "angle", "points": ["A"]}]}', "expected 3 points, got 1"),
+    ('{"rules": [{"rule_type": "segment", "points": ["A", "B"], "value": -2}]}', "must be positive"),
+    ('{"rules": [{"rule_type": "area", "points": ["A", "B", "C"]}]}', "rules[0].rule_type"),
+])
+def test_invalid_scenes_raise(text, message):
+    with pytest.raises(Exception, match=message.replace("[", r"\[").replace("]", r"\]")):
+        load_scene_json(text)
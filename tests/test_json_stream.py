@@ -0,0 +1,49 @@
+from json_stream import SceneStreamParser
+
+
+def get_events(text: str, chunk_size: int) -> list[tuple]:
+    parser = SceneStreamParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    events = []
+    while not parser.events.empty():
+        events.append(parser.events.get())
+    return events
+
+
+def test_events_do_not_depend_on_chunking(scene_jsons):
+    text = "```json\n" + scene_jsons["three_figures"] + "\n```"
+    events = get_events(text, len(text))
+    assert events
+    for chunk_size in [1, 7, 64]:
+        assert get_events(text, chunk_size) == events
+
+
+def test_elements_arrive_in_order_with_indices(scene_jsons):
+    events = get_events(scene_jsons["triangle_incircle"], 5)
+    assert [(key, index) for (key, index, _) in events] == [("polygons", 0), ("circles", 0),
+                                                            ("rules", 0), ("rules", 1), ("rules", 2)]
+    assert events[2][2] == {"rule_type": "segment", "points": ["A", "B"], "value": 6}
+
+
+def test_malformed_element_is_skipped_with_a_warning(capsys):
+    text = '{"polygons": [["A", "B", C], ["A", "C", "D"]], "rules": [{"rule_type": "segment", "points": ["A", "B"], value: 3,}]}'
+    events = get_events(text, 3)
+    assert events == [("polygons", 0, ["A", "C", "D"]),
+                      ("rules", 0, {"rule_type": "segment", "points": ["A", "B"], "value": 3})]
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Warning: could not parse streamed element of 'polygons'" in captured.err
+
+
+def test_only_pending_text_is_kept():
+    rules = ", ".join(f'{{"rule_type": "segment", "points": ["A", "B{i}"], "value": {i + 1}}}' for i in range(2000))
+    text = '{"polygons": [], "rules": [' + rules + "]}"
+    parser = SceneStreamParser()
+    longest = 0
+    for i in range(0, len(text), 16):
+        parser.feed(text[i:i + 16])
+        longest = max(longest, len(parser.text))
+    assert parser.events.qsize() == 2000
+    # An element and a chunk at most, not the whole answer so far
+    assert longest < 100
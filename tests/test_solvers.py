@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import global_params as gp
+from vector2 import Vector2
+from compiled_scene import CompiledScene
+from vector_engine import VectorEngine
+from lsq_solver import LsqSolver
+from rule_spec import RuleSpec, get_total_residual, ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO
+
+# Isosceles triangle with a 60 degree apex (so equilateral) and the midpoint D of BC
+positions = {"A": [250, 250], "B": [330, 240], "C": [270, 330], "D": [290, 260]}
+specs = [RuleSpec(SEGMENT, ["A", "B"], 100), RuleSpec(SEGMENT, ["A", "C"], 100), RuleSpec(ANGLE, ["B", "A", "C"], 60),
+         RuleSpec(POINT_ON_SEGMENT, ["D", "B", "C"]), RuleSpec(RATIO, ["B", "D", "D", "C"], 1)]
+
+
+def get_residual(engine) -> float:
+    points = {name: Vector2(x, y) for (name, (x, y)) in engine.get_positions().items()}
+    return get_total_residual({i: spec for (i, spec) in enumerate(specs)}, points)
+
+
+@pytest.mark.parametrize("integrator", ["euler", "fire", "line_search"])
+def test_engine_converges(integrator, monkeypatch):
+    monkeypatch.setattr(gp, "integrator", integrator)
+    engine = VectorEngine.from_scene(CompiledScene.from_specs(positions, specs))
+
+    energy = float("inf")
+    for _ in range(10000):
+        energy = engine.step()
+        if energy < gp.convergence_threshold:
+            break
+    assert energy < gp.convergence_threshold
+    assert get_residual(engine) < gp.settled_residual_tolerance
+
+
+def test_lsq_solver_converges():
+    scene = CompiledScene.from_specs(positions, specs)
+    solver = LsqSolver.from_scene(scene.copy())
+    (iterations, cost) = solver.solve(100)
+    assert cost < gp.residual_tolerance
+    assert get_residual(solver) < gp.residual_tolerance
+    # The compiled scene is left as it was
+    assert scene.positions.tolist() == list(positions.values())
+
+
+def test_benchmark_scenes_converge(scene_jsons, monkeypatch):
+    # Parsing a scene needs the Rule classes
+    pytest.importorskip("rules")
+    from benchmark import solve_once
+
+    # Without the closed form placement the solver does the work
+    monkeypatch.setattr(gp, "closed_form", False)
+    for (name, json_str) in scene_jsons.items():
+        result = solve_once(json_str, 1, "solve_fast", 200)
+        assert result["converged"], name
+        assert max(result["residuals"].values(), default=0) < 1e-4, name
+    random.seed()
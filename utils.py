@@ -1,20 +1,27 @@
-import json
+import itertools
 import random
-import time
+import sys
+from typing import Iterator
 
-from pygame import Vector2
+from vector2 import Vector2
 
 from simulated_point import SimulatedPoint as SimPoint
 from rules import Rule, AngleRule, SegmentLengthRule, PointOnSegRule, RatioRule
 from drawable import Drawable, Point, Circle, Segment
+from rule_spec import RuleSpec, DrawableSpec, ANGLE, SEGMENT, POINT_ON_SEGMENT, RATIO, POINT, LINE, CIRCLE
+from canvas_items import PointItem, SegmentItem, CircleItem
+from json_repair import load_scene_json
 
 
 def generate_point_position() -> Vector2:
     return Vector2(random.randint(0, 500), random.randint(0, 500))
 
 
-def generate_random_name() -> str:
-    return f"rng_{random.randbytes(6)}_{time.time()}"
+# Helper points and unnamed circles are numbered per parsed scene (helper_names is the counter of that scene),
+# so the same json gives the same names in every process. The leading underscore keeps them apart from the names
+# in the json. Rules and drawables are keyed by tuples of their type and points, no names are composed for them.
+def generate_helper_name(helper_names: Iterator[int]) -> str:
+    return f"_{next(helper_names)}"
 
 
 def create_point(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], p: str,
@@ -22,19 +29,24 @@ def create_point(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable]
     if p not in sim_points:
         sim_points[p] = SimPoint(generate_point_position(), p)
 
-    if visible and f"p_{p}" not in drawables:
-        drawables[f"p_{p}"] = Point(sim_points[p], p)
+    if visible and (POINT, p) not in drawables:
+        drawable = drawables[(POINT, p)] = Point(sim_points[p], p)
+        drawable.item = PointItem(sim_points[p], p)
+        drawable.spec = DrawableSpec(POINT, [p])
 
 
-def create_segment(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], p1: str, p2: str) -> None:
+def create_segment(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], p1: str, p2: str,
+                   polygon: list[str] | None = None) -> None:
     if p1 > p2:
         (p1, p2) = (p2, p1)
 
     create_point(sim_points, drawables, p1)
     create_point(sim_points, drawables, p2)
 
-    if f"seg_{p1}__{p2}" not in drawables:
-        drawables[f"seg_{p1}__{p2}"] = Segment(sim_points[p1], sim_points[p2])
+    if (LINE, p1, p2) not in drawables:
+        drawable = drawables[(LINE, p1, p2)] = Segment(sim_points[p1], sim_points[p2])
+        drawable.item = SegmentItem(sim_points[p1], sim_points[p2])
+        drawable.spec = DrawableSpec(LINE, [p1, p2], polygon=polygon)
 
 
 def create_angle_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
@@ -57,10 +69,11 @@ def create_angle_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Draw
     #     create_segment(sim_points, drawables, p1, p2)
     #     create_segment(sim_points, drawables, p3, p2)
 
-    if f"angle_{p1}__{p2}__{p3}" not in rules:
-        rules[f"angle_{p1}__{p2}__{p3}"] = AngleRule([sim_points[p1], sim_points[p2], sim_points[p3]], angle)
+    if (ANGLE, p1, p2, p3) not in rules:
+        rule = rules[(ANGLE, p1, p2, p3)] = AngleRule([sim_points[p1], sim_points[p2], sim_points[p3]], angle)
+        rule.spec = RuleSpec(ANGLE, [p1, p2, p3], angle)
     else:
-        print("Warning: Two angle rules for the same angle in json.")
+        print("Warning: Two angle rules for the same angle in json.", file=sys.stderr)
 
 
 def create_segment_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
@@ -80,10 +93,11 @@ def create_segment_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Dr
     # if visible:
     #     create_segment(sim_points, drawables, p1, p2)
 
-    if f"seg_{p1}__{p2}" not in rules:
-        rules[f"seg_{p1}__{p2}"] = SegmentLengthRule([sim_points[p1], sim_points[p2]], length)
+    if (SEGMENT, p1, p2) not in rules:
+        rule = rules[(SEGMENT, p1, p2)] = SegmentLengthRule([sim_points[p1], sim_points[p2]], length)
+        rule.spec = RuleSpec(SEGMENT, [p1, p2], length)
     else:
-        print("Warning: Two segment length rules for one segment in json.")
+        print("Warning: Two segment length rules for one segment in json.", file=sys.stderr)
 
 
 def create_point_on_segment_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable],
@@ -102,22 +116,23 @@ def create_point_on_segment_rule(sim_points: dict[str, SimPoint], drawables: dic
     create_point(sim_points, drawables, a)
     create_point(sim_points, drawables, b)
 
-    if f"pseg_{p}__{a}__{b}" not in rules:
-        rules[f"pseg_{p}__{a}__{b}"] = PointOnSegRule([sim_points[p], sim_points[a], sim_points[b]])
+    if (POINT_ON_SEGMENT, p, a, b) not in rules:
+        rule = rules[(POINT_ON_SEGMENT, p, a, b)] = PointOnSegRule([sim_points[p], sim_points[a], sim_points[b]])
+        rule.spec = RuleSpec(POINT_ON_SEGMENT, [p, a, b])
     else:
-        print("Warning: Point on segment rule defined twice.")
+        print("Warning: Point on segment rule defined twice.", file=sys.stderr)
 
 
 def create_inscribed_circle_rules(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable],
                                   rules: dict[str, Rule], center_point: str, figure: list[str],
                                   through_points: list[str],
-                                  radius: float | None):
+                                  radius: float | None, helper_names: Iterator[int]):
     create_point(sim_points, drawables, center_point)
 
     # Points where the circle touches the polygon
     previous_touch_point = None
     for i in range(0, len(figure)):
-        new_touch_point = generate_random_name()
+        new_touch_point = generate_helper_name(helper_names)
         create_point(sim_points, drawables, new_touch_point)
 
         create_point_on_segment_rule(sim_points, drawables, rules,
@@ -160,15 +175,14 @@ def create_ratio_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Draw
     if seg_2[0] > seg_2[1]:
         (seg_2[0], seg_2[1]) = (seg_2[1], seg_2[0])
 
-    if f"r_{seg_1[0]}{seg_1[1]}__{seg_2[0]}{seg_2[1]}" in rules:
-        print("Warning: ratio rule defined twice in json.")
+    key = (RATIO, seg_1[0], seg_1[1], seg_2[0], seg_2[1])
+    if key in rules:
+        print("Warning: ratio rule defined twice in json.", file=sys.stderr)
         return
 
-    rules[f"r_{seg_1[0]}{seg_1[1]}__{seg_2[0]}{seg_2[1]}"] = RatioRule([sim_points[seg_1[0]],
-                                                                        sim_points[seg_1[1]]],
-                                                                       [sim_points[seg_2[0]],
-                                                                        sim_points[seg_2[1]]],
-                                                                       ratio)
+    rule = rules[key] = RatioRule([sim_points[seg_1[0]], sim_points[seg_1[1]]],
+                                  [sim_points[seg_2[0]], sim_points[seg_2[1]]], ratio)
+    rule.spec = RuleSpec(RATIO, list(key[1:]), ratio)
 
 
 def create_circumscribed_circle_rules(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable],
@@ -198,143 +212,158 @@ def create_circumscribed_circle_rules(sim_points: dict[str, SimPoint], drawables
             pass
 
 
-def parse_json(json_str: str) -> [dict[str, SimPoint], dict[str, Drawable], dict[str, Rule]]:
-    json_obj = json.loads(json_str)
+def add_polygon(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
+                polygon: list[str], helper_names: Iterator[int]) -> None:
+    if len(polygon) < 3:
+        raise Exception("Error: polygon with less than 3 points in json.")
 
-    # Dictionary for points and arrays for drawables and rules
-    sim_points: dict[str, SimPoint] = {}
-    drawables: dict[str, Drawable] = {}
-    rules: dict[str, Rule] = {}
+    for i in range(0, len(polygon)):
+        # Create SimPoints, Drawable Points and Segments
+        create_point(sim_points, drawables, polygon[i], True)
+        create_segment(sim_points, drawables, polygon[i], polygon[(i + 1) % len(polygon)], polygon)
+
+
+def add_additional_line(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
+                        line: list[str], helper_names: Iterator[int]) -> None:
+    if len(line) != 2:
+        raise Exception("Error: segment with != 2 points.")
+    create_point(sim_points, drawables, line[0], True)
+    create_point(sim_points, drawables, line[1], True)
+    create_segment(sim_points, drawables, line[0], line[1])
+
+
+def add_circle(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
+               circle: dict, helper_names: Iterator[int]) -> None:
+    center_name = circle["center_point"]
+    center_visible = True
 
-    if "polygons" not in json_obj:
-        raise Exception("Error: 'polygons' missing from json.")
-    if "additional_lines" not in json_obj:
-        raise Exception("Error: 'additional_lines' missing from json.")
-    if "circles" not in json_obj:
-        raise Exception("Error: 'circles' missing from json.")
-    if "rules" not in json_obj:
-        raise Exception("Error: 'rules' missing from json.")
-
-    # Handle Polygons
-    for polygon in json_obj["polygons"]:
-        if len(polygon) < 3:
-            raise Exception("Error: polygon with less than 3 points in json.")
-
-        for i in range(0, len(polygon)):
+    if center_name == "?":
+        center_name = generate_helper_name(helper_names)
+        center_visible = False
+
+    circle_name = generate_helper_name(helper_names) if circle["name"] == "?" else circle["name"]
+
+    inscribed: bool = circle["inscribed"]
+    circumscribed: bool = circle["circumscribed"]
+    figure: list[str] = circle["figure"]
+    radius: float | None = float(circle["radius"]) if circle["radius"] != "?" else None
+    through_points: list[str] = circle["through_points"]
+
+    # Create Center point
+    create_point(sim_points, drawables, center_name, center_visible)
+
+    # Add rules for inscribed/circumscribed
+    if inscribed or circumscribed:
+        if len(figure) < 3:
+            raise Exception("Error: circle is inscribed in figure with < 3 points in json.")
+        elif len(figure) > 3:
+            print("Warning: circle defined in json not supported.", file=sys.stderr)
+            return
+
+        for i in range(0, len(figure)):
             # Create SimPoints, Drawable Points and Segments
-            create_point(sim_points, drawables, polygon[i], True)
-            create_segment(sim_points, drawables, polygon[i], polygon[(i + 1) % len(polygon)])
-
-    # Handle Additional Lines
-    for line in json_obj["additional_lines"]:
-        if len(line) != 2:
-            raise Exception("Error: segment with != 2 points.")
-        create_point(sim_points, drawables, line[0], True)
-        create_point(sim_points, drawables, line[1], True)
-        create_segment(sim_points, drawables, line[0], line[1])
-
-    # Handle Circles:
-    for circle in json_obj["circles"]:
-        center_name = circle["center_point"]
-        center_visible = True
-
-        if center_name == "?":
-            center_name = generate_random_name()
-            center_visible = False
-
-        circle_name = generate_random_name() if circle["name"] == "?" else circle["name"]
-
-        inscribed: bool = circle["inscribed"]
-        circumscribed: bool = circle["circumscribed"]
-        figure: list[str] = circle["figure"]
-        radius: float | None = float(circle["radius"]) if circle["radius"] != "?" else None
-        through_points: list[str] = circle["through_points"]
-
-        # Create Center point
-        create_point(sim_points, drawables, center_name, center_visible)
-
-        # Add rules for inscribed/circumscribed
-        if inscribed or circumscribed:
-            if len(figure) < 3:
-                raise Exception("Error: circle is inscribed in figure with < 3 points in json.")
-            elif len(figure) > 3:
-                print("Warning: circle defined in json not supported.")
-                continue
-
-            for i in range(0, len(figure)):
-                # Create SimPoints, Drawable Points and Segments
-                create_point(sim_points, drawables, figure[i], True)
-                create_segment(sim_points, drawables, figure[i], figure[(i + 1) % len(figure)])
-
-        if inscribed:
-            create_inscribed_circle_rules(sim_points, drawables, rules, center_name,
-                                          figure, through_points, radius)
-
-            # Create Drawable instance
-            if f"c_in_{circle_name}" not in drawables:
-                circle_sim_points: list[SimPoint] = []
-                for p in figure:
-                    circle_sim_points.append(sim_points[p])
-                drawables[f"c_in_{circle_name}"] = Circle(inscribed=True, points=circle_sim_points)
-            else:
-                print("Warning: circle is defined twice in json.")
-        elif circumscribed:
-            create_circumscribed_circle_rules(sim_points, drawables, rules, center_name, figure, through_points, radius)
-
-            # Create Drawable instance
-            if f"c_circ_in_{circle_name}" not in drawables:
-                circle_sim_points: list[SimPoint] = []
-                for p in figure:
-                    circle_sim_points.append(sim_points[p])
-                drawables[f"c_circ_in_{circle_name}"] = Circle(circumscribed=True, points=circle_sim_points)
-            else:
-                print("Warning: circle is defined twice in json.")
+            create_point(sim_points, drawables, figure[i], True)
+            create_segment(sim_points, drawables, figure[i], figure[(i + 1) % len(figure)])
+
+    if inscribed:
+        create_inscribed_circle_rules(sim_points, drawables, rules, center_name,
+                                      figure, through_points, radius, helper_names)
+
+        # Create Drawable instance
+        if (CIRCLE, "in", circle_name) not in drawables:
+            circle_sim_points: list[SimPoint] = []
+            for p in figure:
+                circle_sim_points.append(sim_points[p])
+            drawable = drawables[(CIRCLE, "in", circle_name)] = Circle(inscribed=True, points=circle_sim_points)
+            drawable.item = CircleItem(circle_sim_points, inscribed=True)
+            drawable.spec = DrawableSpec(CIRCLE, list(figure), inscribed=True, center=center_name)
         else:
-            # TODO implement other possible circle definitions
-            print("Warning: unsupported circle in json.")
-            continue
-
-    for rule in json_obj["rules"]:
-        if rule["rule_type"] == "angle":
-            if rule["value"] != "?":
-                create_angle_rule(sim_points, drawables, rules, rule["points"], float(rule["value"]))
-            create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
-            create_segment(sim_points, drawables, rule["points"][1], rule["points"][2])
-        elif rule["rule_type"] == "segment":
-            if rule["value"] != "?":
-                create_segment_rule(sim_points, drawables, rules, rule["points"], float(rule["value"]))
-            create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
-        elif rule["rule_type"] == "point_on_segment":
-            create_point_on_segment_rule(sim_points, drawables, rules, rule["points"])
-            create_segment(sim_points, drawables, rule["points"][1], rule["points"][2])
-        elif rule["rule_type"] == "ratio":
-            if rule["value"] == "?":
-                create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
-                create_segment(sim_points, drawables, rule["points"][2], rule["points"][3])
-                continue
-            if len(rule["points"]) != 4:
-                raise Exception("Error: ratio rule defined with != 4 points in json.")
-
-            ratio_nums = rule["value"].split(":")
-            if len(ratio_nums) != 2:
-                raise Exception("Error: ratio in wrong format in json")
-
-            try:
-                ratio = float(ratio_nums[0]) / float(ratio_nums[1])
-            except ValueError:
-                raise Exception("Error: ratio can't be converted to a number in json.")
-
-            for p in rule["points"]:
-                create_point(sim_points, drawables, p, True)
-
-            create_ratio_rule(sim_points, drawables, rules, [rule["points"][0], rule["points"][1]],
-                              [rule["points"][2], rule["points"][3]], ratio)
+            print("Warning: circle is defined twice in json.", file=sys.stderr)
+    elif circumscribed:
+        create_circumscribed_circle_rules(sim_points, drawables, rules, center_name, figure, through_points, radius)
+
+        # Create Drawable instance
+        if (CIRCLE, "circ", circle_name) not in drawables:
+            circle_sim_points: list[SimPoint] = []
+            for p in figure:
+                circle_sim_points.append(sim_points[p])
+            drawable = drawables[(CIRCLE, "circ", circle_name)] = Circle(circumscribed=True, points=circle_sim_points)
+            drawable.item = CircleItem(circle_sim_points, inscribed=False)
+            drawable.spec = DrawableSpec(CIRCLE, list(figure), inscribed=False, center=center_name)
+        else:
+            print("Warning: circle is defined twice in json.", file=sys.stderr)
+    else:
+        # TODO implement other possible circle definitions
+        print("Warning: unsupported circle in json.", file=sys.stderr)
+
+
+def add_rule(sim_points: dict[str, SimPoint], drawables: dict[str, Drawable], rules: dict[str, Rule],
+             rule: dict, helper_names: Iterator[int]) -> None:
+    if rule["rule_type"] == "angle":
+        if rule["value"] != "?":
+            create_angle_rule(sim_points, drawables, rules, rule["points"], float(rule["value"]))
+        create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
+        create_segment(sim_points, drawables, rule["points"][1], rule["points"][2])
+    elif rule["rule_type"] == "segment":
+        if rule["value"] != "?":
+            create_segment_rule(sim_points, drawables, rules, rule["points"], float(rule["value"]))
+        create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
+    elif rule["rule_type"] == "point_on_segment":
+        create_point_on_segment_rule(sim_points, drawables, rules, rule["points"])
+        create_segment(sim_points, drawables, rule["points"][1], rule["points"][2])
+    elif rule["rule_type"] == "ratio":
+        if rule["value"] == "?":
             create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
             create_segment(sim_points, drawables, rule["points"][2], rule["points"][3])
+            return
+        if len(rule["points"]) != 4:
+            raise Exception("Error: ratio rule defined with != 4 points in json.")
 
-        elif rule["rule_type"] == "parallel_lines":
-            # TODO
-            pass
+        ratio_nums = rule["value"].split(":")
+        if len(ratio_nums) != 2:
+            raise Exception("Error: ratio in wrong format in json")
+
+        try:
+            ratio = float(ratio_nums[0]) / float(ratio_nums[1])
+        except ValueError:
+            raise Exception("Error: ratio can't be converted to a number in json.")
+
+        for p in rule["points"]:
+            create_point(sim_points, drawables, p, True)
+
+        create_ratio_rule(sim_points, drawables, rules, [rule["points"][0], rule["points"][1]],
+                          [rule["points"][2], rule["points"][3]], ratio)
+        create_segment(sim_points, drawables, rule["points"][0], rule["points"][1])
+        create_segment(sim_points, drawables, rule["points"][2], rule["points"][3])
+
+    elif rule["rule_type"] == "parallel_lines":
+        # TODO
+        pass
+
+
+# Top level json keys in the order they are handled, and the function handling one element of each
+scene_sections = {
+    "polygons": add_polygon,
+    "additional_lines": add_additional_line,
+    "circles": add_circle,
+    "rules": add_rule,
+}
+
+
+def parse_json(json_str: str) -> [dict[str, SimPoint], dict[str, Drawable], dict[str, Rule]]:
+    (json_obj, fixes) = load_scene_json(json_str)
+    for fix in fixes:
+        print(f"Warning: repaired json: {fix}", file=sys.stderr)
+    helper_names = itertools.count(1)
+
+    # Dictionary for points and arrays for drawables and rules
+    sim_points: dict[str, SimPoint] = {}
+    drawables: dict[str, Drawable] = {}
+    rules: dict[str, Rule] = {}
+
+    for (key, add_element) in scene_sections.items():
+        for element in json_obj[key]:
+            add_element(sim_points, drawables, rules, element, helper_names)
 
     return [sim_points, drawables, rules]
 
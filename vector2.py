@@ -0,0 +1,144 @@
+import math
+
+
+class Vector2:
+    # Drop-in for the parts of pygame.Vector2 this project uses, so the geometry core does not need pygame.
+    # Operators take any 2 element sequence (pygame vectors included), += -= *= /= work in place like in pygame.
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0.0, y: float | None = None):
+        if y is None:
+            (x, y) = (x[0], x[1]) if hasattr(x, "__len__") else (x, x)
+        self.x = float(x)
+        self.y = float(y)
+
+    def __repr__(self) -> str:
+        return f"Vector2({self.x}, {self.y})"
+
+    def __len__(self) -> int:
+        return 2
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __getitem__(self, i: int) -> float:
+        return (self.x, self.y)[i]
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(other) == 2 and self.x == other[0] and self.y == other[1]
+        except TypeError:
+            return False
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    __hash__ = None
+
+    def __bool__(self) -> bool:
+        return self.x != 0 or self.y != 0
+
+    def __neg__(self) -> "Vector2":
+        return Vector2(-self.x, -self.y)
+
+    def __pos__(self) -> "Vector2":
+        return Vector2(self.x, self.y)
+
+    def __add__(self, other) -> "Vector2":
+        return Vector2(self.x + other[0], self.y + other[1])
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> "Vector2":
+        return Vector2(self.x - other[0], self.y - other[1])
+
+    def __rsub__(self, other) -> "Vector2":
+        return Vector2(other[0] - self.x, other[1] - self.y)
+
+    def __mul__(self, other):
+        # vector * vector is the dot product, as in pygame
+        if hasattr(other, "__len__"):
+            return self.x * other[0] + self.y * other[1]
+        return Vector2(self.x * other, self.y * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: float) -> "Vector2":
+        return Vector2(self.x / other, self.y / other)
+
+    def __iadd__(self, other) -> "Vector2":
+        self.x += other[0]
+        self.y += other[1]
+        return self
+
+    def __isub__(self, other) -> "Vector2":
+        self.x -= other[0]
+        self.y -= other[1]
+        return self
+
+    def __imul__(self, other: float) -> "Vector2":
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __itruediv__(self, other: float) -> "Vector2":
+        self.x /= other
+        self.y /= other
+        return self
+
+    def copy(self) -> "Vector2":
+        return Vector2(self.x, self.y)
+
+    def update(self, x=0.0, y: float | None = None) -> None:
+        if y is None:
+            (x, y) = (x[0], x[1]) if hasattr(x, "__len__") else (x, x)
+        self.x = float(x)
+        self.y = float(y)
+
+    def dot(self, other) -> float:
+        return self.x * other[0] + self.y * other[1]
+
+    def cross(self, other) -> float:
+        return self.x * other[1] - self.y * other[0]
+
+    def length(self) -> float:
+        return math.hypot(self.x, self.y)
+
+    magnitude = length
+
+    def length_squared(self) -> float:
+        return self.x * self.x + self.y * self.y
+
+    magnitude_squared = length_squared
+
+    def distance_to(self, other) -> float:
+        return math.hypot(self.x - other[0], self.y - other[1])
+
+    def distance_squared_to(self, other) -> float:
+        dx = self.x - other[0]
+        dy = self.y - other[1]
+        return dx * dx + dy * dy
+
+    def normalize(self) -> "Vector2":
+        length = math.hypot(self.x, self.y)
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        return Vector2(self.x / length, self.y / length)
+
+    def normalize_ip(self) -> None:
+        length = math.hypot(self.x, self.y)
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        self.x /= length
+        self.y /= length
+
+    def rotate(self, angle: float) -> "Vector2":
+        # Degrees, counterclockwise in a y-up system
+        radians = math.radians(angle)
+        cos = math.cos(radians)
+        sin = math.sin(radians)
+        return Vector2(self.x * cos - self.y * sin, self.x * sin + self.y * cos)
+
+    def angle_to(self, other) -> float:
+        return math.degrees(math.atan2(other[1], other[0]) - math.atan2(self.y, self.x))
@@ -0,0 +1,141 @@
+import numpy as np
+
+import global_params as gp
+from simulated_point import SimulatedPoint as SimPoint
+from compiled_scene import CompiledScene
+from integrators import create_integrator
+from profiler import profiler
+
+
+class VectorEngine:
+    # Structure-of-arrays version of the rule/SimPoint relaxation.
+    # Every point is one row in positions/forces, every rule type is one batched kernel over index arrays.
+    def __init__(self, sim_points: dict[str, SimPoint], rules: dict):
+        self._load(CompiledScene.compile(sim_points, rules))
+
+    @classmethod
+    def from_scene(cls, scene: CompiledScene):
+        # Builds an engine without SimPoints or Rule objects, e.g. inside a worker process
+        engine = cls.__new__(cls)
+        engine._load(scene)
+        return engine
+
+    def _load(self, scene: CompiledScene) -> None:
+        self.scene = scene
+        self.names: list[str] = scene.names
+        self.index: dict[str, int] = scene.index
+
+        self.positions = scene.positions.copy()
+        self.forces = np.zeros_like(self.positions)
+        self.integrator = create_integrator()
+
+        self.angle_idx = scene.angle_idx
+        self.angle_values = scene.angle_values
+        self.segment_idx = scene.segment_idx
+        self.segment_values = scene.segment_values
+        self.on_segment_idx = scene.on_segment_idx
+        self.ratio_idx = scene.ratio_idx
+        self.ratio_values = scene.ratio_values
+
+    def write_positions(self, sim_points: dict[str, SimPoint]) -> None:
+        for i, (x, y) in enumerate(self.positions.tolist()):
+            position = sim_points[self.names[i]].position
+            position.x = x
+            position.y = y
+
+    def get_positions(self) -> dict[str, list[float]]:
+        return dict(zip(self.names, self.positions.tolist()))
+
+    def enforce(self) -> None:
+        # Every kernel is a profiler phase, the counterpart of the per rule type times of profiler.enforce_rules
+        if len(self.angle_idx):
+            with profiler.phase("kernel:angles"):
+                self._enforce_angles()
+        if len(self.segment_idx):
+            with profiler.phase("kernel:segments"):
+                self._enforce_segments()
+        if len(self.on_segment_idx):
+            with profiler.phase("kernel:on_segments"):
+                self._enforce_on_segments()
+        if len(self.ratio_idx):
+            with profiler.phase("kernel:ratios"):
+                self._enforce_ratios()
+
+    def force_energy(self) -> float:
+        return float(np.sum(self.forces * self.forces))
+
+    def update(self) -> None:
+        # Same as SimulatedPoint.update: points below the threshold keep accumulating force
+        moving = np.hypot(self.forces[:, 0], self.forces[:, 1]) * gp.delta_step >= gp.force_min_threshold
+        self.positions[moving] += gp.delta_step * self.forces[moving]
+        self.forces[moving] = 0
+
+    def step(self) -> float:
+        # Returns the force energy of this step, before the forces are applied
+        return self.integrator.step(self)
+
+    def _enforce_angles(self) -> None:
+        a = self.positions[self.angle_idx[:, 0]]
+        b = self.positions[self.angle_idx[:, 1]]
+        c = self.positions[self.angle_idx[:, 2]]
+
+        ba = a - b
+        bc = c - b
+        cross = ba[:, 0] * bc[:, 1] - ba[:, 1] * bc[:, 0]
+        dot = ba[:, 0] * bc[:, 0] + ba[:, 1] * bc[:, 1]
+        current = np.arctan2(np.abs(cross), dot)
+
+        # Rotate A and C around B in opposite directions, each by half of the missing angle
+        half_delta = (self.angle_values - current) / 2
+        orientation = np.where(cross < 0, -1.0, 1.0)
+        turn = (orientation * half_delta)[:, None]
+
+        force_a = -turn * np.column_stack((-ba[:, 1], ba[:, 0]))
+        force_c = turn * np.column_stack((-bc[:, 1], bc[:, 0]))
+
+        np.add.at(self.forces, self.angle_idx[:, 0], force_a)
+        np.add.at(self.forces, self.angle_idx[:, 2], force_c)
+        np.add.at(self.forces, self.angle_idx[:, 1], -(force_a + force_c))
+
+    def _add_length_forces(self, idx_a: np.ndarray, idx_b: np.ndarray, target: np.ndarray) -> None:
+        ab = self.positions[idx_b] - self.positions[idx_a]
+        length = np.hypot(ab[:, 0], ab[:, 1])
+        length = np.where(length == 0, 1e-9, length)
+
+        # Each end moves half of the error along the segment
+        force = (((length - target) / (2 * length))[:, None]) * ab
+
+        np.add.at(self.forces, idx_a, force)
+        np.add.at(self.forces, idx_b, -force)
+
+    def _enforce_segments(self) -> None:
+        self._add_length_forces(self.segment_idx[:, 0], self.segment_idx[:, 1], self.segment_values)
+
+    def _enforce_on_segments(self) -> None:
+        p = self.positions[self.on_segment_idx[:, 0]]
+        a = self.positions[self.on_segment_idx[:, 1]]
+        b = self.positions[self.on_segment_idx[:, 2]]
+
+        # Vectorized geom_utils.get_shortest_vector(p, a, b)
+        ba = a - b
+        bp = p - b
+        ba_len = np.hypot(ba[:, 0], ba[:, 1])
+        ba_len = np.where(ba_len == 0, 1e-9, ba_len)
+        proj_len = np.clip((ba[:, 0] * bp[:, 0] + ba[:, 1] * bp[:, 1]) / ba_len, 0, ba_len)
+        shortest = b + (proj_len / ba_len)[:, None] * ba - p
+
+        # The segment gives way by the line friction, the point takes the rest
+        np.add.at(self.forces, self.on_segment_idx[:, 0], (1 - gp.line_friction) * shortest)
+        np.add.at(self.forces, self.on_segment_idx[:, 1], -(gp.line_friction / 2) * shortest)
+        np.add.at(self.forces, self.on_segment_idx[:, 2], -(gp.line_friction / 2) * shortest)
+
+    def _enforce_ratios(self) -> None:
+        ab = self.positions[self.ratio_idx[:, 1]] - self.positions[self.ratio_idx[:, 0]]
+        cd = self.positions[self.ratio_idx[:, 3]] - self.positions[self.ratio_idx[:, 2]]
+        ab_len = np.hypot(ab[:, 0], ab[:, 1])
+        cd_len = np.hypot(cd[:, 0], cd[:, 1])
+
+        # Meet in the middle: AB aims for the mean of both (scaled) lengths, CD for the same divided by the ratio
+        target = (ab_len + self.ratio_values * cd_len) / 2
+        self._add_length_forces(self.ratio_idx[:, 0], self.ratio_idx[:, 1], target)
+        self._add_length_forces(self.ratio_idx[:, 2], self.ratio_idx[:, 3], target / self.ratio_values)
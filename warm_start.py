@@ -0,0 +1,123 @@
+import math
+
+from vector2 import Vector2
+from simulated_point import SimulatedPoint as SimPoint
+from rule_spec import get_rule_specs, get_total_residual
+from seeding import seed_positions
+
+
+def is_helper(name: str) -> bool:
+    # Touch points and unnamed centers, see utils.generate_helper_name
+    return name.startswith("_")
+
+
+def get_helper_signatures(rules: dict) -> dict[str, str]:
+    # Helper names depend on the parse order, so a helper is known by the rules it is in instead,
+    # with itself as "_" and any other helper as "?"
+    entries: dict[str, list[str]] = {}
+    for spec in get_rule_specs(rules).values():
+        for p in spec.points:
+            if is_helper(p):
+                points = ["_" if q == p else "?" if is_helper(q) else q for q in spec.points]
+                entries.setdefault(p, []).append(repr((spec.rule_type, points, spec.value)))
+    return {p: "|".join(sorted(p_entries)) for (p, p_entries) in entries.items()}
+
+
+def match_points(previous_sim_points: dict[str, SimPoint], previous_rules: dict,
+                 sim_points: dict[str, SimPoint], rules: dict) -> dict[str, str]:
+    # Point of the new scene -> the same point in the previous scene
+    matches = {name: name for name in sim_points if not is_helper(name) and name in previous_sim_points}
+
+    # Helpers only when their signature is unique on both sides
+    previous_by_signature: dict[str, list[str]] = {}
+    for (p, signature) in get_helper_signatures(previous_rules).items():
+        previous_by_signature.setdefault(signature, []).append(p)
+    by_signature: dict[str, list[str]] = {}
+    for (p, signature) in get_helper_signatures(rules).items():
+        by_signature.setdefault(signature, []).append(p)
+
+    for (signature, points) in by_signature.items():
+        previous_points = previous_by_signature.get(signature, [])
+        if len(points) == 1 and len(previous_points) == 1 and previous_points[0] in previous_sim_points:
+            matches[points[0]] = previous_points[0]
+    return matches
+
+
+def get_warm_positions(previous_sim_points: dict[str, SimPoint], previous_rules: dict,
+                       sim_points: dict[str, SimPoint], rules: dict) -> dict[str, Vector2]:
+    # Start positions for every point the previous (converged) scene already had
+    matches = match_points(previous_sim_points, previous_rules, sim_points, rules)
+    return {name: Vector2(previous_sim_points[previous].position) for (name, previous) in matches.items()}
+
+
+def get_changed_points(previous_rules: dict, rules: dict, matches: dict[str, str]) -> set[str]:
+    # Points of the rules that kept their points but got a new value, e.g. AB = 5 -> AB = 7
+    previous_values = {(spec.rule_type, tuple(spec.points)): spec.value
+                       for spec in get_rule_specs(previous_rules).values()}
+    changed = set()
+    for spec in get_rule_specs(rules).values():
+        previous_points = tuple(matches.get(p) for p in spec.points)
+        previous_value = previous_values.get((spec.rule_type, previous_points), spec.value)
+        if previous_value != spec.value:
+            changed.update(spec.points)
+    return changed
+
+
+def align_positions(positions: dict[str, Vector2], targets: dict[str, Vector2]) -> None:
+    # Moves positions rigidly (rotation, translation and a mirror if that fits better) onto the targets
+    # of the shared points, so a freshly seeded figure shows up where the previous one was
+    shared = [name for name in targets if name in positions]
+    if not shared:
+        return
+    center = sum((positions[name] for name in shared), Vector2(0, 0)) / len(shared)
+    target_center = sum((targets[name] for name in shared), Vector2(0, 0)) / len(shared)
+
+    def transform(position: Vector2, mirror: int, angle: float) -> Vector2:
+        p = position - center
+        return Vector2(mirror * p.x, p.y).rotate(angle) + target_center
+
+    best = None
+    for mirror in (1, -1):
+        (dot, cross) = (0.0, 0.0)
+        for name in shared:
+            p = positions[name] - center
+            q = targets[name] - target_center
+            dot += mirror * p.x * q.x + p.y * q.y
+            cross += mirror * p.x * q.y - p.y * q.x
+        angle = math.degrees(math.atan2(cross, dot))
+        error = sum(transform(positions[name], mirror, angle).distance_squared_to(targets[name]) for name in shared)
+        if best is None or error < best[0]:
+            best = (error, mirror, angle)
+
+    for position in positions.values():
+        position.update(transform(position, best[1], best[2]))
+
+
+def seed_warm_start(sim_points: dict[str, SimPoint], rules: dict, previous_sim_points: dict[str, SimPoint],
+                    previous_rules: dict, exact: dict[str, Vector2] | None = None) -> str:
+    # Seeds a scene edited from the solved previous one. Candidates: every shared point at its solved position,
+    # the same with the points of changed rules seeded fresh, and a fresh seeding (around the exact closed form
+    # positions, if given) moved onto the previous figure.
+    # The one with the smallest rule residual wins (the first on ties) and its name is returned.
+    matches = match_points(previous_sim_points, previous_rules, sim_points, rules)
+    warm = {name: Vector2(previous_sim_points[previous].position) for (name, previous) in matches.items()}
+    changed = get_changed_points(previous_rules, rules, matches)
+    specs = get_rule_specs(rules)
+
+    candidates = []
+    starts = [("warm", warm)]
+    if changed:
+        starts.append(("changed", {name: p for (name, p) in warm.items() if name not in changed}))
+    for (name, fixed) in starts:
+        seed_positions(sim_points, rules, fixed)
+        candidates.append((name, {p: Vector2(sim_point.position) for (p, sim_point) in sim_points.items()}))
+
+    seed_positions(sim_points, rules, exact)
+    cold = {p: Vector2(sim_point.position) for (p, sim_point) in sim_points.items()}
+    align_positions(cold, warm)
+    candidates.append(("cold", cold))
+
+    (name, positions) = min(candidates, key=lambda candidate: get_total_residual(specs, candidate[1]))
+    for (p, position) in positions.items():
+        sim_points[p].position.update(position)
+    return name